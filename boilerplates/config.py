@@ -1,10 +1,44 @@
 """Boilerplate to handle local configuration."""
 
+import configparser
+import contextlib
+import functools
+import io
+import json
+import logging
 import os
 import pathlib
 import platform
+import re
+import sys
+import tempfile
+import threading
+import time
+import types
 import typing as t
 
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib  # pylint: disable = import-error
+
+if os.name == 'nt':
+    import msvcrt  # pylint: disable = import-error
+else:
+    import fcntl
+
+_LOG = logging.getLogger(__name__)
+
+_RACY_MTIME_NS = 2 * 10 ** 9
+
+_REPLACE_RETRY_ERRORS: t.Tuple[t.Type[OSError], ...] = (PermissionError,) if os.name == 'nt' else ()
+
+LOCK_TIMEOUT = 60.0
+"""Default number of seconds to wait for a config file lock, None means waiting indefinitely."""
+
+REPLACE_TIMEOUT = 5.0
+"""Number of seconds to retry replacing a config file that is held open by a reader on Windows."""
+
 CONFIGS_PATHS = {
     'Linux': pathlib.Path('~', '.config'),
     'Darwin': pathlib.Path('~', 'Library', 'Preferences'),
@@ -12,20 +46,606 @@ CONFIGS_PATHS = {
 
 CONFIGS_PATH = CONFIGS_PATHS[platform.system()]
 
+SYSTEM_CONFIGS_PATHS = {
+    'Linux': pathlib.Path('/etc'),
+    'Darwin': pathlib.Path('/Library', 'Preferences'),
+    'Windows': pathlib.Path('%PROGRAMDATA%')}
+
+SYSTEM_CONFIGS_PATH = SYSTEM_CONFIGS_PATHS[platform.system()]
+
 PathOrStr = t.TypeVar('PathOrStr', pathlib.Path, str)
 
+TRUE_VALUES = {'true', 'yes', 'on', '1'}
+
+_EXPANSION_CHARS = frozenset('~$%')
+
+_ENVVAR_REFERENCE = re.compile(
+    r'%([^%]*)%|\$([\w-]+)|\$\{([^}]*)\}' if os.name == 'nt' else r'\$(\w+)|\$\{([^}]*)\}',
+    re.ASCII)
+"""Envvar references recognised by os.path.expandvars() on the current platform."""
+
+_HOME_ENVVARS = ('USERPROFILE', 'HOMEDRIVE', 'HOMEPATH') if os.name == 'nt' else ('HOME',)
+"""Envvars which affect expansion of the user symbol on the current platform."""
+
+
+@functools.lru_cache(maxsize=1024)
+def _referenced_envvars(path: str) -> t.Tuple[str, ...]:
+    names = [_ for match in _ENVVAR_REFERENCE.finditer(path) for _ in match.groups() if _]
+    if '~' in path:
+        names += _HOME_ENVVARS
+    return tuple(names)
+
+
+@functools.lru_cache(maxsize=1024)
+def _expand_path(
+        path: str, environment: t.Tuple[t.Optional[str], ...]  # pylint: disable = unused-argument
+        ) -> str:
+    """Expand the path, the environment is only a part of the cache key.
+
+    :param environment: values of all envvars referenced by the path
+    """
+    return os.path.expanduser(os.path.expandvars(path))
+
 
 def normalize_path(path: PathOrStr) -> PathOrStr:
-    """Normalize path variable by expanding user symbol and environment variables."""
+    """Normalize path variable by expanding user symbol and environment variables.
+
+    Paths without any of the '~', '$' and '%' characters are returned as they are,
+    and results of expansion are cached until the relevant envvars change.
+    """
+    path_str = str(path)
+    if _EXPANSION_CHARS.isdisjoint(path_str):
+        return path
+    environment = tuple(map(os.environ.get, _referenced_envvars(path_str)))
+    normalized = _expand_path(path_str, environment)
     if isinstance(path, str):
-        return os.path.expanduser(os.path.expandvars(path))
+        return normalized
     assert isinstance(path, pathlib.Path), type(path)
-    _ = normalize_path(str(path))
-    return pathlib.Path(_)
+    return pathlib.Path(normalized)
 
 
 def initialize_config_directory(app_name: str) -> None:
-    """Create a configuration directory for an application."""
+    """Create a configuration directory for an application.
+
+    Safe to call from many processes at once, as existing directories are not an error.
+    """
     config_path = normalize_path(CONFIGS_PATH.joinpath(app_name))
-    if not config_path.is_dir():
-        config_path.mkdir(parents=True)
+    config_path.mkdir(parents=True, exist_ok=True)
+
+
+def parse_bool(value: str) -> bool:
+    """Interpret text as a boolean, any value other than true-like ones is False."""
+    return value.lower() in TRUE_VALUES
+
+
+def parse_logging_level(value: str) -> int:
+    """Interpret text as a logging level, either a name like 'INFO' or a number."""
+    level = getattr(logging, value.upper(), None)
+    if isinstance(level, int):
+        return level
+    return int(value)
+
+
+class EnvSetting(t.NamedTuple):
+    """Declaration of a setting which can be set via an environment variable."""
+
+    envvar: str
+    """Name of the environment variable."""
+
+    parse: t.Callable[[str], t.Any] = str
+    """Function converting the raw value into a typed one, raising ValueError if invalid."""
+
+    strict: bool = True
+    """If False, invalid values are ignored as if the variable was not set, instead of raising."""
+
+
+_INVALID = object()
+
+
+class EnvSettings:
+    """Typed settings read from environment variables.
+
+    Each setting is parsed only when it is needed, and its parsed value is reused as long as
+    the raw value of its environment variable stays the same. So an invalid value of one
+    setting does not affect reading the others.
+
+    All settings can also be parsed and validated at once into a read-only snapshot,
+    which contains values of only those settings whose environment variables are set.
+    """
+
+    def __init__(self, settings: t.Mapping[str, EnvSetting]):
+        self.settings = dict(settings)
+        self._lock = threading.Lock()
+        self._values: t.Dict[str, t.Tuple[str, t.Any]] = {}
+        self._raw_values: t.Optional[t.Tuple[t.Optional[str], ...]] = None
+        self._snapshot: t.Mapping[str, t.Any] = types.MappingProxyType({})
+
+    def _read_raw_values(self) -> t.Tuple[t.Optional[str], ...]:
+        return tuple(os.environ.get(setting.envvar) for setting in self.settings.values())
+
+    def _parse_value(self, name: str, raw_value: str) -> t.Any:
+        """Parse a raw value of a setting, or return _INVALID if it is invalid but not strict."""
+        with self._lock:
+            cached = self._values.get(name)
+        if cached is not None and cached[0] == raw_value:
+            return cached[1]
+        setting = self.settings[name]
+        try:
+            value = setting.parse(raw_value)
+        except ValueError as err:
+            if setting.strict:
+                raise ValueError(
+                    f'invalid value {raw_value!r} of envvar {setting.envvar}: {err}') from err
+            _LOG.warning('ignoring invalid value %r of envvar %s', raw_value, setting.envvar)
+            value = _INVALID
+        with self._lock:
+            self._values[name] = (raw_value, value)
+        return value
+
+    def _parse(self, raw_values: t.Tuple[t.Optional[str], ...]) -> t.Mapping[str, t.Any]:
+        values = {}
+        for name, raw_value in zip(self.settings, raw_values):
+            if raw_value is None:
+                continue
+            value = self._parse_value(name, raw_value)
+            if value is not _INVALID:
+                values[name] = value
+        return types.MappingProxyType(values)
+
+    def _update_snapshot(self) -> t.Mapping[str, t.Any]:
+        raw_values = self._read_raw_values()
+        snapshot = self._parse(raw_values)
+        with self._lock:
+            self._raw_values, self._snapshot = raw_values, snapshot
+        return snapshot
+
+    def reload(self) -> t.Mapping[str, t.Any]:
+        """Parse all settings again, regardless of whether the environment changed."""
+        with self._lock:
+            self._values.clear()
+        return self._update_snapshot()
+
+    def snapshot(self) -> t.Mapping[str, t.Any]:
+        """Get parsed values of settings whose environment variables are set.
+
+        :raises ValueError: if a value of any strict setting is invalid
+        """
+        with self._lock:
+            if self._raw_values == self._read_raw_values():
+                return self._snapshot
+        return self._update_snapshot()
+
+    def get(self, name: str, default: t.Any = None) -> t.Any:
+        """Get parsed value of a setting, or the default if its environment variable is not set.
+
+        Only this one setting is read and parsed.
+
+        :raises ValueError: if the setting is strict and its value is invalid
+        """
+        assert name in self.settings, name
+        raw_value = os.environ.get(self.settings[name].envvar)
+        if raw_value is None:
+            return default
+        value = self._parse_value(name, raw_value)
+        return default if value is _INVALID else value
+
+
+FileSignature = t.Tuple[int, int, int]
+
+
+def file_signature(path: pathlib.Path) -> t.Optional[FileSignature]:
+    """Get modification time, size and inode of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def parse_config_file(path: pathlib.Path) -> t.Dict[str, t.Any]:
+    """Parse a TOML, JSON or INI configuration file, depending on its extension.
+
+    Sections of INI files become nested dictionaries.
+
+    :raises ValueError: if the file is not valid or its format is not known
+    """
+    if path.suffix == '.toml':
+        with path.open('rb') as config_file:
+            return tomllib.load(config_file)
+    if path.suffix == '.json':
+        with path.open(encoding='utf-8') as config_file:
+            config = json.load(config_file)
+        if not isinstance(config, dict):
+            raise ValueError(f'expected an object at top level of {path}')
+        return config
+    if path.suffix in {'.ini', '.cfg'}:
+        parser = configparser.ConfigParser(interpolation=None)
+        try:
+            with path.open(encoding='utf-8') as config_file:
+                parser.read_file(config_file)
+        except configparser.Error as err:
+            raise ValueError(f'invalid config file {path}: {err}') from err
+        return {section: dict(parser[section]) for section in parser.sections()}
+    raise ValueError(f'unknown format of config file {path}')
+
+
+def serialize_config(path: pathlib.Path, config: t.Mapping[str, t.Any]) -> bytes:
+    """Serialize configuration into a JSON or INI file contents, depending on the extension.
+
+    For INI files, all top-level values must be dictionaries, which become sections.
+
+    :raises ValueError: if the configuration cannot be represented in the format
+    """
+    if path.suffix == '.json':
+        return (json.dumps(config, indent=2) + '\n').encode('utf-8')
+    if path.suffix in {'.ini', '.cfg'}:
+        parser = configparser.ConfigParser(interpolation=None)
+        for section, values in config.items():
+            if not isinstance(values, t.Mapping):
+                raise ValueError(f'INI file {path} can only contain sections, got {section!r}')
+            parser[section] = {key: str(value) for key, value in values.items()}
+        text = io.StringIO()
+        parser.write(text)
+        return text.getvalue().encode('utf-8')
+    raise ValueError(f'writing config files in format of {path} is not supported')
+
+
+def _fsync_directory(path: pathlib.Path) -> None:
+    if os.name == 'nt':
+        return  # directories cannot be opened, and renames are durable on NTFS
+    directory_fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+
+
+def _retry_with_backoff(
+        function: t.Callable[[], None], errors: t.Tuple[t.Type[OSError], ...],
+        timeout: t.Optional[float]) -> None:
+    """Call the function until it does not raise any of the errors, waiting longer each time.
+
+    The last error is raised if the function still fails after timeout seconds.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        try:
+            function()
+            return
+        except errors:
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise
+        time.sleep(delay)
+        delay = min(delay * 2, 0.1)
+
+
+def write_file_atomically(path: pathlib.Path, data: bytes) -> None:
+    """Replace the file contents so that readers see either the old or the new contents.
+
+    The data is written to a temporary file in the same directory, flushed to disk,
+    and renamed over the target. Permissions of the existing file are preserved,
+    new files are readable only by their owner.
+
+    On Windows, a file cannot be replaced while another process has it open, so the rename
+    is retried for up to REPLACE_TIMEOUT seconds, after which PermissionError is raised.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_fd, temp_name = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(temp_fd, 'wb') as temp_file:
+            temp_file.write(data)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        with contextlib.suppress(FileNotFoundError):
+            os.chmod(temp_name, os.stat(path).st_mode & 0o7777)
+        _retry_with_backoff(
+            functools.partial(os.replace, temp_name, path), _REPLACE_RETRY_ERRORS, REPLACE_TIMEOUT)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_name)
+        raise
+    _fsync_directory(path.parent)
+
+
+@contextlib.contextmanager
+def config_file_lock(
+        path: pathlib.Path, timeout: t.Optional[float] = LOCK_TIMEOUT) -> t.Iterator[None]:
+    """Hold an exclusive advisory lock on a config file, across processes.
+
+    The lock is taken on a separate '.lock' file next to the config file, so it survives
+    atomic replacement of the config file itself. Only writers need to take it,
+    readers always see a complete file anyway -- though on Windows a reader holding the file
+    open delays the replacement, see write_file_atomically().
+
+    :param timeout: number of seconds to wait for the lock, None means waiting indefinitely
+    :raises TimeoutError: if the lock could not be taken within the timeout
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(f'{path.name}.lock'), 'a+b') as lock_file:
+        fd = lock_file.fileno()
+        if os.name == 'nt':
+            lock_file.seek(0)
+            try:
+                _retry_with_backoff(
+                    functools.partial(msvcrt.locking, fd, msvcrt.LK_NBLCK, 1), (OSError,), timeout)
+            except OSError as err:
+                raise TimeoutError(f'could not lock {path} within {timeout}s') from err
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            if timeout is None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                try:
+                    _retry_with_backoff(
+                        functools.partial(fcntl.flock, fd, fcntl.LOCK_EX | fcntl.LOCK_NB),
+                        (BlockingIOError,), timeout)
+                except BlockingIOError as err:
+                    raise TimeoutError(f'could not lock {path} within {timeout}s') from err
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def write_config_file(
+        path: pathlib.Path, config: t.Mapping[str, t.Any],
+        timeout: t.Optional[float] = LOCK_TIMEOUT) -> None:
+    """Write a JSON or INI configuration file atomically, while holding its lock.
+
+    :param timeout: number of seconds to wait for the lock, see config_file_lock()
+    """
+    data = serialize_config(path, config)
+    with config_file_lock(path, timeout):
+        write_file_atomically(path, data)
+
+
+def update_config_file(
+        path: pathlib.Path,
+        update: t.Callable[[t.Dict[str, t.Any]], t.Optional[t.Mapping[str, t.Any]]],
+        timeout: t.Optional[float] = LOCK_TIMEOUT) -> t.Dict[str, t.Any]:
+    """Read, modify and write back a configuration file, without losing concurrent updates.
+
+    :param update: function modifying the configuration in place, or returning a new one;
+        the configuration is empty if the file does not exist
+    :param timeout: number of seconds to wait for the lock, see config_file_lock()
+    :return: the configuration as written
+    """
+    with config_file_lock(path, timeout):
+        config = parse_config_file(path) if path.exists() else {}
+        updated = update(config)
+        if updated is not None:
+            config = dict(updated)
+        write_file_atomically(path, serialize_config(path, config))
+    return config
+
+
+class ParsedFileCache:
+    """Cache of parsed configuration files, invalidated by modification time, size and inode.
+
+    Files modified within last two seconds are parsed again on each access,
+    because a subsequent modification might not change their signature.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: t.Dict[pathlib.Path, t.Tuple[FileSignature, t.Dict[str, t.Any]]] = {}
+        self.parse_count = 0
+        """Number of times a file was parsed, for diagnostic purposes."""
+
+    def get(self, path: pathlib.Path) -> t.Optional[t.Dict[str, t.Any]]:
+        """Get the parsed contents of a file, or None if it does not exist.
+
+        The returned dictionary is shared, and should not be modified.
+        """
+        signature = file_signature(path)
+        if signature is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        config = parse_config_file(path)
+        with self._lock:
+            self.parse_count += 1
+            if time.time_ns() - signature[0] >= _RACY_MTIME_NS:
+                self._entries[path] = (signature, config)
+            else:
+                self._entries.pop(path, None)
+        return config
+
+    def clear(self) -> None:
+        """Forget all parsed files."""
+        with self._lock:
+            self._entries.clear()
+
+
+PARSED_FILES = ParsedFileCache()
+
+
+def merge_configs(
+        base: t.Mapping[str, t.Any], override: t.Mapping[str, t.Any]) -> t.Dict[str, t.Any]:
+    """Merge two configurations into a new one, values from override take precedence.
+
+    Nested dictionaries are merged recursively, all other values are replaced.
+    """
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            value = merge_configs(merged[key], value)
+        merged[key] = value
+    return merged
+
+
+def _parse_envvar_value(value: str) -> t.Any:
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+class ConfigLoader:
+    """Load configuration of an application by merging several layers.
+
+    Layers, from lowest to highest precedence, are: defaults, system configuration files,
+    user configuration files and environment variables. In each folder,
+    all existing files from the filenames list are used, later ones taking precedence.
+
+    Parsed files are cached in PARSED_FILES, so reloading does not parse unchanged files again.
+    The merged configuration is reused as long as no file and no relevant envvar changed.
+
+    To adjust the configuration, create a subclass and override the class attributes.
+    """
+
+    app_name: str
+    """Name of the folder with configuration files inside system and user config folders."""
+
+    filenames: t.Sequence[str] = ('config.toml', 'config.json', 'config.ini')
+    """Names of configuration files to look for."""
+
+    defaults: t.Mapping[str, t.Any] = {}
+    """Configuration used when no other layer sets a value."""
+
+    use_system_config: bool = True
+    """If True, read configuration files from SYSTEM_CONFIGS_PATH."""
+
+    use_user_config: bool = True
+    """If True, read configuration files from CONFIGS_PATH."""
+
+    envvar_prefix: t.Optional[str] = None
+    """If set, envvars like <prefix><SECTION>__<KEY> override configuration value section.key.
+
+    Names are converted to lower case. Values are parsed as JSON if possible, e.g. 'true' or '1',
+    otherwise they are used as strings.
+    """
+
+    poll_interval: float = 1.0
+    """Time in seconds between checks for changes by watch()."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._signature: t.Optional[t.Hashable] = None
+        self._config: t.Optional[t.Dict[str, t.Any]] = None
+        self._watch_stop = threading.Event()
+        self._watch_thread: t.Optional[threading.Thread] = None
+
+    def paths(self) -> t.List[pathlib.Path]:
+        """List candidate configuration files, from lowest to highest precedence."""
+        folders = []
+        if self.use_system_config:
+            folders.append(SYSTEM_CONFIGS_PATH)
+        if self.use_user_config:
+            folders.append(CONFIGS_PATH)
+        return [
+            normalize_path(folder.joinpath(self.app_name, filename))
+            for folder in folders for filename in self.filenames]
+
+    def _envvars(self) -> t.Tuple[t.Tuple[str, str], ...]:
+        if self.envvar_prefix is None:
+            return ()
+        return tuple(sorted(
+            (name, value) for name, value in os.environ.items()
+            if name.startswith(self.envvar_prefix)))
+
+    def _current_signature(self) -> t.Optional[t.Hashable]:
+        signatures = [file_signature(path) for path in self.paths()]
+        now = time.time_ns()
+        if any(_ is not None and now - _[0] < _RACY_MTIME_NS for _ in signatures):
+            return None
+        return tuple(signatures), self._envvars()
+
+    def _envvars_layer(self) -> t.Dict[str, t.Any]:
+        assert self.envvar_prefix is not None
+        layer: t.Dict[str, t.Any] = {}
+        for name, value in self._envvars():
+            *sections, key = name[len(self.envvar_prefix):].lower().split('__')
+            target = layer
+            for section in sections:
+                target = target.setdefault(section, {})
+            target[key] = _parse_envvar_value(value)
+        return layer
+
+    def changed(self) -> bool:
+        """Check cheaply if any layer might have changed since the last load().
+
+        This needs only few stat calls, and no parsing. False positives are possible
+        for files modified within last two seconds.
+        """
+        signature = self._current_signature()
+        with self._lock:
+            return signature is None or signature != self._signature
+
+    def load(self) -> t.Dict[str, t.Any]:
+        """Get the merged configuration, reusing the previous result if nothing changed.
+
+        The returned dictionary is shared, and should not be modified.
+
+        :raises ValueError: if any configuration file is invalid
+        """
+        signature = self._current_signature()
+        with self._lock:
+            if signature is not None and signature == self._signature:
+                assert self._config is not None
+                return self._config
+        config = merge_configs({}, self.defaults)
+        for path in self.paths():
+            layer = PARSED_FILES.get(path)
+            if layer is not None:
+                config = merge_configs(config, layer)
+        if self.envvar_prefix is not None:
+            config = merge_configs(config, self._envvars_layer())
+        with self._lock:
+            self._signature, self._config = signature, config
+        return config
+
+    def watch(self, callback: t.Callable[[t.Dict[str, t.Any]], None]) -> None:
+        """Call the callback with the new configuration whenever it changes.
+
+        Changes are detected by polling in a background thread every poll_interval seconds,
+        until stop_watching() is called. Invalid configuration files are logged and skipped
+        until they are modified. Exceptions raised by the callback are logged, and watching
+        continues.
+        """
+        assert self._watch_thread is None, 'already watching'
+        previous = self.load()
+        self._watch_stop.clear()
+
+        def poll() -> None:
+            nonlocal previous
+            failed_signature: t.Optional[t.Hashable] = None
+            while not self._watch_stop.wait(self.poll_interval):
+                if not self.changed():
+                    continue
+                signature = self._current_signature()
+                if signature is not None and signature == failed_signature:
+                    continue  # invalid files were not modified since the last attempt
+                try:
+                    config = self.load()
+                except (OSError, ValueError) as err:
+                    _LOG.warning('failed to reload configuration of %s: %s', self.app_name, err)
+                    failed_signature = signature
+                    continue
+                failed_signature = None
+                if config != previous:
+                    previous = config
+                    try:
+                        callback(config)
+                    except Exception:  # pylint: disable = broad-exception-caught
+                        _LOG.exception(
+                            'callback failed on new configuration of %s', self.app_name)
+
+        self._watch_thread = threading.Thread(
+            target=poll, name=f'config-watch-{self.app_name}', daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self) -> None:
+        """Stop the background thread started by watch()."""
+        if self._watch_thread is None:
+            return
+        self._watch_stop.set()
+        self._watch_thread.join()
+        self._watch_thread = None
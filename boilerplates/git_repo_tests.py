@@ -1,28 +1,322 @@
 """Boilerplate helpful for testing in a context of a synthetic git repository."""
 
+import collections
 import logging
+import os
 import pathlib
+import re
+import shutil
+import socket
+import subprocess
 import tempfile
+import time
 import typing as t
 import unittest
+import unittest.mock
 
 import git
 
 _LOG = logging.getLogger(__name__)
 
+RAM_DISK_ENVVAR_NAME = 'GIT_REPO_TESTS_RAM_DISK'
+
+RAM_DISK_PATHS = [pathlib.Path('/dev/shm')]
+"""Candidate locations of a RAM-backed filesystem, in order of preference."""
+
+USER_GIT_CONFIG = {'user.email': 'you@example.com', 'user.name': 'Your Name'}
+
+FAST_GIT_CONFIG = {'core.fsync': 'none', 'gc.auto': '0', 'maintenance.auto': 'false'}
+"""Git configuration that avoids costly operations not needed in short-lived test repositories."""
+
+
+def worker_id() -> str:
+    """Identify the current test worker process, e.g. when using pytest-xdist."""
+    return os.environ.get('PYTEST_XDIST_WORKER', f'pid{os.getpid()}')
+
+
+def isolated_git_environment(home_path: pathlib.Path) -> t.Dict[str, str]:
+    """Create environment variables that make git ignore global and system configuration.
+
+    A new empty global configuration file is created in the given home folder.
+    """
+    global_config_path = home_path.joinpath('.gitconfig')
+    global_config_path.touch()
+    return {
+        'HOME': str(home_path), 'USERPROFILE': str(home_path),
+        'XDG_CONFIG_HOME': str(home_path.joinpath('.config')),
+        'GIT_CONFIG_GLOBAL': str(global_config_path), 'GIT_CONFIG_NOSYSTEM': '1'}
+
+
+def find_ram_disk() -> t.Optional[pathlib.Path]:
+    """Find a writable RAM-backed filesystem, if one is available."""
+    for path in RAM_DISK_PATHS:
+        if path.is_dir() and os.access(path, os.W_OK | os.X_OK):
+            return path
+    return None
+
+
+def copy_repo(source_path: pathlib.Path, target_path: pathlib.Path) -> None:
+    """Copy a git repository together with its working tree.
+
+    Git objects are immutable, so they are hardlinked instead of copied whenever possible.
+    All other files are copied, because git modifies some of them in place.
+    """
+    objects_path = source_path.joinpath('.git', 'objects')
+
+    def link_or_copy(source: str, target: str) -> str:
+        if pathlib.Path(source).is_relative_to(objects_path):
+            try:
+                os.link(source, target)
+                return target
+            except OSError:
+                pass
+        return shutil.copy2(source, target)
+
+    shutil.copytree(
+        source_path, target_path, symlinks=True, copy_function=link_or_copy, dirs_exist_ok=True)
+
+
+def _git_command_name(command: t.Union[str, t.Sequence[t.Any]]) -> str:
+    """Extract the name of git subcommand, e.g. "config", from a git command line."""
+    if isinstance(command, str):
+        command = command.split()
+    args = iter(command[1:])
+    for arg in args:
+        arg = str(arg)
+        if arg in {'-c', '-C'}:
+            next(args, None)
+        elif not arg.startswith('-'):
+            return arg
+    return ''
+
+
+_FULL_HEXSHA = re.compile(r'[0-9a-f]{40}|[0-9a-f]{64}')
+
+
+def _read_bytes(path: pathlib.Path) -> t.Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except OSError:
+        return None
+
+
+def _head_signature(repo: git.Repo) -> t.Optional[t.Hashable]:
+    """Describe the state of files that determine the HEAD commit, without running git.
+
+    Return None if the repository stores refs in reftable format (git 2.45 and later),
+    in which case such files do not exist.
+    """
+    common_dir = pathlib.Path(repo.common_dir)
+    if common_dir.joinpath('reftable').is_dir():
+        return None
+    head = _read_bytes(pathlib.Path(repo.git_dir, 'HEAD'))
+    if head is None or not head.startswith(b'ref: '):
+        return head, None, None
+    ref = _read_bytes(common_dir.joinpath(head[5:].strip().decode()))
+    try:
+        packed_refs_stat = os.stat(common_dir.joinpath('packed-refs'))
+    except OSError:
+        return head, ref, None
+    return head, ref, (
+        packed_refs_stat.st_mtime_ns, packed_refs_stat.st_size, packed_refs_stat.st_ino)
+
+
+class FastImportCommit(t.NamedTuple):
+    """Declarative description of a commit to be created by fast_import()."""
+
+    files: t.Mapping[str, t.Optional[t.Union[str, bytes]]] = {}
+    """Files to create or modify, mapped to their new content, or to None to delete them."""
+
+    message: str = 'commit'
+
+    branch: t.Optional[str] = None
+    """Branch to commit to. If None, the default branch of fast_import() is used."""
+
+    parent: t.Optional[str] = None
+    """Branch, tag, ":<mark>" or commit id to start from, by default the tip of the branch.
+
+    Marks are assigned to commits in order, starting with ":1".
+    """
+
+    merges: t.Sequence[str] = ()
+    """Branches, tags, marks or commit ids to merge into the commit.
+
+    Contents of merged commits are not combined automatically, the tree of the commit is always
+    based on its first parent and on the files field.
+    """
+
+    tags: t.Sequence[str] = ()
+    """Lightweight tags to create pointing at the commit."""
+
+
+def _fast_import_ref(name: str, prefix: str = 'refs/heads/') -> str:
+    if name.startswith((':', 'refs/')) or _FULL_HEXSHA.fullmatch(name) is not None:
+        return name
+    return f'{prefix}{name}'
+
+
+def _fast_import_data(data: t.Union[str, bytes]) -> bytes:
+    if isinstance(data, str):
+        data = data.encode()
+    return b'data %i\n%s\n' % (len(data), data)
+
+
+def fast_import(
+        repo: git.Repo, commits: t.Iterable[FastImportCommit],
+        author: str = 'Your Name <you@example.com>', timestamp: int = 1_600_000_000,
+        default_branch: t.Optional[str] = None) -> t.List[str]:
+    """Create many commits at once by streaming them to a single "git fast-import" process.
+
+    If the branch checked out in a non-bare repository was updated, the working tree is reset
+    to its new commit afterwards, discarding any uncommitted changes. Otherwise, the working tree
+    is left intact.
+
+    :param repo: repository in which the commits will be created
+    :param commits: descriptions of commits, in order of creation
+    :param author: author and committer of all commits
+    :param timestamp: time of the first commit, each subsequent commit is one second later
+    :param default_branch: branch for commits which do not specify one, by default the branch
+        currently checked out; if HEAD is detached, it is required for such commits,
+        and a new branch starts from the detached HEAD
+    :raises ValueError: if HEAD is detached and a commit has no branch nor default branch
+    :return: ids of created commits, in order of creation
+    """
+    if default_branch is not None:
+        default_ref: t.Optional[str] = _fast_import_ref(default_branch)
+    elif repo.head.is_detached:
+        default_ref = None
+    else:
+        default_ref = repo.head.reference.path
+    chunks = []
+    imported_refs = set()
+    count = 0
+    for count, commit in enumerate(commits, 1):
+        ref = default_ref if commit.branch is None else _fast_import_ref(commit.branch)
+        if ref is None:
+            raise ValueError(
+                f'HEAD of {repo.git_dir} is detached, so commit {commit.message!r} needs a branch'
+                ' or fast_import() needs a default branch')
+        parent = commit.parent
+        if ref not in imported_refs:
+            imported_refs.add(ref)
+            if parent is None and git.Reference(repo, ref).is_valid():
+                parent = f'{ref}^0'  # continue from the existing branch
+            elif parent is None and ref == default_ref and repo.head.is_detached:
+                parent = repo.head.commit.hexsha
+        signature = f'{author} {timestamp + count} +0000'.encode()
+        chunks += [
+            f'commit {ref}\nmark :{count}\n'.encode(),
+            b'author %s\ncommitter %s\n' % (signature, signature),
+            _fast_import_data(commit.message)]
+        if parent is not None:
+            chunks.append(f'from {_fast_import_ref(parent)}\n'.encode())
+        chunks += [f'merge {_fast_import_ref(merge)}\n'.encode() for merge in commit.merges]
+        for path, content in commit.files.items():
+            if content is None:
+                chunks.append(f'D {path}\n'.encode())
+                continue
+            chunks += [f'M 100644 inline {path}\n'.encode(), _fast_import_data(content)]
+        chunks.append(b'\n')
+        chunks += [
+            f'reset {_fast_import_ref(tag, "refs/tags/")}\nfrom :{count}\n\n'.encode()
+            for tag in commit.tags]
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        marks_path = pathlib.Path(temporary_folder, 'marks')
+        try:
+            subprocess.run(
+                ['git', 'fast-import', '--quiet', f'--export-marks={marks_path}'],
+                input=b''.join(chunks), cwd=repo.git_dir, check=True)
+        except subprocess.CalledProcessError as err:
+            raise AssertionError(f'git fast-import failed in {repo.git_dir}') from err
+        marks = dict(_.split() for _ in marks_path.read_text(encoding='ascii').splitlines())
+    if not repo.bare and not repo.head.is_detached \
+            and repo.head.reference.path in imported_refs and repo.head.is_valid():
+        repo.git.reset('--hard', '--quiet')
+    return [marks[f':{i}'] for i in range(1, count + 1)]
+
 
 class GitRepoTests(unittest.TestCase):
-    """Provide several utility properties and methods named repo_* and git_*."""
+    """Provide several utility properties and methods named repo_* and git_*.
+
+    Tests that need a repository with some pre-existing history can override
+    build_template_repo() and call git_init_from_template(), so that the history is created
+    only once per test class, and each test gets its own cheap copy of it.
+    """
+
+    repo: t.Optional[git.Repo]
+    repo_path: t.Optional[pathlib.Path]
+    _template_folder: t.Optional[tempfile.TemporaryDirectory] = None
+    _home_folder: t.Optional[tempfile.TemporaryDirectory] = None
+
+    isolate_git_config: bool = False
+    """If True, use a private home folder and global git config, and ignore system git config.
+
+    This makes tests independent of the machine, and lets them run in parallel processes
+    without interfering with each other. The home folder is shared by tests of a class.
+    """
+
+    use_ram_disk: bool = False
+    """If True, use RAM-backed filesystem and disable fsync and automatic gc in repositories.
+
+    This can also be enabled by setting RAM_DISK_ENVVAR_NAME envvar to a true-like value.
+    If no RAM-backed filesystem is available, the default temporary folder is used.
+    """
+
+    @classmethod
+    def _use_ram_disk(cls) -> bool:
+        return cls.use_ram_disk \
+            or os.environ.get(RAM_DISK_ENVVAR_NAME, '').lower() in {'true', 'yes', 'on', '1'}
 
-    repo: t.Optional[git.Repo] = None
-    repo_path: t.Optional[pathlib.Path] = None
+    @classmethod
+    def _temporary_directory(cls) -> tempfile.TemporaryDirectory:
+        directory = find_ram_disk() if cls._use_ram_disk() else None
+        return tempfile.TemporaryDirectory(prefix=f'git_repo_tests_{worker_id()}_', dir=directory)
+
+    @classmethod
+    def _configure_repo(cls, repo: git.Repo) -> None:
+        """Set repository configuration by writing the config file directly, without git."""
+        config = dict(USER_GIT_CONFIG)
+        if cls._use_ram_disk():
+            config.update(FAST_GIT_CONFIG)
+        with repo.config_writer() as writer:
+            for name, value in config.items():
+                section, option = name.rsplit('.', 1)
+                writer.set_value(section, option, value)
+
+    @classmethod
+    def _isolate_git_config(cls) -> None:
+        if cls.__dict__.get('_home_folder') is not None:
+            return
+        cls._home_folder = cls._temporary_directory()
+        cls.addClassCleanup(cls._home_folder.cleanup)
+        cls.addClassCleanup(setattr, cls, '_home_folder', None)
+        environment = isolated_git_environment(pathlib.Path(cls._home_folder.name))
+        patcher = unittest.mock.patch.dict(os.environ, environment)
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
 
     def setUp(self):
-        self._tmpdir = tempfile.TemporaryDirectory()  # pylint: disable = consider-using-with
+        if self.isolate_git_config:
+            self._isolate_git_config()
+        self._tmpdir = self._temporary_directory()
         self.repo_path = pathlib.Path(self._tmpdir.name)
         self.assertTrue(self.repo_path.is_dir())
         self.repo = None
+        self._repos: t.List[git.Repo] = []
         self._repo_files = []
+        self._remotes_tmpdir: t.Optional[tempfile.TemporaryDirectory] = None
+        self._git_daemon: t.Optional[subprocess.Popen] = None
+        self._repo_head: t.Optional[t.Tuple[git.Repo, t.Hashable, str]] = None
+        self.git_subprocess_counts: t.Counter[str] = collections.Counter()
+        original_execute = git.cmd.Git.execute
+
+        def counting_execute(git_cmd: git.cmd.Git, command, *args, **kwargs):
+            self._count_git_subprocess(command)
+            return original_execute(git_cmd, command, *args, **kwargs)
+
+        patcher = unittest.mock.patch.object(git.cmd.Git, 'execute', counting_execute)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def tearDown(self):
         for path in self._repo_files:
@@ -30,32 +324,182 @@ class GitRepoTests(unittest.TestCase):
                 path.unlink()
         if self.repo is not None:
             self.assertIsInstance(self.repo, git.Repo)
-            self.repo.close()
+            if all(self.repo is not repo for repo in self._repos):
+                self.repo.close()  # assigned directly, not created via git_* methods
             self.repo = None
+        for repo in self._repos:
+            repo.close()
+        self._repos = []
+        if self._git_daemon is not None:
+            self._git_daemon.terminate()
+            self._git_daemon.wait()
+            self._git_daemon = None
+        if self._remotes_tmpdir is not None:
+            self._remotes_tmpdir.cleanup()
+            self._remotes_tmpdir = None
         self._tmpdir.cleanup()
         self._tmpdir = None
+        _LOG.debug(
+            '%s spawned %i git subprocesses: %s', self.id(), self.git_subprocess_count,
+            dict(self.git_subprocess_counts))
+
+    def _register_repo(self, repo: git.Repo) -> git.Repo:
+        """Keep track of a repository handle, so that it is closed after the test."""
+        self._repos.append(repo)
+        return repo
+
+    def _count_git_subprocess(self, command: t.Union[str, t.Sequence[t.Any]]) -> None:
+        self.git_subprocess_counts[_git_command_name(command)] += 1
+
+    @property
+    def git_subprocess_count(self) -> int:
+        """Number of git processes spawned so far in the current test.
+
+        Processes spawned by GitPython are counted, as well as the ones spawned by the helpers.
+        Per-command numbers are available in git_subprocess_counts.
+        """
+        return sum(self.git_subprocess_counts.values())
 
     @property
     def repo_head_hexsha(self) -> str:
+        """Abbreviated id of the HEAD commit of the current repository.
+
+        The value is cached as long as .git/HEAD, the branch it points to and packed-refs
+        are unchanged, which is checked by reading at most two small files and one stat call.
+        So it is always up to date, however HEAD is moved. In repositories using reftable
+        format of refs, the value is not cached.
+        """
         self.assertIsInstance(self.repo, git.Repo)
         assert isinstance(self.repo, git.Repo), type(self.repo)
-        return self.repo.head.commit.hexsha[:8]
+        signature = _head_signature(self.repo)
+        if signature is None:
+            return self.repo.head.commit.hexsha[:8]
+        if self._repo_head is None or self._repo_head[0] is not self.repo \
+                or self._repo_head[1] != signature:
+            self._repo_head = (self.repo, signature, self.repo.head.commit.hexsha[:8])
+        return self._repo_head[2]
+
+    def invalidate_repo_head(self) -> None:
+        """Forget the cached value of repo_head_hexsha.
+
+        Not needed for correctness, as changes of HEAD are detected anyway.
+        """
+        self._repo_head = None
+
+    @classmethod
+    def build_template_repo(cls, repo: git.Repo) -> None:
+        """Create the starting history of the template repository.
+
+        Called at most once per test class. By default does nothing, so the template is empty.
+        """
+
+    @classmethod
+    def _template_repo_path(cls) -> pathlib.Path:
+        if cls.__dict__.get('_template_folder') is None:
+            cls._template_folder = cls._temporary_directory()
+            cls.addClassCleanup(cls._template_folder.cleanup)
+            cls.addClassCleanup(setattr, cls, '_template_folder', None)
+            repo = git.Repo.init(cls._template_folder.name)
+            cls._configure_repo(repo)
+            cls.build_template_repo(repo)
+            repo.git.repack('-a', '-d', '-q')  # so that few object files need to be linked
+            repo.close()
+            _LOG.debug('created template repository for %s', cls.__name__)
+        assert cls._template_folder is not None
+        return pathlib.Path(cls._template_folder.name)
+
+    def git_init_from_template(self) -> git.Repo:
+        """Initialize a git repository in the temporary folder as a copy of the template one."""
+        assert self.repo_path is not None
+        copy_repo(self._template_repo_path(), self.repo_path)
+        self.repo = self._register_repo(git.Repo(str(self.repo_path)))
+        return self.repo
 
     def git_init(self) -> git.Repo:
         """Initialize a git repository in the temporary folder."""
-        self.repo = git.Repo.init(str(self.repo_path))
-        self.repo.git.config('user.email', 'you@example.com')
-        self.repo.git.config('user.name', 'Your Name')
+        self.repo = self._register_repo(git.Repo.init(str(self.repo_path)))
+        self._configure_repo(self.repo)
         return self.repo
 
     def git_clone(self, remote_name: str, url: str) -> git.Repo:
         """Clone a git repository into the temporary folder."""
-        self.repo = git.Repo.clone_from(url, str(self.repo_path), origin=remote_name)
+        self.repo = self._register_repo(
+            git.Repo.clone_from(url, str(self.repo_path), origin=remote_name))
         self.assertIsInstance(self.repo, git.Repo)
-        self.repo.git.config('user.email', 'you@example.com')
-        self.repo.git.config('user.name', 'Your Name')
+        self._configure_repo(self.repo)
         return self.repo
 
+    @property
+    def remotes_path(self) -> pathlib.Path:
+        """Temporary folder for remote repositories and additional clones, created on demand."""
+        if self._remotes_tmpdir is None:
+            self._remotes_tmpdir = self._temporary_directory()
+        return pathlib.Path(self._remotes_tmpdir.name)
+
+    def git_init_remote(self, name: str = 'origin') -> str:
+        """Create a local bare repository to be used as a remote, and return its file:// URL."""
+        path = self.remotes_path.joinpath(f'{name}.git')
+        git.Repo.init(str(path), bare=True).close()
+        return path.as_uri()
+
+    def git_clone_additional(self, url: str, remote_name: str = 'origin') -> git.Repo:
+        """Create another clone of a repository, independent from the main one."""
+        path = self.remotes_path.joinpath(f'clone_{len(self._repos)}')
+        repo = self._register_repo(git.Repo.clone_from(url, str(path), origin=remote_name))
+        self._configure_repo(repo)
+        return repo
+
+    def git_push(
+            self, *refspecs: str, repo: t.Optional[git.Repo] = None,
+            remote_name: str = 'origin') -> None:
+        """Push given refs, by default the current branch, from a repository to its remote."""
+        repo = self.repo if repo is None else repo
+        assert isinstance(repo, git.Repo), type(repo)
+        repo.git.push('--quiet', remote_name, *(refspecs or ['HEAD']))
+
+    def git_fetch(self, repo: t.Optional[git.Repo] = None, remote_name: str = 'origin') -> None:
+        """Fetch all branches and tags from a remote into a repository."""
+        repo = self.repo if repo is None else repo
+        assert isinstance(repo, git.Repo), type(repo)
+        repo.git.fetch('--quiet', '--tags', remote_name)
+
+    def git_daemon(self, timeout: float = 10.0) -> str:
+        """Serve repositories created with git_init_remote() using "git daemon".
+
+        The daemon listens on localhost only, allows pushing, and is stopped after the test.
+
+        :return: base URL of the served repositories, to be followed by "<name>.git"
+        """
+        assert self._git_daemon is None, 'git daemon is already running'
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        self._count_git_subprocess(['git', 'daemon'])
+        self._git_daemon = subprocess.Popen(  # pylint: disable = consider-using-with
+            ['git', 'daemon', '--reuseaddr', '--export-all', '--enable=receive-pack',
+             '--listen=127.0.0.1', f'--port={port}', f'--base-path={self.remotes_path}',
+             str(self.remotes_path)])
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=timeout).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or self._git_daemon.poll() is not None:
+                    raise
+                time.sleep(0.01)
+        return f'git://127.0.0.1:{port}/'
+
+    def git_fast_import(
+            self, commits: t.Iterable[FastImportCommit], default_branch: t.Optional[str] = None
+            ) -> t.List[str]:
+        """Create many commits at once, see fast_import() for details."""
+        self.assertIsInstance(self.repo, git.Repo)
+        assert isinstance(self.repo, git.Repo), type(self.repo)
+        self.invalidate_repo_head()
+        self._count_git_subprocess(['git', 'fast-import'])
+        return fast_import(self.repo, commits, default_branch=default_branch)
+
     def git_commit_new_file(self) -> pathlib.Path:
         """Create a new file and commit it."""
         with tempfile.NamedTemporaryFile('w', dir=str(self.repo_path), delete=False) as repo_file:
@@ -65,6 +509,7 @@ class GitRepoTests(unittest.TestCase):
         assert isinstance(self.repo, git.Repo), type(self.repo)
         self.repo.index.add([path.name])
         self.repo.index.commit(f'created file {path}')
+        self.invalidate_repo_head()
         _LOG.debug('commited file %s as %s', path, self.repo_head_hexsha)
         self._repo_files.append(path)
         return path
@@ -81,3 +526,4 @@ class GitRepoTests(unittest.TestCase):
             self.repo.index.add([path.name])
         if commit:
             self.repo.index.commit(f'modified file {path}')
+            self.invalidate_repo_head()
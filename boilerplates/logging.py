@@ -11,7 +11,7 @@ import typing as t
 
 import colorlog
 
-from .config import normalize_path
+from .config import EnvSetting, EnvSettings, normalize_path, parse_logging_level
 
 LOGS_PATHS = {
     'Linux': pathlib.Path('~', '.local', 'share'),
@@ -27,6 +27,10 @@ DEFAULT_LOGGING_LEVEL_OTHER = logging.WARNING
 
 LEVEL_ENVVAR_NAME = 'LOGGING_LEVEL'
 
+ENV_SETTINGS = EnvSettings({
+    'level_global': EnvSetting(LEVEL_ENVVAR_NAME, parse_logging_level, strict=False)})
+"""Settings of Logging class which can be set via environment variables."""
+
 DATETIME_FORMAT_DAILY = r'%Y%m%d'
 DATETIME_FORMAT_PRECISE = r'%Y%m%d-%H%M%S'
 
@@ -41,13 +45,10 @@ def logging_level_from_envvar(envvar: str, default: int = logging.WARNING) -> in
     envvar_value = os.environ.get(envvar)
     if envvar_value is None:
         return default
-    envvar_value = envvar_value.upper()
-    if not hasattr(logging, envvar_value):
-        try:
-            return int(envvar_value)
-        except ValueError:
-            return default
-    return getattr(logging, envvar_value)
+    try:
+        return parse_logging_level(envvar_value)
+    except ValueError:
+        return default
 
 
 def log_filename_basic(app_name: str) -> str:
@@ -109,6 +110,11 @@ class Logging:
     This applies to the root logger, so to all packages not covered by level_package and level_test.
     """
 
+    @classmethod
+    def _level_global(cls) -> int:
+        """Get the global logging level, overridden by LEVEL_ENVVAR_NAME envvar if it is set."""
+        return ENV_SETTINGS.get('level_global', cls.level_global)
+
     @classmethod
     def _log_absolute_path(cls) -> pathlib.Path:
         assert cls.directory is not None
@@ -141,11 +147,11 @@ class Logging:
         elif cls.enable_file:
             cls._create_logs_folder()
             logging.basicConfig(
-                level=logging_level_from_envvar(LEVEL_ENVVAR_NAME, default=cls.level_global),
+                level=cls._level_global(),
                 filename=str(cls._log_absolute_path()))
         else:
             logging.basicConfig(
-                level=logging_level_from_envvar(LEVEL_ENVVAR_NAME, default=cls.level_global))
+                level=cls._level_global())
 
         cls._set_default_logging_levels()
 
@@ -156,7 +162,7 @@ class Logging:
         handler.setFormatter(colorlog.ColoredFormatter(LOG_FORMAT_BRIEF_COLOURED, style='{'))
 
         logging.basicConfig(
-            level=logging_level_from_envvar(LEVEL_ENVVAR_NAME, default=cls.level_global),
+            level=cls._level_global(),
             handlers=[handler])
 
     @classmethod
@@ -181,7 +187,7 @@ class Logging:
             logging_config['handlers']['console'] = {
                 'class': 'logging.StreamHandler',
                 'formatter': 'console',
-                'level': logging_level_from_envvar(LEVEL_ENVVAR_NAME, default=cls.level_global),
+                'level': cls._level_global(),
                 'stream': 'ext://sys.stdout'}
             logging_config['root']['handlers'].append('console')
         if cls.enable_file:
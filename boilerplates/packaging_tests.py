@@ -1,35 +1,64 @@
 """Test definitions for package building."""
 
+import base64
+import concurrent.futures
 import contextlib
+import csv
+import fnmatch
+import hashlib
 import importlib
 import io
 import logging
 import os
 import pathlib
+import re
 import runpy
 import subprocess
 import sys
+import tarfile
 import tempfile
+import time
 import types
 import typing as t
 import unittest
+import unittest.mock
+import zipfile
 
-from .setup import find_version
+import build
+import setuptools
+
+from .setup import TEST_PACKAGES, find_version, glob_many
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib  # pylint: disable = import-error
 
 _LOG = logging.getLogger(__name__)
 
+_CHUNK_SIZE = 1024 * 1024
+
+WHEELHOUSE_ENVVAR_NAME = 'TEST_PACKAGING_WHEELHOUSE'
+
+WHEELHOUSE_STAMP_NAME = '.requirements.sha256'
+"""File in a wheel-house with fingerprint of requirements for which it was prepared."""
+
+REQUIREMENTS_FILE_PATTERNS = ('pyproject.toml', 'setup.py', 'setup.cfg', 'requirements*.txt')
+"""Files which determine which wheels are needed to build and install a package."""
+
 
 def expand_args_by_globbing_items(
         *args: str, cwd: t.Optional[pathlib.Path] = None) -> t.Tuple[str, ...]:
     """Expand a list of glob expressions."""
     if cwd is None:
         cwd = pathlib.Path.cwd()
+    matches = glob_many(cwd, [arg for arg in args if '*' in arg])
     expanded_args = []
     for arg in args:
         if '*' not in arg:
             expanded_args.append(arg)
             continue
-        expanded_arg = [str(_.relative_to(cwd)) for _ in cwd.glob(arg)]
+        expanded_arg = matches[arg]
         assert expanded_arg, arg
         _LOG.debug('expanded arg "%s" to %s', arg, expanded_arg)
         expanded_args += expanded_arg
@@ -58,6 +87,209 @@ def run_module(name: str, *args, run_name: str = '__main__') -> None:
     sys.argv = backup_sys_argv
 
 
+def _read_build_system(source_path: str) -> t.Dict[str, t.Any]:
+    pyproject_path = pathlib.Path(source_path, 'pyproject.toml')
+    if not pyproject_path.is_file():
+        return {}
+    with pyproject_path.open('rb') as pyproject_file:
+        return tomllib.load(pyproject_file).get('build-system', {})
+
+
+@contextlib.contextmanager
+def build_backend_path(source_path: str = '.') -> t.Iterator[None]:
+    """Prepend backend-path entries declared in pyproject.toml to sys.path, and then restore it."""
+    backup_sys_path = sys.path[:]
+    for backend_path in reversed(_read_build_system(source_path).get('backend-path', [])):
+        backend_path = str(pathlib.Path(source_path, backend_path).resolve())
+        if backend_path not in sys.path:
+            sys.path.insert(0, backend_path)
+    try:
+        yield
+    finally:
+        sys.path[:] = backup_sys_path
+
+
+def load_build_backend(source_path: str = '.') -> t.Any:
+    """Import the PEP 517 build backend declared in pyproject.toml of a given project.
+
+    If the build backend is not declared, the setuptools legacy backend is used,
+    just like build frontends do. The backend-path entries are in sys.path only during import.
+    """
+    build_system = _read_build_system(source_path)
+    backend_name = build_system.get('build-backend', 'setuptools.build_meta:__legacy__')
+    module_name, _, object_path = backend_name.partition(':')
+    with build_backend_path(source_path):
+        backend = importlib.import_module(module_name)
+    for name in object_path.split('.') if object_path else []:
+        backend = getattr(backend, name)
+    return backend
+
+
+def call_build_backend_hook(hook_name: str, *args, source_path: str = '.') -> t.Any:
+    """Call a PEP 517 hook of the project's build backend directly in the current process.
+
+    No isolated build environment is created, so this is equivalent to using "--no-isolation"
+    option of the build frontend, but without the cost of starting new interpreters.
+
+    The hook is called from within the source folder, therefore any paths given as arguments
+    should be absolute.
+    """
+    backend = load_build_backend(source_path)
+    backup_cwd = os.getcwd()
+    backup_sys_argv = sys.argv
+    with build_backend_path(source_path):
+        os.chdir(source_path)
+        try:
+            return getattr(backend, hook_name)(*args)
+        finally:
+            sys.argv = backup_sys_argv
+            os.chdir(backup_cwd)
+
+
+class ArtifactReport(t.NamedTuple):
+    """Summary of contents of a built distribution archive."""
+
+    path: pathlib.Path
+    files: t.List[str]
+    """Paths of all files in the archive, relative to the root of the installed distribution."""
+
+    archive_size: int
+    uncompressed_size: int
+
+    record_errors: t.List[str]
+    """Inconsistencies between RECORD file and the actual files, always empty for sdists."""
+
+    @property
+    def compression_ratio(self) -> float:
+        if self.uncompressed_size == 0:
+            return 1.0
+        return self.archive_size / self.uncompressed_size
+
+
+def _hash_stream(stream: t.BinaryIO, algorithm: str) -> str:
+    hash_ = hashlib.new(algorithm)
+    for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b''):
+        hash_.update(chunk)
+    return base64.urlsafe_b64encode(hash_.digest()).rstrip(b'=').decode('ascii')
+
+
+def _check_wheel_record(wheel: zipfile.ZipFile, files: t.Sequence[str]) -> t.List[str]:
+    """Validate hashes and sizes of files listed in the RECORD file of a wheel."""
+    record_paths = [_ for _ in files if _.count('/') == 1 and _.endswith('.dist-info/RECORD')]
+    if len(record_paths) != 1:
+        return [f'expected exactly one RECORD file, found {record_paths}']
+    record_path = record_paths[0]
+    errors = []
+    unrecorded_files = set(files)
+    with wheel.open(record_path) as record_file:
+        rows = list(csv.reader(io.TextIOWrapper(record_file, encoding='utf-8')))
+    for row in rows:
+        if not row:
+            continue
+        path, hash_str, size = (row + ['', ''])[:3]
+        unrecorded_files.discard(path)
+        try:
+            info = wheel.getinfo(path)
+        except KeyError:
+            errors.append(f'file {path} listed in RECORD is missing')
+            continue
+        if not hash_str:
+            if path != record_path:
+                errors.append(f'file {path} has no hash in RECORD')
+            continue
+        algorithm, _, expected_hash = hash_str.partition('=')
+        try:
+            with wheel.open(path) as file:
+                actual_hash = _hash_stream(file, algorithm)
+        except (ValueError, TypeError) as err:
+            errors.append(f'file {path} has hash of unsupported algorithm {algorithm!r}'
+                          f' in RECORD: {err}')
+        else:
+            if actual_hash != expected_hash:
+                errors.append(
+                    f'file {path} has hash {actual_hash} but RECORD says {expected_hash}')
+        if size and not size.isdigit():
+            errors.append(f'file {path} has invalid size {size!r} in RECORD')
+        elif size and int(size) != info.file_size:
+            errors.append(f'file {path} has size {info.file_size} but RECORD says {size}')
+    for path in sorted(unrecorded_files):
+        if not path.endswith(('.dist-info/RECORD.jws', '.dist-info/RECORD.p7s')):
+            errors.append(f'file {path} is not listed in RECORD')
+    return errors
+
+
+def inspect_wheel(path: pathlib.Path) -> ArtifactReport:
+    """Inspect contents of a wheel and validate its RECORD file, without extracting it."""
+    with zipfile.ZipFile(path) as wheel:
+        infos = [_ for _ in wheel.infolist() if not _.is_dir()]
+        files = [_.filename for _ in infos]
+        record_errors = _check_wheel_record(wheel, files)
+    return ArtifactReport(
+        path, files, path.stat().st_size, sum(_.file_size for _ in infos), record_errors)
+
+
+def inspect_source_tar(path: pathlib.Path) -> ArtifactReport:
+    """Inspect contents of a source distribution archive in a single pass, without extracting it.
+
+    Paths of files are given relative to the top-level folder of the archive.
+    """
+    files = []
+    uncompressed_size = 0
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            files.append(member.name.partition('/')[2])
+            uncompressed_size += member.size
+    return ArtifactReport(path, files, path.stat().st_size, uncompressed_size, [])
+
+
+def check_artifact_files(
+        files: t.Collection[str], packages: t.Iterable[str],
+        package_data: t.Optional[t.Mapping[str, t.Iterable[str]]] = None,
+        excluded_packages: t.Sequence[str] = (), source_root: pathlib.Path = pathlib.Path(),
+        prefix: str = '') -> t.List[str]:
+    """Compare list of files in a built artifact with the expected packages and package data.
+
+    :param files: paths of files in the artifact
+    :param packages: packages that must be present in the artifact
+    :param package_data: package data patterns, like in setuptools, files matching them in
+        source_root must be present in the artifact
+    :param excluded_packages: patterns of packages that must not be present in the artifact
+    :param source_root: folder in which the packages are located in the source tree
+    :param prefix: location of the packages within the artifact
+    :return: list of detected problems
+    """
+    problems = []
+    files_set = set(files)
+    packages = list(packages)
+    for package in packages:
+        init_path = f'{prefix}{package.replace(".", "/")}/__init__.py'
+        if init_path not in files_set:
+            problems.append(f'package {package} is missing, {init_path} not found')
+    if package_data is None:
+        package_data = {}
+    for package, patterns in package_data.items():
+        for package_ in packages if package == '' else [package]:
+            package_path = source_root.joinpath(*package_.split('.'))
+            for pattern in patterns:
+                for data_path in package_path.glob(pattern):
+                    if not data_path.is_file():
+                        continue
+                    data_path_str = f'{prefix}{data_path.relative_to(source_root).as_posix()}'
+                    if data_path_str not in files_set:
+                        problems.append(f'package data file {data_path_str} is missing')
+    excluded = re.compile('|'.join(fnmatch.translate(_) for _ in excluded_packages)) \
+        if excluded_packages else None
+    for path in files:
+        if excluded is None or not path.startswith(prefix) or '/' not in path[len(prefix):]:
+            continue
+        package = path[len(prefix):].rpartition('/')[0].replace('/', '.')
+        if excluded.match(package) is not None:
+            problems.append(f'file {path} belongs to excluded package {package}')
+    return problems
+
+
 def import_module(name: str = 'setup') -> types.ModuleType:
     setup_module = importlib.import_module(name)
     return setup_module
@@ -68,6 +300,141 @@ def import_module_member(module_name: str, member_name: str) -> t.Any:
     return getattr(module, member_name)
 
 
+@contextlib.contextmanager
+def measure_time(timings: t.Dict[str, float], stage: str) -> t.Iterator[None]:
+    """Measure wall time of a given stage and store it in the timings dictionary."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - start
+        _LOG.debug('stage "%s" took %.3fs', stage, timings[stage])
+
+
+def format_timings(timings: t.Mapping[str, float]) -> str:
+    """Create a human-readable report of stage timings."""
+    width = max((len(stage) for stage in timings), default=0)
+    return '\n'.join(f'{stage:<{width}} {seconds:8.3f}s' for stage, seconds in timings.items())
+
+
+def _normalize_wheel_name(name: str) -> str:
+    return re.sub(r'[-_.]+', '_', name).lower()
+
+
+def _read_project_name(source_path: str) -> t.Optional[str]:
+    pyproject_path = pathlib.Path(source_path, 'pyproject.toml')
+    if not pyproject_path.is_file():
+        return None
+    with pyproject_path.open('rb') as pyproject_file:
+        return tomllib.load(pyproject_file).get('project', {}).get('name')
+
+
+def prepare_wheelhouse(
+        wheelhouse_path: pathlib.Path, *requirements: str, source_path: str = '.',
+        package_name: t.Optional[str] = None) -> None:
+    """Fill a wheel-house folder with all wheels needed to build and install a package offline.
+
+    The wheels of build requirements of the package and of all of its dependencies
+    are downloaded or built, as well as of any additional requirements. The wheel of the package
+    itself is removed afterwards, so that it is never installed instead of a freshly built one.
+
+    :param package_name: name of the package, by default taken from pyproject.toml
+    """
+    build_requirements = build.ProjectBuilder(source_path).build_system_requires
+    run_pip(
+        'wheel', '--wheel-dir', str(wheelhouse_path),
+        *sorted(build_requirements), source_path, *requirements)
+    if package_name is None:
+        package_name = _read_project_name(source_path)
+    if package_name is not None:
+        for wheel_path in wheelhouse_path.glob('*.whl'):
+            if _normalize_wheel_name(wheel_path.name.partition('-')[0]) \
+                    == _normalize_wheel_name(package_name):
+                wheel_path.unlink()
+    wheelhouse_path.joinpath(WHEELHOUSE_STAMP_NAME).write_text(
+        requirements_fingerprint(*requirements, source_path=source_path), encoding='ascii')
+
+
+def requirements_fingerprint(*requirements: str, source_path: str = '.') -> str:
+    """Compute a hash of files of the package which declare requirements, and of additional ones.
+
+    See REQUIREMENTS_FILE_PATTERNS for which files are taken into account.
+    """
+    source_dir = pathlib.Path(source_path)
+    paths = sorted({
+        path for pattern in REQUIREMENTS_FILE_PATTERNS for path in source_dir.glob(pattern)})
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(f'{path.name}\0'.encode())
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    for requirement in requirements:
+        digest.update(f'{requirement}\0'.encode())
+    return digest.hexdigest()
+
+
+def is_wheelhouse_current(
+        wheelhouse_path: pathlib.Path, *requirements: str, source_path: str = '.') -> bool:
+    """Check if the wheel-house was prepared for current requirements of the package.
+
+    The additional requirements must be the same as given to prepare_wheelhouse().
+    """
+    try:
+        stamp = wheelhouse_path.joinpath(WHEELHOUSE_STAMP_NAME).read_text(encoding='ascii')
+    except OSError:
+        return False
+    return stamp == requirements_fingerprint(*requirements, source_path=source_path) \
+        and any(wheelhouse_path.glob('*.whl'))
+
+
+def wheelhouse_environment(wheelhouse_path: t.Optional[pathlib.Path]) -> t.Dict[str, str]:
+    """Create environment variables that make pip install packages only from a wheel-house.
+
+    If no wheel-house is given, the result is empty.
+    """
+    if wheelhouse_path is None:
+        return {}
+    return {'PIP_NO_INDEX': '1', 'PIP_FIND_LINKS': str(wheelhouse_path.resolve())}
+
+
+def is_offline() -> bool:
+    """Check if pip is configured not to use any package index, e.g. on an air-gapped machine."""
+    return os.environ.get('PIP_NO_INDEX', '').lower() not in {'', '0', 'false', 'no', 'off'}
+
+
+def find_wheelhouse(
+        wheelhouse_path: t.Optional[pathlib.Path], timings: t.Dict[str, float],
+        source_path: str = '.', package_name: t.Optional[str] = None,
+        refresh: bool = False) -> t.Optional[pathlib.Path]:
+    """Determine wheel-house folder to use in tests, and prepare it if it has no wheels.
+
+    If no folder is given, the folder set via WHEELHOUSE_ENVVAR_NAME envvar is used, if any.
+
+    A folder with wheels is used as is, and only a warning is logged if requirements
+    of the package changed since it was prepared, unless refresh is True -- then it is prepared
+    again. A wheel-house is never prepared when offline, see is_offline().
+    """
+    if wheelhouse_path is None:
+        if not os.environ.get(WHEELHOUSE_ENVVAR_NAME):
+            return None
+        wheelhouse_path = pathlib.Path(os.environ[WHEELHOUSE_ENVVAR_NAME])
+    if is_wheelhouse_current(wheelhouse_path, source_path=source_path):
+        return wheelhouse_path
+    has_wheels = any(wheelhouse_path.glob('*.whl'))
+    if is_offline() or (has_wheels and not refresh):
+        if has_wheels:
+            _LOG.warning(
+                'wheel-house in "%s" was prepared for different requirements, using it anyway',
+                wheelhouse_path)
+        else:
+            _LOG.warning('wheel-house in "%s" has no wheels, and it cannot be prepared offline',
+                         wheelhouse_path)
+        return wheelhouse_path
+    _LOG.info('preparing wheel-house in "%s"', wheelhouse_path)
+    with measure_time(timings, 'prepare wheel-house'):
+        prepare_wheelhouse(wheelhouse_path, source_path=source_path, package_name=package_name)
+    return wheelhouse_path
+
+
 def get_package_folder_name():
     """Attempt to guess the built package name."""
     name_from_setup = import_module_member('setup', 'Package').name.replace('-', '_')
@@ -96,11 +463,39 @@ class PackagingTests(unittest.TestCase):
     pkg_name: t.Optional[str] = None
     version: t.Optional[str] = None
 
+    wheelhouse: t.Optional[pathlib.Path] = None
+    """Folder with wheels used instead of a package index when building and installing.
+
+    If not set, the folder given via WHEELHOUSE_ENVVAR_NAME envvar is used, if any.
+    If the folder has no wheels, it is prepared in setUpClass, unless offline.
+    See find_wheelhouse() for details.
+    """
+
+    refresh_wheelhouse: bool = False
+    """If True, prepare the wheel-house again when requirements of the package changed."""
+
+    timings: t.Dict[str, float]
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
         cls.pkg_name = get_package_folder_name() if cls.pkg_name is None else cls.pkg_name
         cls.version = find_version(cls.pkg_name) if cls.version is None else cls.version
+        cls.timings = {}
+        cls.wheelhouse = find_wheelhouse(
+            cls.wheelhouse, cls.timings, package_name=cls.pkg_name,
+            refresh=cls.refresh_wheelhouse)
+
+    @classmethod
+    def tearDownClass(cls):
+        _LOG.info('%s stage timings:\n%s', cls.__name__, format_timings(cls.timings))
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        patcher = unittest.mock.patch.dict(os.environ, wheelhouse_environment(self.wheelhouse))
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_expand_args_in_cwd(self):
         expanded_args = expand_args_by_globbing_items('*.py')
@@ -126,31 +521,98 @@ class PackagingTests(unittest.TestCase):
         self.assertTrue(os.path.isdir('dist'))
 
     def test_build_wheel_no_isolation(self):
-        run_module('build', '--wheel', '--no-isolation')
+        with measure_time(self.timings, 'build wheel without isolation'):
+            run_module('build', '--wheel', '--no-isolation')
         self.assertTrue(os.path.isdir('dist'))
 
+    def test_build_wheel_in_process(self):
+        with tempfile.TemporaryDirectory() as temporary_folder, \
+                measure_time(self.timings, 'build wheel in-process'):
+            wheel_name = call_build_backend_hook(
+                'build_wheel', str(pathlib.Path(temporary_folder).resolve()))
+            self.assertTrue(pathlib.Path(temporary_folder, wheel_name).is_file())
+        self.assertTrue(fnmatch.fnmatch(wheel_name, f'*-{self.version}-*.whl'), msg=wheel_name)
+
     def test_build_source(self):
         run_module('build', '--sdist')
         self.assertTrue(os.path.isdir('dist'))
 
     def test_build_source_no_isolation(self):
-        run_module('build', '--sdist', '--no-isolation')
+        with measure_time(self.timings, 'build source without isolation'):
+            run_module('build', '--sdist', '--no-isolation')
         self.assertTrue(os.path.isdir('dist'))
 
+    def test_build_source_in_process(self):
+        with tempfile.TemporaryDirectory() as temporary_folder, \
+                measure_time(self.timings, 'build source in-process'):
+            sdist_name = call_build_backend_hook(
+                'build_sdist', str(pathlib.Path(temporary_folder).resolve()))
+            self.assertTrue(pathlib.Path(temporary_folder, sdist_name).is_file())
+        self.assertTrue(sdist_name.endswith(f'-{self.version}.tar.gz'), msg=sdist_name)
+
+    def test_prepare_metadata_in_process(self):
+        with tempfile.TemporaryDirectory() as temporary_folder, \
+                measure_time(self.timings, 'prepare metadata in-process'):
+            dist_info_name = call_build_backend_hook(
+                'prepare_metadata_for_build_wheel', str(pathlib.Path(temporary_folder).resolve()))
+            self.assertTrue(pathlib.Path(temporary_folder, dist_info_name, 'METADATA').is_file())
+        self.assertTrue(dist_info_name.endswith(f'-{self.version}.dist-info'), msg=dist_info_name)
+
+    def _expected_packages(self) -> t.Tuple[t.List[str], t.Dict[str, t.List[str]], pathlib.Path]:
+        package = import_module_member('setup', 'Package')
+        source_root = pathlib.Path(package.root_directory)
+        packages = getattr(package, 'packages', None)
+        if packages is None:
+            packages = setuptools.find_packages(str(source_root), exclude=TEST_PACKAGES)
+        return packages, package.package_data, source_root
+
+    def test_inspect_source_tar(self):
+        paths = list(pathlib.Path('dist').glob(f'*-{self.version}.tar.gz'))
+        self.assertGreater(len(paths), 0)
+        packages, package_data, source_root = self._expected_packages()
+        for path in paths:
+            with measure_time(self.timings, f'inspect {path.name}'):
+                report = inspect_source_tar(path)
+            _LOG.info('%s: %i files, %i bytes, compression ratio %.3f',
+                      path, len(report.files), report.archive_size, report.compression_ratio)
+            self.assertIn('PKG-INFO', report.files)
+            prefix = '' if source_root == pathlib.Path() else f'{source_root.as_posix()}/'
+            problems = check_artifact_files(
+                report.files, packages, package_data, source_root=source_root, prefix=prefix)
+            self.assertEqual(problems, [])
+
+    def test_inspect_wheel(self):
+        paths = list(pathlib.Path('dist').glob(f'*-{self.version}-*.whl'))
+        self.assertGreater(len(paths), 0)
+        packages, package_data, source_root = self._expected_packages()
+        for path in paths:
+            with measure_time(self.timings, f'inspect {path.name}'):
+                report = inspect_wheel(path)
+            _LOG.info('%s: %i files, %i bytes, compression ratio %.3f',
+                      path, len(report.files), report.archive_size, report.compression_ratio)
+            self.assertEqual(report.record_errors, [])
+            problems = check_artifact_files(
+                report.files, packages, package_data, excluded_packages=TEST_PACKAGES,
+                source_root=source_root)
+            self.assertEqual(problems, [])
+
     def test_install_code(self):
-        with tempfile.TemporaryDirectory() as temporary_folder:
+        with tempfile.TemporaryDirectory() as temporary_folder, \
+                measure_time(self.timings, 'install code'):
             run_pip('install', '--ignore-installed', '--prefix', temporary_folder, '.')
         self.assertFalse(pathlib.Path(temporary_folder).exists())
 
     def test_install_source_tar(self):
-        with tempfile.TemporaryDirectory() as temporary_folder:
+        with tempfile.TemporaryDirectory() as temporary_folder, \
+                measure_time(self.timings, 'install source tar'):
             run_pip(
                 'install', '--ignore-installed', '--prefix', temporary_folder,
                 f'dist/*-{self.version}.tar.gz', glob=True)
         self.assertFalse(pathlib.Path(temporary_folder).exists())
 
     def test_install_wheel(self):
-        with tempfile.TemporaryDirectory() as temporary_folder:
+        with tempfile.TemporaryDirectory() as temporary_folder, \
+                measure_time(self.timings, 'install wheel'):
             run_pip(
                 'install', '--ignore-installed', '--prefix', temporary_folder,
                 f'dist/*-{self.version}-*.whl', glob=True)
@@ -165,3 +627,93 @@ class PackagingTests(unittest.TestCase):
         run_module('setup', 'wrong_setup_command', run_name='__not_main__')
         with self.assertRaises(SystemExit):
             run_module('setup', 'wrong_setup_command')
+
+
+@unittest.skipUnless(os.environ.get('TEST_PACKAGING') or os.environ.get('CI'),
+                     'skipping packaging tests for actual package')
+class ParallelPackagingTests(unittest.TestCase):
+    """Test if the package can be built and installed, reusing the built artifacts.
+
+    The source distribution and the wheel are built only once per class, and then shared by
+    the install checks, which run concurrently, each in its own temporary prefix.
+
+    Wall time of each stage is recorded in the timings field and logged after all tests.
+    """
+
+    pkg_name: t.Optional[str] = None
+    version: t.Optional[str] = None
+
+    wheelhouse: t.Optional[pathlib.Path] = None
+    """Folder with wheels used instead of a package index, see PackagingTests.wheelhouse."""
+
+    refresh_wheelhouse: bool = False
+    """See PackagingTests.refresh_wheelhouse."""
+
+    max_workers: t.Optional[int] = None
+    """Maximum number of concurrently running install checks, by default chosen automatically."""
+
+    dist_path: pathlib.Path
+    """Folder containing the built artifacts."""
+
+    timings: t.Dict[str, float]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pkg_name = get_package_folder_name() if cls.pkg_name is None else cls.pkg_name
+        cls.version = find_version(cls.pkg_name) if cls.version is None else cls.version
+        cls.timings = {}
+        cls.wheelhouse = find_wheelhouse(
+            cls.wheelhouse, cls.timings, package_name=cls.pkg_name,
+            refresh=cls.refresh_wheelhouse)
+        cls._dist_folder = tempfile.TemporaryDirectory()  # pylint: disable = consider-using-with
+        cls.dist_path = pathlib.Path(cls._dist_folder.name)
+        with unittest.mock.patch.dict(os.environ, wheelhouse_environment(cls.wheelhouse)), \
+                measure_time(cls.timings, 'build sdist and wheel'):
+            run_program(sys.executable, '-m', 'build', '--outdir', str(cls.dist_path))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._dist_folder.cleanup()
+        _LOG.info('%s stage timings:\n%s', cls.__name__, format_timings(cls.timings))
+        super().tearDownClass()
+
+    @property
+    def source_tar_path(self) -> pathlib.Path:
+        paths = list(self.dist_path.glob(f'*-{self.version}.tar.gz'))
+        self.assertEqual(len(paths), 1, msg=paths)
+        return paths[0]
+
+    @property
+    def wheel_path(self) -> pathlib.Path:
+        paths = list(self.dist_path.glob(f'*-{self.version}-*.whl'))
+        self.assertEqual(len(paths), 1, msg=paths)
+        return paths[0]
+
+    def setUp(self):
+        super().setUp()
+        patcher = unittest.mock.patch.dict(os.environ, wheelhouse_environment(self.wheelhouse))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _install(self, stage: str, target: str) -> None:
+        with tempfile.TemporaryDirectory() as temporary_folder, \
+                measure_time(self.timings, stage):
+            run_pip('install', '--ignore-installed', '--prefix', temporary_folder, target)
+
+    def test_artifacts(self):
+        self.assertTrue(self.source_tar_path.is_file())
+        self.assertTrue(self.wheel_path.is_file())
+
+    def test_install_concurrently(self):
+        targets = {
+            'install code': '.',
+            'install source tar': str(self.source_tar_path),
+            'install wheel': str(self.wheel_path)}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                stage: executor.submit(self._install, stage, target)
+                for stage, target in targets.items()}
+        for stage, future in futures.items():
+            with self.subTest(stage=stage):
+                future.result()
@@ -1,31 +1,440 @@
 """Boilerplate for integrating Sentry into the project."""
 
+import atexit
+import collections
+import fnmatch
 import logging
-import os
+import sys
+import threading
+import time
 import typing as t
+import weakref
 
-import sentry_sdk
-import sentry_sdk.integrations
-import sentry_sdk.integrations.argv
-import sentry_sdk.integrations.excepthook
-import sentry_sdk.integrations.logging
-import sentry_sdk.integrations.modules
-import sentry_sdk.integrations.pure_eval
-import sentry_sdk.integrations.stdlib
-import sentry_sdk.integrations.threading
+from .config import EnvSetting, EnvSettings, parse_bool
+
+if t.TYPE_CHECKING:
+    import sentry_sdk.integrations
+    import sentry_sdk.transport
+
+    from .sentry_transport import TransportStats
 
 _LOG = logging.getLogger(__name__)
 
+EventProcessor = t.Callable[
+    [t.Dict[str, t.Any], t.Dict[str, t.Any]], t.Optional[t.Dict[str, t.Any]]]
+"""Function modifying an event in place or dropping it by returning None, like before_send."""
+
+
+def create_default_integrations() -> t.List['sentry_sdk.integrations.Integration']:
+    """Create the integrations enabled by default in Sentry class.
+
+    Sentry SDK modules are imported only here, so that importing this module is cheap.
+    """
+    # pylint: disable = import-outside-toplevel
+    import sentry_sdk.integrations.argv
+    import sentry_sdk.integrations.excepthook
+    import sentry_sdk.integrations.logging
+    import sentry_sdk.integrations.modules
+    import sentry_sdk.integrations.pure_eval
+    import sentry_sdk.integrations.stdlib
+    import sentry_sdk.integrations.threading
+    return [
+        sentry_sdk.integrations.argv.ArgvIntegration(),
+        sentry_sdk.integrations.excepthook.ExcepthookIntegration(always_run=False),
+        sentry_sdk.integrations.logging.LoggingIntegration(
+            level=logging.INFO, event_level=logging.ERROR),
+        sentry_sdk.integrations.modules.ModulesIntegration(),
+        sentry_sdk.integrations.pure_eval.PureEvalIntegration(),
+        sentry_sdk.integrations.stdlib.StdlibIntegration(),
+        sentry_sdk.integrations.threading.ThreadingIntegration()
+    ]
+
+
+class _LazyList:
+    """Class attribute whose list value is created on first access."""
+
+    def __init__(self, factory: t.Callable[[], t.List[t.Any]]):
+        self._factory = factory
+        self._value: t.Optional[t.List[t.Any]] = None
+
+    def __get__(self, instance: t.Any, owner: type) -> t.List[t.Any]:
+        if self._value is None:
+            self._value = self._factory()
+        return self._value
+
+
+class _ThroughputMeter:
+    """Estimate the current number of occurrences of something per second.
+
+    Occurrences are counted in one-second windows. The estimate is the rate from the previous
+    window, or the count so far in the current window if it is already higher,
+    so that a spike is detected within the window in which it happens.
+    """
+
+    def __init__(self, clock: t.Callable[[], float]):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._window_start = clock()
+        self._window_count = 0
+        self._previous_throughput = 0.0
+
+    def observe(self) -> float:
+        """Count a new occurrence and return the estimated current throughput per second."""
+        with self._lock:
+            now = self._clock()
+            elapsed = now - self._window_start
+            if elapsed >= 1.0:
+                self._previous_throughput = self._window_count / elapsed
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            return max(self._previous_throughput, float(self._window_count))
+
+
+class TracesSampler:
+    """Policy deciding which ratio of transactions to sample, to be used as traces_sampler.
+
+    The base ratio is taken from the first rule whose pattern matches the transaction name
+    or, failing that, the transaction operation (e.g. 'http.server'). Patterns use fnmatch
+    syntax. If no rule matches, the default ratio is used.
+
+    If the parent of the transaction was sampled or not, that decision is kept,
+    so that distributed traces are not broken.
+
+    If max_per_second is set, the ratio is lowered whenever the observed throughput
+    of transactions is so high that the expected number of sampled transactions
+    would exceed max_per_second. A spike is detected already within the second
+    in which it happens.
+
+    Sampling of transactions does not affect error events,
+    which are sampled independently according to Sentry's sample_rate option.
+    """
+
+    def __init__(
+            self, default_rate: float = 1.0, rules: t.Optional[t.Mapping[str, float]] = None,
+            max_per_second: t.Optional[float] = None,
+            clock: t.Callable[[], float] = time.monotonic):
+        """Create a sampler.
+
+        :param default_rate: ratio of transactions to sample if no rule matches
+        :param rules: mapping of transaction name or op patterns to ratios
+        :param max_per_second: upper limit of expected number of sampled transactions
+            per second, None means no limit
+        :param clock: source of monotonic time in seconds
+        """
+        self.default_rate = default_rate
+        self.rules = dict(rules or {})
+        self.max_per_second = max_per_second
+        self._throughput = _ThroughputMeter(clock)
+
+    def base_rate(self, name: t.Optional[str], op: t.Optional[str]) -> float:
+        """Get the ratio configured for a transaction, without considering the throughput."""
+        for value in (name, op):
+            if not value:
+                continue
+            for pattern, rate in self.rules.items():
+                if fnmatch.fnmatchcase(value, pattern):
+                    return rate
+        return self.default_rate
+
+    def __call__(self, sampling_context: t.Dict[str, t.Any]) -> float:
+        parent_sampled = sampling_context.get('parent_sampled')
+        if parent_sampled is not None:
+            return float(parent_sampled)
+        transaction_context = sampling_context.get('transaction_context') or {}
+        rate = self.base_rate(transaction_context.get('name'), transaction_context.get('op'))
+        throughput = self._throughput.observe()
+        if rate > 0 and self.max_per_second is not None and throughput * rate > self.max_per_second:
+            rate = self.max_per_second / throughput
+        return rate
+
+
+def event_fingerprint(
+        event: t.Dict[str, t.Any], frames: int = 5) -> t.Tuple[t.Hashable, ...]:
+    """Describe an event by what makes it a duplicate of another event.
+
+    The fingerprint consists of the level, the logger name, the message template
+    (i.e. before formatting with parameters), and the types of exceptions together with
+    a number of innermost frames of each of them.
+    """
+    logentry = event.get('logentry') or {}
+    message = logentry.get('message', event.get('message'))
+    exceptions = []
+    for exception in (event.get('exception') or {}).get('values') or []:
+        stack = (exception.get('stacktrace') or {}).get('frames') or []
+        exceptions.append((
+            exception.get('module'), exception.get('type'),
+            tuple(
+                (frame.get('module') or frame.get('filename'), frame.get('function'),
+                 frame.get('lineno'))
+                for frame in stack[-frames:])))
+    return (event.get('level'), event.get('logger'), message, tuple(exceptions))
+
+
+def _describe_fingerprint(fingerprint: t.Tuple[t.Hashable, ...]) -> str:
+    _, logger, message, exceptions = fingerprint
+    types = ', '.join(str(exception[1]) for exception in exceptions)  # type: ignore
+    return ' '.join(str(_) for _ in (logger, message, types and f'({types})') if _)
+
+
+class EventDeduplicator:
+    """Suppress error events identical to ones recently sent, to be used as an event processor.
+
+    Events are identified by event_fingerprint(). Only the first event with a given
+    fingerprint is sent within ttl seconds. The next event with the same fingerprint
+    sent after that time carries the number of suppressed duplicates
+    in 'duplicates_suppressed' extra data.
+
+    Fingerprints are kept in an LRU cache of limited size. When a fingerprint is forgotten,
+    because no event with it arrived for ttl seconds or because the cache is full,
+    the number of its suppressed duplicates that were not sent yet is logged as a warning,
+    and so is every such number on flush().
+    """
+
+    def __init__(
+            self, ttl: float = 60.0, max_size: int = 1000, frames: int = 5,
+            clock: t.Callable[[], float] = time.monotonic):
+        """Create a deduplicator.
+
+        :param ttl: time in seconds during which duplicates of a sent event are suppressed
+        :param max_size: maximum number of remembered fingerprints
+        :param frames: number of innermost frames of each exception used in the fingerprint
+        :param clock: source of monotonic time in seconds
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.frames = frames
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._seen: t.OrderedDict[t.Hashable, t.List[float]] = collections.OrderedDict()
+        """Time when the last event was sent, number of suppressed duplicates since then,
+        and time of the last duplicate, by fingerprint, least recently seen first."""
+        self.suppressed = 0
+        """Total number of suppressed events."""
+
+    def _forget(self, now: float) -> t.List[t.Tuple[t.Hashable, int]]:
+        """Forget expired and excess fingerprints, and return their unreported duplicates."""
+        forgotten = []
+        while self._seen:
+            fingerprint, entry = next(iter(self._seen.items()))
+            if len(self._seen) <= self.max_size and now - entry[2] < self.ttl:
+                break
+            del self._seen[fingerprint]
+            if entry[1]:
+                forgotten.append((fingerprint, int(entry[1])))
+        return forgotten
+
+    def _report(self, duplicates: t.List[t.Tuple[t.Hashable, int]]) -> None:
+        for fingerprint, count in duplicates:
+            _LOG.warning(
+                'suppressed %i duplicates of Sentry event: %s',
+                count, _describe_fingerprint(fingerprint))  # type: ignore
+
+    def flush(self) -> int:
+        """Log the numbers of suppressed duplicates that were not sent yet, and reset them.
+
+        :return: number of duplicates that were logged
+        """
+        with self._lock:
+            pending = [(key, int(entry[1])) for key, entry in self._seen.items() if entry[1]]
+            for key, _ in pending:
+                self._seen[key][1] = 0
+        self._report(pending)
+        return sum(count for _, count in pending)
+
+    def __call__(
+            self, event: t.Dict[str, t.Any], hint: t.Dict[str, t.Any]
+            ) -> t.Optional[t.Dict[str, t.Any]]:
+        fingerprint = event_fingerprint(event, self.frames)
+        now = self._clock()
+        with self._lock:
+            entry = self._seen.get(fingerprint)
+            if entry is not None and now - entry[0] < self.ttl:
+                entry[1] += 1
+                entry[2] = now
+                self.suppressed += 1
+                self._seen.move_to_end(fingerprint)
+                return None
+            suppressed = 0 if entry is None else int(entry[1])
+            self._seen[fingerprint] = [now, 0, now]
+            self._seen.move_to_end(fingerprint)
+            forgotten = self._forget(now)
+        self._report(forgotten)
+        if suppressed:
+            event.setdefault('extra', {})['duplicates_suppressed'] = suppressed
+        return event
+
+
+def _stacktraces(event: t.Dict[str, t.Any]) -> t.Iterator[t.Dict[str, t.Any]]:
+    """Iterate over stack traces of exceptions and threads in the event."""
+    for interface in ('exception', 'threads'):
+        for value in (event.get(interface) or {}).get('values') or []:
+            stacktrace = value.get('stacktrace')
+            if stacktrace and stacktrace.get('frames'):
+                yield stacktrace
+
+
+class CaptureLimiter:
+    """Limit the size of error events, and make capture cheaper when error rate is high.
+
+    To be used as an event processor. Each stack trace is limited to a number of innermost
+    frames, and local variables are kept only in a number of innermost frames.
+
+    If the error rate exceeds high_error_rate events per second, stricter limits apply
+    to each event: no local variables are kept, and stack traces are shorter. Event processors
+    run before the SDK serializes the event, which is where most of the cost of large events
+    lies, as values of local variables are converted to strings only then.
+    Stack traces attached to messages due to attach_stacktrace option are added by the SDK
+    after event processors, so they are not limited.
+    Options of the Sentry client are never modified.
+    """
+
+    def __init__(
+            self, max_frames: t.Optional[int] = None,
+            max_frames_with_vars: t.Optional[int] = None,
+            high_error_rate: t.Optional[float] = None, high_error_rate_max_frames: int = 10,
+            clock: t.Callable[[], float] = time.monotonic):
+        """Create a limiter.
+
+        :param max_frames: maximum number of frames in each stack trace, None means no limit
+        :param max_frames_with_vars: maximum number of innermost frames keeping local
+            variables, None means no limit
+        :param high_error_rate: number of events per second above which stricter limits apply,
+            None means never
+        :param high_error_rate_max_frames: maximum number of frames in each stack trace
+            when error rate is high
+        :param clock: source of monotonic time in seconds
+        """
+        self.max_frames = max_frames
+        self.max_frames_with_vars = max_frames_with_vars
+        self.high_error_rate = high_error_rate
+        self.high_error_rate_max_frames = high_error_rate_max_frames
+        self._error_rate = _ThroughputMeter(clock)
+
+    def limit(self, event: t.Dict[str, t.Any], max_frames: t.Optional[int],
+              max_frames_with_vars: t.Optional[int]) -> None:
+        """Trim frames and local variables of stack traces in the event in place."""
+        for stacktrace in _stacktraces(event):
+            frames = stacktrace['frames']
+            if max_frames is not None and len(frames) > max_frames:
+                stacktrace['frames_omitted'] = [0, len(frames) - max_frames]
+                frames = stacktrace['frames'] = frames[len(frames) - max_frames:]
+            if max_frames_with_vars is not None:
+                for frame in frames[:max(len(frames) - max_frames_with_vars, 0)]:
+                    frame.pop('vars', None)
+
+    def __call__(
+            self, event: t.Dict[str, t.Any], hint: t.Dict[str, t.Any]
+            ) -> t.Optional[t.Dict[str, t.Any]]:
+        high = self.high_error_rate is not None \
+            and self._error_rate.observe() > self.high_error_rate
+        if high:
+            max_frames = self.high_error_rate_max_frames
+            if self.max_frames is not None:
+                max_frames = min(max_frames, self.max_frames)
+            self.limit(event, max_frames, 0)
+        else:
+            self.limit(event, self.max_frames, self.max_frames_with_vars)
+        return event
+
+
+def _parse_sample_rates(value: str) -> t.Dict[str, float]:
+    """Parse comma-separated list of pattern=ratio items."""
+    rates = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        pattern, separator, rate = item.rpartition('=')
+        if not separator:
+            raise ValueError(f'expected pattern=ratio, got {item.strip()!r}')
+        rates[pattern.strip()] = float(rate)
+    return rates
+
+
+def _parse_max_per_second(value: str) -> t.Optional[float]:
+    """Parse a limit, where 'inf' means no limit."""
+    limit = float(value)
+    return None if limit == float('inf') else limit
+
+
+_EVENT_PROCESSORS: 'weakref.WeakKeyDictionary[t.Any, t.List[EventProcessor]]' = \
+    weakref.WeakKeyDictionary()
+"""Event processors of each Sentry client initialised via Sentry class."""
+
+_EVENT_PROCESSORS_LOCK = threading.Lock()
+
+
+def _process_event(
+        event: t.Dict[str, t.Any], hint: t.Dict[str, t.Any]) -> t.Optional[t.Dict[str, t.Any]]:
+    """Apply event processors of the current Sentry client to an error event.
+
+    It is registered as a global event processor, which the SDK runs before serializing
+    the event, so that events dropped or trimmed by the processors are cheaper to capture.
+    """
+    if event.get('type') not in {None, 'error'}:
+        return event
+    import sentry_sdk  # pylint: disable = import-outside-toplevel
+    for processor in _EVENT_PROCESSORS.get(sentry_sdk.get_client(), ()):
+        event = processor(event, hint)  # type: ignore
+        if event is None:
+            return None
+    return event
+
+
+def _flush_event_processors() -> None:
+    for processors in list(_EVENT_PROCESSORS.values()):
+        for processor in processors:
+            if isinstance(processor, EventDeduplicator):
+                processor.flush()
+
+
+def _set_event_processors(client: t.Any, processors: t.List[EventProcessor]) -> None:
+    """Make the processors apply to error events captured by the client."""
+    # pylint: disable = import-outside-toplevel
+    import sentry_sdk.scope
+    with _EVENT_PROCESSORS_LOCK:
+        if _process_event not in sentry_sdk.scope.global_event_processors:
+            sentry_sdk.scope.add_global_event_processor(_process_event)
+            atexit.register(_flush_event_processors)
+        _EVENT_PROCESSORS[client] = processors
+
+
+ENV_SETTINGS = EnvSettings({
+    **{name: EnvSetting(f'SENTRY_{name.upper()}') for name in ('dsn', 'release', 'environment')},
+    **{name: EnvSetting(f'SENTRY_{name.upper()}', float) for name in (
+        'shutdown_timeout', 'sample_rate', 'traces_sample_rate', 'profiles_sample_rate',
+        'deduplication_ttl', 'high_error_rate')},
+    **{name: EnvSetting(f'SENTRY_{name.upper()}', parse_bool) for name in (
+        'default_integrations', 'debug', 'attach_stacktrace', 'deduplicate_events',
+        'pure_eval', 'include_local_variables', 'batching_transport')},
+    'traces_sample_rates': EnvSetting('SENTRY_TRACES_SAMPLE_RATES', _parse_sample_rates),
+    'traces_max_per_second': EnvSetting('SENTRY_TRACES_MAX_PER_SECOND', _parse_max_per_second)})
+"""Settings of Sentry class which can be set via environment variables.
+
+Each of them is parsed when it is first needed, and reused until its envvar changes.
+"""
+
+_UNSET = object()
+
 
 class Sentry:
     """Sentry configuration.
 
     For parameters 'dsn', 'release', 'environment', 'default_integrations', 'debug',
-    'attach_stacktrace', 'shutdown_timeout', 'traces_sample_rate' and 'profiles_sample_rate'
-    the value is taken from the environment variable if it is set,
+    'attach_stacktrace', 'shutdown_timeout', 'sample_rate', 'traces_sample_rate',
+    'traces_sample_rates', 'traces_max_per_second', 'profiles_sample_rate',
+    'deduplicate_events', 'deduplication_ttl', 'pure_eval', 'include_local_variables',
+    'high_error_rate' and 'batching_transport' the value
+    is taken from the environment variable if it is set,
     otherwise from the class attribute if it is set.
     For those parameters, the expected name of the environment variable name is 'SENTRY_'
-    followed by the parameter name in upper case.
+    followed by the parameter name in upper case. The 'traces_sample_rates' envvar should
+    be a comma-separated list of pattern=ratio items, e.g. '/health*=0,db.*=0.1'.
+
+    Transactions are sampled by a TracesSampler created from 'traces_sample_rate',
+    'traces_sample_rates' and 'traces_max_per_second', unless 'traces_sampler' is given
+    as keyword argument to init(). Note that by default 'traces_max_per_second' is 10,
+    so at most about 10 transactions per second are sampled, even if 'traces_sample_rate' is 1.0.
 
     The class attribute tags, if set, will be added to the global scope of the
     current Sentry SDK.
@@ -40,19 +449,12 @@ class Sentry:
     environment: str
     """Environment name (e.g., 'production', 'staging', 'development')."""
 
-    integrations: t.List[sentry_sdk.integrations.Integration] = [
-        sentry_sdk.integrations.argv.ArgvIntegration(),
-        sentry_sdk.integrations.excepthook.ExcepthookIntegration(always_run=False),
-        sentry_sdk.integrations.logging.LoggingIntegration(
-            level=logging.INFO, event_level=logging.ERROR),
-        sentry_sdk.integrations.modules.ModulesIntegration(),
-        sentry_sdk.integrations.pure_eval.PureEvalIntegration(),
-        sentry_sdk.integrations.stdlib.StdlibIntegration(),
-        sentry_sdk.integrations.threading.ThreadingIntegration()
-    ]
+    integrations: t.List['sentry_sdk.integrations.Integration'] = _LazyList(  # type: ignore
+        create_default_integrations)
     """Sentry SDK integrations to enable.
 
     To configure integrations that are enabled by default, also add them to this list.
+    By default, the list is created from create_default_integrations() on first access.
     """
 
     default_integrations: bool = True
@@ -70,8 +472,25 @@ class Sentry:
     send_default_pii: t.Optional[bool] = False
     """If True, send personally identifiable information."""
 
+    sample_rate: float = 1.0
+    """Ratio of error events to send (0.0 to 1.0), independent from transaction sampling."""
+
     traces_sample_rate: float = 1.0
-    """Ratio of transactions to sample (0.0 to 1.0)."""
+    """Ratio of transactions to sample (0.0 to 1.0) if no rule in traces_sample_rates matches."""
+
+    traces_sample_rates: t.Dict[str, float] = {}
+    """Ratios of transactions to sample, by pattern of transaction name or op.
+
+    For example {'/health*': 0.0, 'db.*': 0.1}. The first matching pattern is used.
+    """
+
+    traces_max_per_second: t.Optional[float] = 10.0
+    """Limit of the expected number of sampled transactions per second.
+
+    When the throughput spikes, sampling ratios are lowered to keep within this limit.
+    If None (or 'inf' when set via envvar), the number is not limited, which was the behaviour
+    before this limit was introduced.
+    """
 
     profiles_sample_rate: float = 1.0
     """Ratio of transactions to profile (0.0 to 1.0)."""
@@ -79,37 +498,125 @@ class Sentry:
     tags: t.Dict[str, str] = {}
     """Tags to be added to all events."""
 
-    @classmethod
-    def _get_str_param(cls, param_name: str) -> t.Optional[str]:
-        """Get a string parameter value by checking envvar first.
+    deduplicate_events: bool = False
+    """If True, suppress error events that duplicate recently sent ones.
+
+    See EventDeduplicator for details. The deduplication runs as an event processor,
+    so duplicates are dropped before they are serialized, and before the 'before_send'
+    callback given to init(), if any, is called.
+    """
+
+    deduplication_ttl: float = 60.0
+    """Time in seconds during which duplicates of a sent error event are suppressed."""
+
+    deduplication_cache_size: int = 1000
+    """Maximum number of distinct error events remembered for the purpose of deduplication."""
+
+    pure_eval: bool = True
+    """If False, PureEvalIntegration is not used even if it is in integrations.
+
+    The integration evaluates expressions in each frame of a stack trace,
+    which is costly in deep call stacks.
+    """
+
+    include_local_variables: bool = True
+    """If True, capture local variables of frames in stack traces."""
+
+    max_value_length: t.Optional[int] = None
+    """Maximum length of captured string values, None means SDK's default."""
+
+    max_stack_frames: t.Optional[int] = None
+    """Maximum number of innermost frames kept in each stack trace of an event."""
 
-        Works only for 'dsn', 'release' or 'environment' parameters.
+    max_stack_frames_with_variables: t.Optional[int] = None
+    """Maximum number of innermost frames of each stack trace that keep local variables."""
 
-        :param param_name: name of the parameter to get
+    high_error_rate: t.Optional[float] = None
+    """Number of error events per second above which events are captured cheaply.
+
+    While the rate is exceeded, local variables are dropped from events and stack traces
+    are limited to high_error_rate_max_stack_frames. See CaptureLimiter for details.
+    """
+
+    high_error_rate_max_stack_frames: int = 10
+    """Maximum number of frames in each stack trace while the error rate is high."""
+
+    batching_transport: bool = False
+    """If True, use BatchingTransport from boilerplates.sentry_transport to send envelopes.
+
+    Ignored if transport_class is set.
+    """
+
+    transport_class: t.Optional[t.Type['sentry_sdk.transport.Transport']] = None
+    """Transport to use instead of the SDK's default one, e.g. a subclass of BatchingTransport."""
+
+    @classmethod
+    def _get_param(cls, param_name: str) -> t.Any:
+        """Get a parameter value from its envvar if it is set, otherwise from class attribute.
+
+        :param param_name: name of the parameter to get, one of ENV_SETTINGS
         :return: value of the parameter
         """
-        assert param_name in ('dsn', 'release', 'environment'), param_name
-        return os.environ.get(f'SENTRY_{param_name.upper()}', getattr(cls, param_name, None))
+        value = ENV_SETTINGS.get(param_name, _UNSET)
+        if value is not _UNSET:
+            return value
+        return getattr(cls, param_name, None)
+
+    @classmethod
+    def _get_integrations(cls) -> t.List['sentry_sdk.integrations.Integration']:
+        if cls._get_param('pure_eval'):
+            return cls.integrations
+        return [_ for _ in cls.integrations if _.identifier != 'pure_eval']
+
+    @classmethod
+    def create_event_processors(cls) -> t.List[EventProcessor]:
+        """Create processors to apply to error events before they are serialized."""
+        processors: t.List[EventProcessor] = []
+        if cls._get_param('deduplicate_events'):
+            processors.append(EventDeduplicator(
+                cls._get_param('deduplication_ttl'), cls.deduplication_cache_size))
+        high_error_rate = cls._get_param('high_error_rate')
+        if cls.max_stack_frames is not None or cls.max_stack_frames_with_variables is not None \
+                or high_error_rate is not None:
+            processors.append(CaptureLimiter(
+                cls.max_stack_frames, cls.max_stack_frames_with_variables, high_error_rate,
+                cls.high_error_rate_max_stack_frames))
+        return processors
+
+    @classmethod
+    def create_traces_sampler(cls) -> TracesSampler:
+        """Create transaction sampling policy according to the configuration."""
+        return TracesSampler(
+            cls._get_param('traces_sample_rate'), cls._get_param('traces_sample_rates'),
+            cls._get_param('traces_max_per_second'))
 
     @classmethod
-    def _get_float_param(cls, param_name: str) -> float:
-        assert param_name in (
-            'shutdown_timeout', 'traces_sample_rate', 'profiles_sample_rate'), param_name
-        if f'SENTRY_{param_name.upper()}' in os.environ:
-            return float(os.environ[f'SENTRY_{param_name.upper()}'])
-        return getattr(cls, param_name)
+    def _get_transport_class(cls) -> t.Optional[t.Type['sentry_sdk.transport.Transport']]:
+        if cls.transport_class is None and cls._get_param('batching_transport'):
+            # pylint: disable = import-outside-toplevel
+            from .sentry_transport import BatchingTransport, is_supported
+            if is_supported():
+                return BatchingTransport
+            _LOG.warning('BatchingTransport is not supported by installed sentry-sdk, not using it')
+        return cls.transport_class
 
     @classmethod
-    def _get_bool_param(cls, param_name: str) -> bool:
-        assert param_name in ('default_integrations', 'debug', 'attach_stacktrace'), param_name
-        if f'SENTRY_{param_name.upper()}' in os.environ:
-            return os.environ[f'SENTRY_{param_name.upper()}'].lower() in {'true', 'yes', 'on', '1'}
-        return getattr(cls, param_name)
+    def transport_stats(cls) -> t.Optional['TransportStats']:
+        """Get counters of the current Sentry transport, if it is a BatchingTransport."""
+        if 'boilerplates.sentry_transport' not in sys.modules:
+            return None
+        # pylint: disable = import-outside-toplevel
+        import sentry_sdk
+        from .sentry_transport import BatchingTransport
+        transport = sentry_sdk.get_client().transport
+        if not isinstance(transport, BatchingTransport):
+            return None
+        return transport.stats()
 
     @classmethod
     def is_dsn_set(cls) -> bool:
         """Check if Sentry DSN parameter is set, thus if Sentry SDK should be initialised or not."""
-        dsn = cls._get_str_param('dsn')
+        dsn = cls._get_param('dsn')
         return dsn is not None and len(dsn) > 0
 
     @classmethod
@@ -122,19 +629,33 @@ class Sentry:
             'positional arguments are not supported, instead please use class attributes,' \
             ' environment variables and for parameters which cannot be set via either' \
             ' please use keyword arguments'
+        import sentry_sdk  # pylint: disable = import-outside-toplevel
+        if 'traces_sampler' not in kwargs:
+            kwargs['traces_sampler'] = cls.create_traces_sampler()
+        if cls.max_value_length is not None:
+            kwargs.setdefault('max_value_length', cls.max_value_length)
+        traces_sample_rate = cls._get_param('traces_sample_rate')
+        profiles_sample_rate = cls._get_param('profiles_sample_rate')
+        if 'transport' not in kwargs and cls._get_transport_class() is not None:
+            kwargs['transport'] = cls._get_transport_class()
         sentry_sdk.init(
-            dsn=cls._get_str_param('dsn'),
-            release=cls._get_str_param('release'),
-            environment=cls._get_str_param('environment'),
-            integrations=cls.integrations,
-            traces_sample_rate=cls._get_float_param('traces_sample_rate'),
-            profiles_sample_rate=cls._get_float_param('profiles_sample_rate'),
-            enable_tracing=cls._get_float_param('profiles_sample_rate') > 0,
-            debug=cls._get_bool_param('debug'),
-            attach_stacktrace=cls._get_bool_param('attach_stacktrace'),
-            shutdown_timeout=cls._get_float_param('shutdown_timeout'),
+            dsn=cls._get_param('dsn'),
+            release=cls._get_param('release'),
+            environment=cls._get_param('environment'),
+            integrations=cls._get_integrations(),
+            include_local_variables=cls._get_param('include_local_variables'),
+            sample_rate=cls._get_param('sample_rate'),
+            traces_sample_rate=traces_sample_rate,
+            profiles_sample_rate=profiles_sample_rate,
+            enable_tracing=max(
+                traces_sample_rate, *cls._get_param('traces_sample_rates').values(),
+                profiles_sample_rate) > 0,
+            debug=cls._get_param('debug'),
+            attach_stacktrace=cls._get_param('attach_stacktrace'),
+            shutdown_timeout=cls._get_param('shutdown_timeout'),
             send_default_pii=cls.send_default_pii,
-            default_integrations=cls._get_bool_param('default_integrations'),
+            default_integrations=cls._get_param('default_integrations'),
             **kwargs)
 
+        _set_event_processors(sentry_sdk.get_client(), cls.create_event_processors())
         sentry_sdk.set_tags(cls.tags)
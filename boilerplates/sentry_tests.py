@@ -0,0 +1,320 @@
+"""Boilerplate for measuring overhead of Sentry integration without a real Sentry instance."""
+
+import collections
+import gzip
+import http.server
+import logging
+import statistics
+import threading
+import time
+import typing as t
+import unittest
+import zlib
+
+import sentry_sdk
+import sentry_sdk.envelope
+
+from .sentry import Sentry
+
+_LOG = logging.getLogger(__name__)
+
+
+def _decompress(body: bytes, content_encoding: str) -> bytes:
+    if content_encoding in {'', 'identity'}:
+        return body
+    if content_encoding == 'gzip':
+        return gzip.decompress(body)
+    if content_encoding == 'deflate':
+        return zlib.decompress(body)
+    if content_encoding == 'br':
+        import brotli  # pylint: disable = import-outside-toplevel
+        return brotli.decompress(body)
+    raise ValueError(f'unsupported content encoding: {content_encoding!r}')
+
+
+class _IngestRequestHandler(http.server.BaseHTTPRequestHandler):
+
+    server: 'FakeSentryServer'
+
+    def do_POST(self):  # pylint: disable = invalid-name
+        """Accept an envelope sent by Sentry SDK."""
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if not self.path.rstrip('/').endswith('/envelope'):
+            self.send_error(404)
+            return
+        try:
+            payload = _decompress(body, self.headers.get('Content-Encoding', '').lower())
+            envelope = sentry_sdk.envelope.Envelope.deserialize(payload)
+        except (OSError, ValueError, zlib.error) as err:
+            _LOG.warning('rejected malformed envelope: %s', err)
+            self.send_error(400)
+            return
+        self.server.record(envelope, len(body))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):  # pylint: disable = redefined-builtin
+        _LOG.debug('%s - %s', self.address_string(), format % args)
+
+
+class FakeSentryServer(http.server.ThreadingHTTPServer):
+    """Local HTTP server accepting envelopes like Sentry ingest does, and recording them.
+
+    Use as a context manager, to serve in a background thread:
+
+    >>> with FakeSentryServer() as server:
+    ...     sentry_sdk.init(dsn=server.dsn)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), _IngestRequestHandler)
+        self._lock = threading.Lock()
+        self._thread: t.Optional[threading.Thread] = None
+        self.envelopes: t.List[sentry_sdk.envelope.Envelope] = []
+        self.item_counts: t.Counter[str] = collections.Counter()
+        """Number of received envelope items, by type, e.g. 'event' or 'transaction'."""
+        self.received_bytes = 0
+        """Total size of received request bodies, before decompression."""
+
+    @property
+    def dsn(self) -> str:
+        """DSN that makes Sentry SDK send envelopes to this server."""
+        host, port = self.server_address[:2]
+        return f'http://public@{host}:{port}/1'
+
+    def record(self, envelope: sentry_sdk.envelope.Envelope, size: int) -> None:
+        """Store a received envelope."""
+        with self._lock:
+            self.envelopes.append(envelope)
+            self.item_counts.update(item.type or 'unknown' for item in envelope.items)
+            self.received_bytes += size
+
+    def reset(self) -> None:
+        """Forget all received envelopes."""
+        with self._lock:
+            self.envelopes = []
+            self.item_counts.clear()
+            self.received_bytes = 0
+
+    def __enter__(self) -> 'FakeSentryServer':
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={'poll_interval': 0.05}, name='fake-sentry-server')
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        assert self._thread is not None
+        self._thread.join()
+        self._thread = None
+        self.server_close()
+
+
+class BenchmarkConfig(t.NamedTuple):
+    """Sentry configuration variant to be benchmarked."""
+
+    traces_sample_rate: float = 1.0
+    profiles_sample_rate: float = 1.0
+    integrations: bool = True
+    """If False, neither the integrations from Sentry.integrations nor the default ones are used."""
+
+    enabled: bool = True
+    """If False, Sentry is not initialised at all, which is the baseline for comparison."""
+
+
+class BenchmarkResult(t.NamedTuple):
+    """Measurements of a workload performed with a given Sentry configuration."""
+
+    config: BenchmarkConfig
+    latencies: t.List[float]
+    """Duration of each call of the workload, in seconds."""
+
+    total_time: float
+    """Wall-clock time of all calls of the workload, excluding the final flush, in seconds."""
+
+    item_counts: t.Dict[str, int]
+    """Envelope items received by the fake server, by type."""
+
+    received_bytes: int
+
+    @property
+    def throughput(self) -> float:
+        """Number of calls of the workload per second."""
+        return len(self.latencies) / self.total_time if self.total_time > 0 else float('inf')
+
+    def latency_quantile(self, quantile: float) -> float:
+        """Get a quantile of latency, e.g. 0.5 for median or 0.99 for 99th percentile."""
+        latencies = sorted(self.latencies)
+        return latencies[min(int(quantile * len(latencies)), len(latencies) - 1)]
+
+    def summary(self) -> str:
+        """Describe the result in a single line."""
+        return (
+            f'{self.config}: {self.throughput:.0f} calls/s,'
+            f' mean {statistics.fmean(self.latencies) * 1e6:.1f}us,'
+            f' p99 {self.latency_quantile(0.99) * 1e6:.1f}us,'
+            f' {sum(self.item_counts.values())} items, {self.received_bytes} bytes sent')
+
+
+def run_workload(
+        workload: t.Callable[[], t.Any], iterations: int, name: str = 'benchmark'
+        ) -> t.Tuple[t.List[float], float]:
+    """Call the workload repeatedly, each time in a new transaction, and time the calls.
+
+    :return: latencies of the calls and total time, in seconds
+    """
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        with sentry_sdk.start_transaction(name=name, op='benchmark'):
+            workload()
+        latencies.append(time.perf_counter() - call_start)
+    return latencies, time.perf_counter() - start
+
+
+def benchmark_sentry(
+        workload: t.Callable[[], t.Any], configs: t.Iterable[BenchmarkConfig],
+        iterations: int = 1000, sentry_class: t.Type[Sentry] = Sentry,
+        server: t.Optional[FakeSentryServer] = None) -> t.List[BenchmarkResult]:
+    """Measure latency and throughput of a workload under different Sentry configurations.
+
+    For each configuration, Sentry is initialised via a subclass of the given Sentry class,
+    pointed at a fake ingest server, and shut down afterwards. Envvars SENTRY_* still take
+    precedence over the benchmarked configuration, so they should not be set.
+
+    :param workload: function simulating handling of a single request
+    :param configs: configurations to compare, e.g. with BenchmarkConfig(enabled=False) first
+    :param iterations: number of calls of the workload for each configuration
+    :param sentry_class: Sentry configuration to start from
+    :param server: server to use, by default a new one is started for the duration of benchmark
+    """
+    if server is None:
+        with FakeSentryServer() as new_server:
+            return benchmark_sentry(workload, configs, iterations, sentry_class, new_server)
+    results = []
+    for config in configs:
+        server.reset()
+        if config.enabled:
+            attributes: t.Dict[str, t.Any] = {
+                'dsn': server.dsn, 'traces_sample_rate': config.traces_sample_rate,
+                'profiles_sample_rate': config.profiles_sample_rate,
+                'traces_max_per_second': None}
+            if not config.integrations:
+                attributes.update({'integrations': [], 'default_integrations': False})
+            type('BenchmarkSentry', (sentry_class,), attributes).init()
+        try:
+            latencies, total_time = run_workload(workload, iterations)
+        finally:
+            if config.enabled:
+                client = sentry_sdk.get_client()
+                client.flush()
+                client.close()
+        result = BenchmarkResult(
+            config, latencies, total_time, dict(server.item_counts), server.received_bytes)
+        _LOG.info('%s', result.summary())
+        results.append(result)
+    return results
+
+
+class CaptureCost(t.NamedTuple):
+    """Cost of capturing an error event with a given Sentry configuration."""
+
+    capture_time: float
+    """Average time of capture_exception() call in the failing thread, in seconds."""
+
+    serialization_time: float
+    """Average time the SDK spent preparing the captured event to be sent, in seconds.
+
+    This includes applying event processors and serializing the event, and is a part of
+    the capture time.
+    """
+
+    size: int
+    """Size of the envelope containing the received event, in bytes."""
+
+    compressed_size: int
+    """Size of the envelope containing the received event after compression, in bytes."""
+
+    frames: int
+    """Number of frames in all stack traces of the event."""
+
+
+def measure_capture_cost(
+        failing: t.Callable[[], t.Any], sentry_class: t.Type[Sentry] = Sentry,
+        repeat: int = 10, server: t.Optional[FakeSentryServer] = None) -> CaptureCost:
+    """Measure how costly it is to capture an exception raised by a function.
+
+    Sentry is initialised via a subclass of the given Sentry class pointed at a fake ingest
+    server, and shut down afterwards. Envvars SENTRY_* take precedence over the class,
+    so they should not be set. Options limiting the events, like deduplication,
+    should be disabled, so that all events reach the server.
+
+    :param failing: function that raises an exception, e.g. from a deep call stack
+    :param sentry_class: Sentry configuration to measure
+    :param repeat: number of captured exceptions
+    :param server: server to use, by default a new one is started for the duration of measurement
+    """
+    assert repeat > 0, repeat
+    if server is None:
+        with FakeSentryServer() as new_server:
+            return measure_capture_cost(failing, sentry_class, repeat, new_server)
+    server.reset()
+    type('MeasuredSentry', (sentry_class,), {'dsn': server.dsn}).init()
+    client = sentry_sdk.get_client()
+    prepare_event = client._prepare_event  # pylint: disable = protected-access
+    capture_time = 0.0
+    prepare_time = 0.0
+
+    def timed_prepare_event(*args, **kwargs):
+        nonlocal prepare_time
+        start = time.perf_counter()
+        try:
+            return prepare_event(*args, **kwargs)
+        finally:
+            prepare_time += time.perf_counter() - start
+
+    client._prepare_event = timed_prepare_event  # pylint: disable = protected-access
+    try:
+        for _ in range(repeat):
+            try:
+                failing()
+            except Exception as err:  # pylint: disable = broad-exception-caught
+                start = time.perf_counter()
+                sentry_sdk.capture_exception(err)
+                capture_time += time.perf_counter() - start
+            else:
+                raise ValueError(f'{failing} did not raise an exception')
+    finally:
+        client.flush()
+        client.close()
+    events = [_.get_event() for _ in server.envelopes if _.get_event() is not None]
+    assert events, 'no events were received'
+    event = events[-1]
+    envelope = sentry_sdk.envelope.Envelope()
+    envelope.add_event(event)
+    body = envelope.serialize()
+    frames = sum(
+        len((value.get('stacktrace') or {}).get('frames') or [])
+        for interface in ('exception', 'threads')
+        for value in (event.get(interface) or {}).get('values') or [])
+    return CaptureCost(
+        capture_time / repeat, prepare_time / repeat, len(body), len(gzip.compress(body, 9)),
+        frames)
+
+
+class FakeSentryTests(unittest.TestCase):
+    """Run each test with a fake Sentry ingest server, available as self.sentry_server."""
+
+    sentry_server: FakeSentryServer
+
+    def setUp(self):
+        self.sentry_server = FakeSentryServer()
+        self.sentry_server.__enter__()  # pylint: disable = unnecessary-dunder-call
+        self.addCleanup(self.sentry_server.__exit__, None, None, None)
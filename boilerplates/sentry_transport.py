@@ -0,0 +1,219 @@
+"""Sentry SDK transport with a bounded queue, batched sending and exported counters."""
+
+import collections
+import inspect
+import logging
+import threading
+import time
+import typing as t
+
+import sentry_sdk.consts
+import sentry_sdk.envelope
+import sentry_sdk.transport
+
+_LOG = logging.getLogger(__name__)
+
+DROP_POLICIES = {'newest', 'oldest', 'block'}
+
+SDK_INTERNALS = ('_send_envelope', '_flush_client_reports')
+"""Non-public synchronous methods of HttpTransport which BatchingTransport relies on.
+
+They exist in sentry-sdk 2.x, and their presence is verified by is_supported().
+"""
+
+
+def is_supported() -> bool:
+    """Check if the installed Sentry SDK provides internals needed by BatchingTransport."""
+    for name in SDK_INTERNALS:
+        method = getattr(sentry_sdk.transport.HttpTransport, name, None)
+        if not callable(method) or inspect.iscoroutinefunction(method):
+            return False
+    return True
+
+
+class TransportStats(t.NamedTuple):
+    """Snapshot of counters of a BatchingTransport."""
+
+    queued: int
+    """Number of envelopes accepted into the queue."""
+
+    sent: int
+    """Number of envelopes sent, including the ones rejected by Sentry."""
+
+    dropped: int
+    """Number of envelopes dropped because the queue was full or transport was killed."""
+
+    failed: int
+    """Number of envelopes which could not be sent due to network or other errors."""
+
+    batches: int
+    """Number of times the sending thread drained the queue."""
+
+    queue_length: int
+    """Number of envelopes waiting in the queue at the time of the snapshot."""
+
+    send_latency_total: float
+    """Total time of sending envelopes, in seconds."""
+
+    send_latency_max: float
+    """Longest time of sending a single envelope, in seconds."""
+
+    @property
+    def send_latency_mean(self) -> float:
+        """Average time of sending a single envelope, in seconds."""
+        attempts = self.sent + self.failed
+        return self.send_latency_total / attempts if attempts else 0.0
+
+
+class BatchingTransport(sentry_sdk.transport.HttpTransport):
+    """HTTP transport which queues envelopes and sends them in batches from a single thread.
+
+    Sentry accepts one envelope per request, so a batch is a series of requests sent back
+    to back over the same keep-alive connection pool, and the sending thread wakes up once
+    per batch instead of once per envelope.
+
+    The queue is bounded, and when it is full the drop policy decides which envelope is lost:
+    'newest' drops the incoming envelope, 'oldest' drops the longest waiting one to make room,
+    and 'block' makes the capturing thread wait up to block_timeout for free space.
+
+    To adjust the configuration, create a subclass and override the class attributes.
+
+    Some non-public internals of the SDK's HttpTransport are used, see SDK_INTERNALS.
+    If they are missing, creating the transport raises TypeError.
+    """
+
+    queue_size: int = 1000
+    """Maximum number of envelopes waiting to be sent."""
+
+    batch_size: int = 100
+    """Maximum number of envelopes sent in one batch."""
+
+    drop_policy: str = 'oldest'
+    """What to drop when the queue is full, one of DROP_POLICIES."""
+
+    block_timeout: float = 0.1
+    """Maximum time in seconds to wait for free space in the queue, if drop policy is 'block'."""
+
+    compression_level: t.Optional[int] = None
+    """Compression level of envelopes, 0 disables compression, None means SDK's default."""
+
+    def __init__(self, options: t.Dict[str, t.Any]):
+        assert self.drop_policy in DROP_POLICIES, self.drop_policy
+        if not is_supported():
+            raise TypeError(
+                f'{type(self).__name__} is not compatible with sentry-sdk'
+                f' {sentry_sdk.consts.VERSION}, which lacks some of {SDK_INTERNALS}')
+        super().__init__(options)
+        if self.compression_level is not None:
+            if not hasattr(self, '_compression_level'):
+                raise TypeError(
+                    f'compression level cannot be set with sentry-sdk {sentry_sdk.consts.VERSION}')
+            self._compression_level = self.compression_level
+        self._queue: t.Deque[sentry_sdk.envelope.Envelope] = collections.deque()
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._thread: t.Optional[threading.Thread] = None
+        self._killed = False
+        self._counters: t.Counter[str] = collections.Counter()
+        self._send_latency_total = 0.0
+        self._send_latency_max = 0.0
+
+    def stats(self) -> TransportStats:
+        """Get a consistent snapshot of counters, e.g. to be exported to a metrics system."""
+        with self._condition:
+            return TransportStats(
+                self._counters['queued'], self._counters['sent'], self._counters['dropped'],
+                self._counters['failed'], self._counters['batches'], len(self._queue),
+                self._send_latency_total, self._send_latency_max)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name='sentry-batching-transport', daemon=True)
+            self._thread.start()
+
+    def _drop(self, envelope: sentry_sdk.envelope.Envelope, reason: str = 'full_queue') -> None:
+        """Count the envelope as dropped, and record its items as lost in client reports."""
+        self._counters['dropped'] += 1
+        self.on_dropped_event(reason)
+        for item in envelope.items:
+            self.record_lost_event('queue_overflow', item=item)
+
+    def capture_envelope(self, envelope: sentry_sdk.envelope.Envelope) -> None:
+        with self._condition:
+            if self._killed:
+                self._drop(envelope, 'killed')
+                return
+            if len(self._queue) >= self.queue_size:
+                if self.drop_policy == 'oldest':
+                    self._drop(self._queue.popleft())
+                elif self.drop_policy == 'block':
+                    self._condition.wait_for(
+                        lambda: len(self._queue) < self.queue_size, self.block_timeout)
+            if len(self._queue) >= self.queue_size:
+                self._drop(envelope)
+                return
+            self._queue.append(envelope)
+            self._counters['queued'] += 1
+            self._ensure_thread()
+            self._condition.notify_all()
+
+    def _send_batch(self, batch: t.List[sentry_sdk.envelope.Envelope]) -> None:
+        for envelope in batch:
+            start = time.perf_counter()
+            try:
+                self._send_envelope(envelope)
+                outcome = 'sent'
+            except Exception:  # pylint: disable = broad-exception-caught
+                _LOG.debug('failed to send envelope to Sentry', exc_info=True)
+                outcome = 'failed'
+            latency = time.perf_counter() - start
+            with self._condition:
+                self._counters[outcome] += 1
+                self._send_latency_total += latency
+                self._send_latency_max = max(self._send_latency_max, latency)
+        try:
+            self._flush_client_reports()
+        except Exception:  # pylint: disable = broad-exception-caught
+            _LOG.debug('failed to send client reports to Sentry', exc_info=True)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._killed)
+                if self._killed:
+                    return
+                batch = [
+                    self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+                self._counters['batches'] += 1
+                self._condition.notify_all()
+            try:
+                self._send_batch(batch)
+            finally:
+                with self._condition:
+                    self._in_flight = 0
+                    self._condition.notify_all()
+
+    def flush(
+            self, timeout: float, callback: t.Optional[t.Callable[[int, float], None]] = None
+            ) -> None:
+        """Wait at most timeout seconds until all queued envelopes are sent."""
+        if timeout <= 0:
+            return
+        with self._condition:
+            pending = len(self._queue) + self._in_flight
+            if pending and callback is not None:
+                callback(pending, timeout)
+            if not self._condition.wait_for(
+                    lambda: not self._queue and not self._in_flight, timeout):
+                _LOG.debug('%i envelopes still pending after flush', len(self._queue))
+
+    def kill(self) -> None:
+        """Stop the sending thread, dropping all queued envelopes."""
+        with self._condition:
+            self._killed = True
+            while self._queue:
+                self._drop(self._queue.popleft(), 'killed')
+            self._condition.notify_all()
+        super().kill()
@@ -1,9 +1,14 @@
 """Boilerplate for creating a Python package using setup.py."""
 
+import fnmatch
+import functools
 import logging
+import os
 import pathlib
+import re
 import runpy
 import sys
+import time
 import typing as t
 
 import docutils.frontend
@@ -24,12 +29,24 @@ DEFAULT_LICENSE_FILE_PATTENS = [
    'CONTRIBUTORS', 'CONTRIBUTORS.*', 'LICENSE', 'LICENSE.*', 'NOTICE', 'NOTICE.*'
 ]
 
+_RACY_MTIME_NS = 2 * 10 ** 9
+
 TEST_PACKAGES = [
     'test',
     'test.*',
     'tests',
     'tests.*']
 
+LAST_MINOR_VERSIONS = {1: 6, 2: 7}
+"""Last minor version of each major Python version which had no further releases."""
+
+PRUNED_DIRECTORIES = {'__pycache__', 'build', 'dist', 'node_modules', 'venv'}
+"""Top-level directories never searched for packages when finding packages incrementally.
+
+They usually contain build artefacts or environments, not packages. Subpackages with these names,
+e.g. mypkg.build, are still found.
+"""
+
 
 def find_version(
         package_name: str, version_module_name: str = '_version',
@@ -49,17 +66,216 @@ def find_version(
     return version_module_vars[version_variable_name]
 
 
-def find_packages(root_directory: str = '.') -> t.List[str]:
+class DirectoryListingCache:
+    """Answer questions about contents of directories using cached results of os.scandir.
+
+    Each directory is scanned at most once, and then all queries about its entries are answered
+    from memory, which is much cheaper than making a syscall for each query.
+
+    If check_mtime is True, the modification time of a directory is checked on each access
+    and the directory is scanned again if it changed, so the cache can be kept for a long time.
+    Listings of directories modified very recently are not reused, because a change made
+    within the timestamp granularity of the filesystem might not be reflected in the mtime.
+
+    If max_size is set, only that many most recently used listings are kept.
+    """
+
+    def __init__(self, check_mtime: bool = False, max_size: t.Optional[int] = None):
+        self.check_mtime = check_mtime
+        self.max_size = max_size
+        self._listings: t.Dict[str, t.Tuple[t.Optional[int], t.Dict[str, os.DirEntry]]] = {}
+
+    def entries(self, directory: t.Union[pathlib.Path, str]) -> t.Dict[str, os.DirEntry]:
+        """Get entries of a given directory, mapped by name.
+
+        Non-existing or inaccessible directories are treated as empty.
+        """
+        directory = str(directory)
+        mtime = None
+        if self.check_mtime:
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                self._listings.pop(directory, None)
+                return {}
+        cached = self._listings.pop(directory, None)
+        if cached is not None and cached[0] == mtime:
+            self._listings[directory] = cached
+            return cached[1]
+        listing = self._scan(directory)
+        if mtime is None or time.time_ns() - mtime >= _RACY_MTIME_NS:
+            self._listings[directory] = (mtime, listing)
+            if self.max_size is not None and len(self._listings) > self.max_size:
+                del self._listings[next(iter(self._listings))]
+        return listing
+
+    @staticmethod
+    def _scan(directory: str) -> t.Dict[str, os.DirEntry]:
+        _LOG.debug('DirectoryListingCache: scanning directory "%s"', directory)
+        try:
+            with os.scandir(directory) as scanned_entries:
+                return {entry.name: entry for entry in scanned_entries}
+        except OSError:
+            return {}
+
+    def exists(self, root_dir: pathlib.Path, path: pathlib.PurePath) -> bool:
+        """Check if a given path, relative to root_dir, points to an existing file or directory.
+
+        Paths that go up the directory tree are checked directly, without using the cache.
+        """
+        if path.is_absolute() or '..' in path.parts:
+            try:
+                root_dir.joinpath(path).resolve(strict=True)
+            except FileNotFoundError:
+                return False
+            return True
+        parts = [part for part in path.parts if part != '.']
+        directory = str(root_dir)
+        for i, part in enumerate(parts):
+            entry = self.entries(directory).get(part)
+            if entry is None:
+                return False
+            if entry.is_symlink() and not os.path.exists(entry.path):
+                return False
+            if i < len(parts) - 1 and not entry.is_dir():
+                return False
+            directory = entry.path
+        return True
+
+
+_DIRECTORY_LISTINGS = DirectoryListingCache(check_mtime=True, max_size=1024)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_glob_segment(segment: str) -> re.Pattern[str]:
+    flags = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+    return re.compile(fnmatch.translate(segment), flags)
+
+
+def glob_many(
+        directory: t.Union[pathlib.Path, str], patterns: t.Iterable[str],
+        first_match_only: bool = False) -> t.Dict[str, t.List[str]]:
+    """Match many glob patterns at once, scanning each directory at most once.
+
+    Patterns have the same syntax as in pathlib.Path.glob(), including recursive "**".
+    Directory listings are cached between calls, and are invalidated when a directory
+    is modified.
+
+    :param directory: directory relative to which the patterns are matched
+    :param patterns: relative glob patterns
+    :param first_match_only: if True, stop searching for matches of each pattern after
+        the first match is found
+    :return: sorted list of matching paths, relative to the directory, for each pattern
+    """
+    results: t.Dict[str, t.Set[str]] = {}
+    segments: t.Dict[str, t.List[str]] = {}
+    directories_only = set()
+    for pattern in patterns:
+        if os.path.isabs(pattern):
+            raise ValueError(f'non-relative pattern "{pattern}" is unsupported')
+        results[pattern] = set()
+        if pattern.endswith(('/', os.sep)):
+            directories_only.add(pattern)
+        segments[pattern] = [
+            _ for _ in pathlib.PurePath(pattern).as_posix().split('/') if _ not in ('', '.')]
+
+    def with_recursive_skipped(states: t.Iterable[t.Tuple[str, int]]) -> t.Set[t.Tuple[str, int]]:
+        expanded = set()
+        for pattern, i in states:
+            expanded.add((pattern, i))
+            while i < len(segments[pattern]) and segments[pattern][i] == '**':
+                i += 1
+                expanded.add((pattern, i))
+        return expanded
+
+    root = os.path.abspath(directory)
+    pending = [(root, '', with_recursive_skipped((pattern, 0) for pattern in segments))]
+    while pending:
+        path, relative_path, states = pending.pop()
+        entries = _DIRECTORY_LISTINGS.entries(path)
+        children: t.Dict[str, t.Tuple[str, t.Set[t.Tuple[str, int]]]] = {}
+        for pattern, i in states:
+            if first_match_only and results[pattern]:
+                continue
+            if i == len(segments[pattern]):
+                results[pattern].add(relative_path or '.')
+                continue
+            segment = segments[pattern][i]
+            if segment == '**':
+                for name, entry in entries.items():
+                    if entry.is_dir() and not entry.is_symlink():
+                        children.setdefault(name, (entry.path, set()))[1].add((pattern, i))
+                continue
+            if segment == '..':
+                children.setdefault('..', (os.path.join(path, '..'), set()))[1].add(
+                    (pattern, i + 1))
+                continue
+            regex = _compile_glob_segment(segment)
+            last = i + 1 == len(segments[pattern])
+            for name, entry in entries.items():
+                if regex.match(name) is None:
+                    continue
+                if last and (pattern not in directories_only or entry.is_dir()):
+                    results[pattern].add(os.path.join(relative_path, name))
+                    if first_match_only:
+                        break
+                elif not last and entry.is_dir():
+                    children.setdefault(name, (entry.path, set()))[1].add((pattern, i + 1))
+        for name, (child_path, child_states) in children.items():
+            pending.append((
+                child_path, os.path.join(relative_path, name),
+                with_recursive_skipped(child_states)))
+    return {pattern: sorted(matches) for pattern, matches in results.items()}
+
+
+def find_packages(root_directory: str = '.', incremental: bool = False) -> t.List[str]:
     """Find packages to pack.
 
     :param root_directory: directory to start searching from
+    :param incremental: if True, use a cache of directory listings kept between calls,
+        so that only directories modified since the previous call are scanned again;
+        the result is the same as without it, except that top-level PRUNED_DIRECTORIES
+        are not searched
     :return: list of packages
     """
     exclude = TEST_PACKAGES if ('bdist_wheel' in sys.argv or 'bdist' in sys.argv) else []
+    if incremental:
+        return _find_packages_incremental(root_directory, exclude)
     packages_list = setuptools.find_packages(root_directory, exclude=exclude)
     return packages_list
 
 
+def _find_packages_incremental(root_directory: str, exclude: t.Sequence[str]) -> t.List[str]:
+    """Find packages like setuptools.find_packages does, but using cached directory listings.
+
+    Like in setuptools, a directory is checked for __init__.py with a single stat,
+    and only listings of packages are scanned, and cached. Excluded packages are filtered out
+    during the search, and their subpackages are not searched if they are excluded as well.
+    Top-level PRUNED_DIRECTORIES are skipped without being checked.
+    """
+    listings = _DIRECTORY_LISTINGS
+    exclude = ['ez_setup', '*__pycache__', *exclude]
+    excluded = re.compile('|'.join(fnmatch.translate(pattern) for pattern in exclude))
+    packages_list = []
+    directories = [('', os.path.abspath(root_directory))]
+    while directories:
+        package_prefix, directory = directories.pop()
+        for name, entry in sorted(listings.entries(directory).items()):
+            if '.' in name or not entry.is_dir():
+                continue
+            if not package_prefix and name in PRUNED_DIRECTORIES:
+                continue
+            if not os.path.isfile(os.path.join(entry.path, '__init__.py')):
+                continue
+            package = f'{package_prefix}{name}'
+            if excluded.match(package) is None:
+                packages_list.append(package)
+            if f'{package}*' in exclude or f'{package}.*' in exclude:
+                continue
+            directories.append((f'{package}.', entry.path))
+    return sorted(packages_list)
+
+
 def parse_requirements(
         requirements_path: str = 'requirements.txt') -> t.List[str]:
     """Read contents of requirements.txt file and return data from its relevant lines.
@@ -82,38 +298,72 @@ def parse_requirements(
     return requirements
 
 
+VersionTuple = t.Tuple[int, ...]
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_version_classifier_pattern(version_prefix: str, only_suffix: str) -> re.Pattern[str]:
+    return re.compile(
+        f'{re.escape(version_prefix)}(?P<version>[0-9]+(?:\\.[0-9]+)*)'
+        f'(?P<only>{re.escape(only_suffix)})?')
+
+
+@functools.lru_cache(maxsize=1024)
+def _partition_version_classifiers(
+        classifiers: t.Tuple[str, ...], version_prefix: str, only_suffix: str
+        ) -> t.Tuple[t.Tuple[VersionTuple, ...], t.Tuple[VersionTuple, ...]]:
+    pattern = _compile_version_classifier_pattern(version_prefix, only_suffix)
+    versions_min: t.List[VersionTuple] = []
+    versions_only: t.List[VersionTuple] = []
+    for classifier in classifiers:
+        match = pattern.fullmatch(classifier)
+        if match is None:
+            continue
+        versions = versions_min if match.group('only') is None else versions_only
+        versions.append(tuple(int(_) for _ in match.group('version').split('.')))
+    return tuple(versions_min), tuple(versions_only)
+
+
 def partition_version_classifiers(
-        classifiers: t.Sequence[str], version_prefix: str = 'Programming Language :: Python :: ',
+        classifiers: t.Iterable[str], version_prefix: str = 'Programming Language :: Python :: ',
         only_suffix: str = ' :: Only'
-        ) -> t.Tuple[t.List[t.Tuple[int, ...]], t.List[t.Tuple[int, ...]]]:
+        ) -> t.Tuple[t.List[VersionTuple], t.List[VersionTuple]]:
     """Find version number classifiers in given list and partition them into 2 groups.
 
     The 2 groups being:
     1. minimum versions, any version at least as high this is compatible
     2. only versions, this specific version is compatible, but nothing is said about other versions
 
+    Results are memoized per sequence of classifiers.
+
     :param classifiers: sequence of trove classifiers to be analysed
     :param version_prefix: prefix that identifies a version classifier
     :param only_suffix: prefix that identifies an "only version" classifier
     :return: parsed and partitioned version tuples
     """
-    versions_min: t.List[t.Tuple[int, ...]] = []
-    versions_only: t.List[t.Tuple[int, ...]] = []
-    for classifier in classifiers:
-        version = classifier.replace(version_prefix, '')
-        versions = versions_min
-        if version.endswith(only_suffix):
-            version = version.replace(only_suffix, '')
-            versions = versions_only
-        try:
-            versions.append(tuple(int(_) for _ in version.split('.')))
-        except ValueError:
-            pass
-    return versions_min, versions_only
+    versions_min, versions_only = _partition_version_classifiers(
+        tuple(classifiers), version_prefix, only_suffix)
+    return list(versions_min), list(versions_only)
+
+
+def _find_only_version(
+        versions_min: t.Sequence[VersionTuple], versions_only: t.Sequence[VersionTuple],
+        only_suffix: str) -> t.Optional[VersionTuple]:
+    """Return the "only" version, if any, after checking it for consistency with other versions."""
+    if len(versions_only) > 1:
+        raise ValueError(f'more than one "{only_suffix}" version encountered in {versions_only}')
+    if not versions_only:
+        return None
+    only_version = versions_only[0]
+    for version in versions_min:
+        if version[:len(only_version)] != only_version:
+            raise ValueError(f'the "{only_suffix}" version {only_version}'
+                             f' is inconsistent with version {version}')
+    return only_version
 
 
 def find_required_python_version(
-        classifiers: t.Sequence[str], version_prefix: str = 'Programming Language :: Python :: ',
+        classifiers: t.Iterable[str], version_prefix: str = 'Programming Language :: Python :: ',
         only_suffix: str = ' :: Only') -> t.Optional[str]:
     """Determine the minimum required Python version.
 
@@ -122,17 +372,16 @@ def find_required_python_version(
     :param only_suffix: prefix that identifies an "only version" classifier
     :return: minimum required Python version string, if any
     """
-    versions_min, versions_only = partition_version_classifiers(
+    return _find_required_python_version(tuple(classifiers), version_prefix, only_suffix)
+
+
+@functools.lru_cache(maxsize=1024)
+def _find_required_python_version(
+        classifiers: t.Tuple[str, ...], version_prefix: str, only_suffix: str
+        ) -> t.Optional[str]:
+    versions_min, versions_only = _partition_version_classifiers(
         classifiers, version_prefix, only_suffix)
-    if len(versions_only) > 1:
-        raise ValueError(f'more than one "{only_suffix}" version encountered in {versions_only}')
-    only_version = None
-    if len(versions_only) == 1:
-        only_version = versions_only[0]
-        for version in versions_min:
-            if version[:len(only_version)] != only_version:
-                raise ValueError(f'the "{only_suffix}" version {only_version}'
-                                 f' is inconsistent with version {version}')
+    only_version = _find_only_version(versions_min, versions_only, only_suffix)
     min_supported_version = None
     for version in versions_min:
         if min_supported_version is None or \
@@ -146,6 +395,70 @@ def find_required_python_version(
     return None
 
 
+def find_python_version_specifier(
+        classifiers: t.Iterable[str], version_prefix: str = 'Programming Language :: Python :: ',
+        only_suffix: str = ' :: Only') -> t.Optional[str]:
+    """Determine the complete specifier of supported Python versions.
+
+    Unlike find_required_python_version(), the resulting specifier has also an upper bound,
+    and it excludes versions which are not listed but which fall between listed versions.
+    For example, classifiers for versions 2.7, 3.5 and 3.6 result in the following specifier:
+    ">=2.7, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*, !=3.4.*, <3.7".
+
+    Minor versions above the highest listed one of a lower major version are excluded as well,
+    as long as the last minor version of that major version is in LAST_MINOR_VERSIONS.
+
+    The "only" version counts as a listed version, and a major version without any listed minor
+    versions, e.g. "2" next to "3.6", is supported entirely.
+
+    :param classifiers: sequence of trove classifiers to be analysed
+    :param version_prefix: prefix that identifies a version classifier
+    :param only_suffix: prefix that identifies an "only version" classifier
+    :return: version specifier string, if any
+    """
+    return _find_python_version_specifier(tuple(classifiers), version_prefix, only_suffix)
+
+
+@functools.lru_cache(maxsize=1024)
+def _find_python_version_specifier(
+        classifiers: t.Tuple[str, ...], version_prefix: str, only_suffix: str
+        ) -> t.Optional[str]:
+    versions_min, versions_only = _partition_version_classifiers(
+        classifiers, version_prefix, only_suffix)
+    only_version = _find_only_version(versions_min, versions_only, only_suffix)
+    versions = [*versions_min, *([] if only_version is None else [only_version])]
+    minors_by_major: t.Dict[int, t.Set[int]] = {}
+    for version in versions:
+        minors = minors_by_major.setdefault(version[0], set())
+        if len(version) >= 2:
+            minors.add(version[1])
+    if not minors_by_major:
+        return None
+    # majors without any listed minor version are supported entirely
+    lowest_major, highest_major = min(minors_by_major), max(minors_by_major)
+    lowest_minors = minors_by_major[lowest_major]
+    specifiers = [
+        f'>={lowest_major}.{min(lowest_minors)}' if lowest_minors else f'>={lowest_major}']
+    for major in range(lowest_major, highest_major + 1):
+        minors = minors_by_major.get(major)
+        if minors is None:
+            specifiers.append(f'!={major}.*')
+            continue
+        if not minors:
+            continue
+        first_minor = min(minors) if major == lowest_major else 0
+        last_minor = max(minors) + 1 if major == highest_major \
+            else LAST_MINOR_VERSIONS.get(major, max(minors)) + 1
+        specifiers += [
+            f'!={major}.{minor}.*' for minor in range(first_minor, last_minor)
+            if minor not in minors]
+    highest_minors = minors_by_major[highest_major]
+    specifiers.append(
+        f'<{highest_major}.{max(highest_minors) + 1}' if highest_minors
+        else f'<{highest_major + 1}')
+    return ', '.join(specifiers)
+
+
 def parse_rst(text: str) -> docutils.nodes.document:
     """Parse text assuming it's an RST markup."""
     parser = docutils.parsers.rst.Parser()
@@ -163,6 +476,7 @@ class RelativeRefFinder(docutils.nodes.NodeVisitor):
         super().__init__(*args, **kwargs)
         self.root_dir = root_dir
         self.references: t.List[docutils.nodes.reference] = []
+        self._listings = DirectoryListingCache()
 
     def visit_reference(self, node: docutils.nodes.reference) -> None:
         """Call for "reference" nodes."""
@@ -179,9 +493,7 @@ class RelativeRefFinder(docutils.nodes.NodeVisitor):
             # reference points to a section in a file
             # we ignore the section part when checking if file exists
             path = path.with_name(path.name[:path.name.index('#')])
-        try:
-            self.root_dir.joinpath(path).resolve(strict=True)
-        except FileNotFoundError:
+        if not self._listings.exists(self.root_dir, path):
             return
         _LOG.debug('RelativeRefFinder: reference points to existing file')
         self.references.append(node)
@@ -268,6 +580,12 @@ class Package:
     license_file_patterns: t.Sequence[str] = DEFAULT_LICENSE_FILE_PATTENS
     _existing_license_file_patterns: t.Optional[t.Sequence[str]] = None
 
+    search_license_files_in_packages: bool = False
+    """If True, look for files matching license file patterns also in all packages.
+
+    This is useful if some of the packages contain vendored code with its own license.
+    """
+
     classifiers: t.List[str] = []
     """List of trove classifiers for the package.
 
@@ -356,14 +674,20 @@ class Package:
     def _prepare_existing_license_file_patterns(cls):
         if cls._existing_license_file_patterns is not None:
             return
+        patterns = list(cls.license_file_patterns)
+        if cls.search_license_files_in_packages:
+            for package in getattr(cls, 'packages', []):
+                package_path = pathlib.PurePosixPath(cls.root_directory, *package.split('.'))
+                patterns += [
+                    package_path.joinpath(pattern).as_posix()
+                    for pattern in cls.license_file_patterns]
+        results = glob_many(pathlib.Path().resolve(), patterns, first_match_only=True)
         cls._existing_license_file_patterns = []
-        for pattern in cls.license_file_patterns:
-            results = list(pathlib.Path().resolve().glob(pattern))
-            _LOG.debug(
-                'found %i files matching pattern "%s" in current working directory',
-                len(results), pattern)
-            if len(results) == 0:
+        for pattern, paths in results.items():
+            if not paths:
                 continue
+            _LOG.debug('found file "%s" matching pattern "%s" in current working directory',
+                       paths[0], pattern)
             cls._existing_license_file_patterns.append(pattern)
 
     @classmethod
@@ -1,8 +1,12 @@
 """Tests for boilerplates.config module."""
 
+import logging
+import multiprocessing
 import os
 import pathlib
 import tempfile
+import threading
+import time
 import unittest
 import unittest.mock
 
@@ -31,6 +35,35 @@ class UnitTests(unittest.TestCase):
             boilerplates.config.normalize_path(pathlib.Path(r'${MY_CUSTOM_VAR}', 'something')),
             pathlib.Path(envvar_value).joinpath('something'))
 
+    def test_normalize_path_cache(self):
+        # pylint: disable = protected-access
+        cache_info = boilerplates.config._expand_path.cache_info
+        path = pathlib.Path('/already', 'normalized')
+        self.assertIs(boilerplates.config.normalize_path(path), path)
+        with unittest.mock.patch.object(os.path, 'expandvars') as expandvars:
+            self.assertEqual(boilerplates.config.normalize_path('plain/path'), 'plain/path')
+        expandvars.assert_not_called()
+
+        home_envvar = 'USERPROFILE' if os.name == 'nt' else 'HOME'
+        with unittest.mock.patch.dict(os.environ, {
+                'MY_CACHED_VAR': 'first', 'HOME': '/home1', home_envvar: '/home1'}):
+            self.assertEqual(
+                boilerplates.config.normalize_path('~/$MY_CACHED_VAR'), '/home1/first')
+            hits = cache_info().hits
+            self.assertEqual(
+                boilerplates.config.normalize_path('~/$MY_CACHED_VAR'), '/home1/first')
+            self.assertEqual(cache_info().hits, hits + 1)
+            os.environ['MY_CACHED_VAR'] = 'second'
+            self.assertEqual(
+                boilerplates.config.normalize_path('~/${MY_CACHED_VAR}'), '/home1/second')
+            self.assertEqual(
+                boilerplates.config.normalize_path('~/$MY_CACHED_VAR'), '/home1/second')
+            self.assertEqual(boilerplates.config.normalize_path('$HOME\u00e9'), '/home1\u00e9')
+            os.environ.update({'HOME': '/home2', home_envvar: '/home2'})
+            self.assertEqual(
+                boilerplates.config.normalize_path('~/$MY_CACHED_VAR'), '/home2/second')
+            self.assertEqual(boilerplates.config.normalize_path('$HOME\u00e9'), '/home2\u00e9')
+
     def test_initialize_config_directory(self):
         with tempfile.TemporaryDirectory() as temp_dir:
             with unittest.mock.patch.object(
@@ -52,3 +85,345 @@ class UnitTests(unittest.TestCase):
                 self.assertTrue(boilerplates.config.CONFIGS_PATH.joinpath('logging').is_dir())
                 boilerplates.config.initialize_config_directory('logging')
                 self.assertTrue(boilerplates.config.CONFIGS_PATH.joinpath('logging').is_dir())
+
+
+class EnvSettingsTests(unittest.TestCase):
+    """Test typed settings read from environment variables."""
+
+    def test_parsers(self):
+        self.assertTrue(boilerplates.config.parse_bool('Yes'))
+        self.assertFalse(boilerplates.config.parse_bool('spam'))
+        self.assertEqual(boilerplates.config.parse_logging_level('info'), logging.INFO)
+        self.assertEqual(boilerplates.config.parse_logging_level('35'), 35)
+        with self.assertRaises(ValueError):
+            boilerplates.config.parse_logging_level('BASIC_FORMAT')
+
+    def test_snapshot(self):
+        parse = unittest.mock.Mock(side_effect=int)
+        settings = boilerplates.config.EnvSettings({
+            'number': boilerplates.config.EnvSetting('TEST_ENV_SETTINGS_NUMBER', parse),
+            'text': boilerplates.config.EnvSetting('TEST_ENV_SETTINGS_TEXT')})
+        with unittest.mock.patch.dict(os.environ, {'TEST_ENV_SETTINGS_NUMBER': '42'}):
+            self.assertEqual(settings.snapshot(), {'number': 42})
+            self.assertEqual(settings.get('number'), 42)
+            self.assertEqual(settings.get('text', 'default'), 'default')
+            self.assertEqual(parse.call_count, 1)
+            with self.assertRaises(TypeError):
+                settings.snapshot()['number'] = 0
+            os.environ['TEST_ENV_SETTINGS_TEXT'] = 'spam'
+            self.assertEqual(settings.snapshot(), {'number': 42, 'text': 'spam'})
+            self.assertEqual(parse.call_count, 1)
+            os.environ['TEST_ENV_SETTINGS_NUMBER'] = '43'
+            self.assertEqual(settings.get('number'), 43)
+            self.assertEqual(parse.call_count, 2)
+            settings.reload()
+            self.assertEqual(parse.call_count, 3)
+        self.assertEqual(settings.snapshot(), {})
+
+    def test_invalid_value(self):
+        settings = boilerplates.config.EnvSettings({
+            'strict': boilerplates.config.EnvSetting('TEST_ENV_SETTINGS_STRICT', float),
+            'lenient': boilerplates.config.EnvSetting('TEST_ENV_SETTINGS_LENIENT', float, False)})
+        with unittest.mock.patch.dict(os.environ, {'TEST_ENV_SETTINGS_LENIENT': 'spam'}), \
+                self.assertLogs('boilerplates.config', logging.WARNING):
+            self.assertEqual(settings.snapshot(), {})
+        with unittest.mock.patch.dict(os.environ, {'TEST_ENV_SETTINGS_STRICT': 'spam'}):
+            self.assertEqual(settings.get('lenient', 1.0), 1.0)
+            with self.assertRaisesRegex(ValueError, 'TEST_ENV_SETTINGS_STRICT'):
+                settings.snapshot()
+            with self.assertRaisesRegex(ValueError, 'TEST_ENV_SETTINGS_STRICT'):
+                settings.get('strict')
+
+
+def _write_old_file(path: pathlib.Path, text: str, age: float = 10.0) -> None:
+    """Write a file and set its modification time in the past, so that it can be cached."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+    timestamp = time.time() - age
+    os.utime(path, (timestamp, timestamp))
+
+
+def _increment_count(config):
+    config['count'] = config.get('count', 0) + 1
+
+
+def _concurrent_config_worker(configs_path: str, barrier, increments: int) -> None:
+    """Create the config directory and update the same config file with many processes at once."""
+    boilerplates.config.CONFIGS_PATH = pathlib.Path(configs_path)
+    path = boilerplates.config.CONFIGS_PATH.joinpath('my_app', 'config.json')
+    barrier.wait()
+    boilerplates.config.initialize_config_directory('my_app')
+    for _ in range(increments):
+        boilerplates.config.update_config_file(path, _increment_count)
+        assert 'count' in boilerplates.config.parse_config_file(path)
+
+
+class ConfigFilesTests(unittest.TestCase):
+    """Test parsing, caching and layering of configuration files."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self._tmpdir.name)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_parse_config_file(self):
+        _write_old_file(self.path.joinpath('a.toml'), 'x = 1\n[section]\ny = "spam"\n')
+        _write_old_file(self.path.joinpath('a.json'), '{"x": 1, "section": {"y": "spam"}}')
+        _write_old_file(self.path.joinpath('a.ini'), '[section]\ny = spam\n')
+        parse = boilerplates.config.parse_config_file
+        self.assertEqual(parse(self.path.joinpath('a.toml')), {'x': 1, 'section': {'y': 'spam'}})
+        self.assertEqual(parse(self.path.joinpath('a.json')), {'x': 1, 'section': {'y': 'spam'}})
+        self.assertEqual(parse(self.path.joinpath('a.ini')), {'section': {'y': 'spam'}})
+        for name, text in [
+                ('b.toml', 'x = '), ('b.json', '[1]'), ('b.ini', 'x = 1'), ('b.yaml', 'x: 1')]:
+            _write_old_file(self.path.joinpath(name), text)
+            with self.assertRaises(ValueError, msg=name):
+                parse(self.path.joinpath(name))
+
+    def test_parsed_file_cache(self):
+        cache = boilerplates.config.ParsedFileCache()
+        path = self.path.joinpath('config.json')
+        self.assertIsNone(cache.get(path))
+        _write_old_file(path, '{"x": 1}')
+        self.assertEqual(cache.get(path), {'x': 1})
+        self.assertIs(cache.get(path), cache.get(path))
+        self.assertEqual(cache.parse_count, 1)
+        _write_old_file(path, '{"x": 22}')
+        self.assertEqual(cache.get(path), {'x': 22})
+        self.assertEqual(cache.parse_count, 2)
+        path.write_text('{"x": 3}', encoding='utf-8')
+        self.assertEqual(cache.get(path), {'x': 3})
+        self.assertEqual(cache.get(path), {'x': 3})
+        self.assertEqual(cache.parse_count, 4)
+        cache.clear()
+
+    def test_merge_configs(self):
+        base = {'a': 1, 'b': {'c': 2, 'd': 3}, 'e': [1]}
+        merged = boilerplates.config.merge_configs(base, {'b': {'c': 4}, 'e': [2], 'f': 5})
+        self.assertEqual(merged, {'a': 1, 'b': {'c': 4, 'd': 3}, 'e': [2], 'f': 5})
+        self.assertEqual(base, {'a': 1, 'b': {'c': 2, 'd': 3}, 'e': [1]})
+
+    def _patch_config_paths(self):
+        system_path, user_path = self.path.joinpath('system'), self.path.joinpath('user')
+        for name, path in [('SYSTEM_CONFIGS_PATH', system_path), ('CONFIGS_PATH', user_path)]:
+            patcher = unittest.mock.patch.object(boilerplates.config, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return system_path.joinpath('my_app'), user_path.joinpath('my_app')
+
+    def test_config_loader(self):
+        system_path, user_path = self._patch_config_paths()
+
+        class Config(boilerplates.config.ConfigLoader):
+            app_name = 'my_app'
+            defaults = {'a': 0, 'b': 0, 'section': {'c': 0, 'd': 0}}
+            envvar_prefix = 'TEST_CONFIG_LOADER_'
+
+        loader = Config()
+        self.assertEqual(loader.load(), Config.defaults)
+        _write_old_file(system_path.joinpath('config.toml'), 'a = 1\nb = 1\n[section]\nc = 1\n')
+        _write_old_file(user_path.joinpath('config.ini'), '[section]\nd = user\n')
+        _write_old_file(user_path.joinpath('config.json'), '{"b": 2}')
+        self.assertTrue(loader.changed())
+        config = loader.load()
+        self.assertEqual(config, {'a': 1, 'b': 2, 'section': {'c': 1, 'd': 'user'}})
+        self.assertFalse(loader.changed())
+        self.assertIs(loader.load(), config)
+        with unittest.mock.patch.dict(os.environ, {'TEST_CONFIG_LOADER_SECTION__C': '3'}):
+            self.assertTrue(loader.changed())
+            self.assertEqual(loader.load()['section'], {'c': 3, 'd': 'user'})
+        self.assertEqual(loader.load(), config)
+
+    def test_config_loader_reuses_parsed_files(self):
+        _, user_path = self._patch_config_paths()
+
+        class Config(boilerplates.config.ConfigLoader):
+            app_name = 'my_app'
+            use_system_config = False
+
+        _write_old_file(user_path.joinpath('config.toml'), 'a = 1\n')
+        _write_old_file(user_path.joinpath('config.json'), '{"b": 2}')
+        parse_count = boilerplates.config.PARSED_FILES.parse_count
+        self.assertEqual(Config().load(), {'a': 1, 'b': 2})
+        _write_old_file(user_path.joinpath('config.json'), '{"b": 33}')
+        self.assertEqual(Config().load(), {'a': 1, 'b': 33})
+        self.assertEqual(boilerplates.config.PARSED_FILES.parse_count, parse_count + 3)
+
+    def test_watch(self):
+        _, user_path = self._patch_config_paths()
+
+        class Config(boilerplates.config.ConfigLoader):
+            app_name = 'my_app'
+            use_system_config = False
+            poll_interval = 0.01
+
+        changed = threading.Event()
+        configs = []
+
+        def callback(config):
+            configs.append(config)
+            changed.set()
+
+        loader = Config()
+        loader.watch(callback)
+        try:
+            deadline = time.monotonic() + 5
+            with self.assertLogs('boilerplates.config', logging.WARNING) as context, \
+                    unittest.mock.patch.object(
+                        boilerplates.config, 'parse_config_file',
+                        wraps=boilerplates.config.parse_config_file) as parse_mock:
+                _write_old_file(user_path.joinpath('config.json'), '{"b": ')
+                while not context.records and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                time.sleep(0.05)
+                parse_count, records_count = parse_mock.call_count, len(context.records)
+                time.sleep(0.1)
+                self.assertEqual(parse_mock.call_count, parse_count)
+                self.assertEqual(len(context.records), records_count)
+            _write_old_file(user_path.joinpath('config.json'), '{"b": 2}')
+            self.assertTrue(changed.wait(5))
+        finally:
+            loader.stop_watching()
+        loader.stop_watching()
+        self.assertEqual(configs, [{'b': 2}])
+
+    def test_watch_callback_error(self):
+        _, user_path = self._patch_config_paths()
+
+        class Config(boilerplates.config.ConfigLoader):
+            app_name = 'my_app'
+            use_system_config = False
+            poll_interval = 0.01
+
+        changed = threading.Event()
+        configs = []
+
+        def callback(config):
+            configs.append(config)
+            if len(configs) == 1:
+                raise RuntimeError('callback failed')
+            changed.set()
+
+        loader = Config()
+        loader.watch(callback)
+        try:
+            with self.assertLogs('boilerplates.config', logging.ERROR) as context:
+                _write_old_file(user_path.joinpath('config.json'), '{"b": 1}')
+                deadline = time.monotonic() + 5
+                while not context.records and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            self.assertIn('callback failed', context.output[0])
+            _write_old_file(user_path.joinpath('config.json'), '{"b": 2}')
+            self.assertTrue(changed.wait(5))
+        finally:
+            loader.stop_watching()
+        self.assertEqual(configs, [{'b': 1}, {'b': 2}])
+
+
+class ConfigWritingTests(unittest.TestCase):
+    """Test atomic and concurrent writing of configuration files."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self._tmpdir.name)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _leftover_temp_files(self):
+        return list(self.path.rglob('*.tmp'))
+
+    def test_write_config_file(self):
+        config = {'section': {'a': '1', 'b': 'spam'}}
+        for name in ('config.json', 'config.ini'):
+            path = self.path.joinpath('app', name)
+            boilerplates.config.write_config_file(path, config)
+            self.assertEqual(boilerplates.config.parse_config_file(path), config)
+        with self.assertRaises(ValueError):
+            boilerplates.config.write_config_file(self.path.joinpath('config.ini'), {'a': 1})
+        with self.assertRaises(ValueError):
+            boilerplates.config.write_config_file(self.path.joinpath('config.toml'), config)
+        self.assertFalse(self.path.joinpath('config.toml').exists())
+        self.assertEqual(self._leftover_temp_files(), [])
+
+    def test_write_file_atomically(self):
+        path = self.path.joinpath('config.json')
+        boilerplates.config.write_file_atomically(path, b'{}')
+        if os.name != 'nt':
+            self.assertEqual(path.stat().st_mode & 0o777, 0o600)
+            path.chmod(0o640)
+        inode = path.stat().st_ino
+        with unittest.mock.patch.object(os, 'fsync', side_effect=OSError('disk full')), \
+                self.assertRaises(OSError):
+            boilerplates.config.write_file_atomically(path, b'{"a": 1}')
+        self.assertEqual(path.read_bytes(), b'{}')
+        self.assertEqual(self._leftover_temp_files(), [])
+        boilerplates.config.write_file_atomically(path, b'{"a": 1}')
+        self.assertEqual(path.read_bytes(), b'{"a": 1}')
+        self.assertNotEqual(path.stat().st_ino, inode)
+        if os.name != 'nt':
+            self.assertEqual(path.stat().st_mode & 0o777, 0o640)
+
+    def test_write_file_atomically_retry(self):
+        path = self.path.joinpath('config.json')
+        replace = os.replace
+        attempts = []
+
+        def busy_replace(source, target):
+            attempts.append(target)
+            if len(attempts) < 3:
+                raise PermissionError('file is open in another process')
+            replace(source, target)
+
+        with unittest.mock.patch.object(
+                boilerplates.config, '_REPLACE_RETRY_ERRORS', (PermissionError,)), \
+                unittest.mock.patch.object(os, 'replace', side_effect=busy_replace):
+            boilerplates.config.write_file_atomically(path, b'{}')
+            self.assertEqual(len(attempts), 3)
+            with unittest.mock.patch.object(boilerplates.config, 'REPLACE_TIMEOUT', 0.05):
+                with unittest.mock.patch.object(
+                        os, 'replace', side_effect=PermissionError('always open')), \
+                        self.assertRaises(PermissionError):
+                    boilerplates.config.write_file_atomically(path, b'{"a": 1}')
+        self.assertEqual(path.read_bytes(), b'{}')
+        self.assertEqual(self._leftover_temp_files(), [])
+
+    def test_config_file_lock_timeout(self):
+        path = self.path.joinpath('config.json')
+        with boilerplates.config.config_file_lock(path):
+            with self.assertRaises(TimeoutError):
+                with boilerplates.config.config_file_lock(path, timeout=0.05):
+                    self.fail('lock was taken twice')
+            with self.assertRaises(TimeoutError):
+                boilerplates.config.update_config_file(path, _increment_count, timeout=0)
+        with boilerplates.config.config_file_lock(path, timeout=0):
+            pass
+        self.assertFalse(path.exists())
+
+    def test_update_config_file(self):
+        path = self.path.joinpath('config.json')
+        self.assertEqual(
+            boilerplates.config.update_config_file(path, _increment_count), {'count': 1})
+        self.assertEqual(
+            boilerplates.config.update_config_file(path, lambda config: {'other': True}),
+            {'other': True})
+        self.assertEqual(boilerplates.config.parse_config_file(path), {'other': True})
+
+    def test_concurrent_writers(self):
+        processes_count, increments = 16, 10
+        barrier = multiprocessing.Barrier(processes_count)
+        processes = [
+            multiprocessing.Process(
+                target=_concurrent_config_worker, args=(str(self.path), barrier, increments))
+            for _ in range(processes_count)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+        self.assertEqual([_.exitcode for _ in processes], [0] * processes_count)
+        path = self.path.joinpath('my_app', 'config.json')
+        self.assertEqual(
+            boilerplates.config.parse_config_file(path), {'count': processes_count * increments})
+        self.assertEqual(self._leftover_temp_files(), [])
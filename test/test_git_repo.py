@@ -1,6 +1,10 @@
 """Perform tests on and in synthetic git repositories."""
 
+import os
 import pathlib
+import unittest.mock
+
+import git
 
 import boilerplates.git_repo_tests
 
@@ -21,6 +25,85 @@ class GitRepoSelfTests(boilerplates.git_repo_tests.GitRepoTests):
         path = pathlib.Path(__file__).resolve().parent.parent
         self.git_clone('origin', str(path))
 
+    def test_fast_import(self):
+        self.git_init()
+        commit = boilerplates.git_repo_tests.FastImportCommit
+        hexshas = self.git_fast_import([
+            commit({'a.txt': 'a\n', 'b.txt': b'b\n'}, 'first', tags=['v0.1.0']),
+            commit({'a.txt': 'aa\n'}, 'second'),
+            commit({'c.txt': 'c\n'}, 'on feature', branch='feature', parent=':1'),
+            commit(
+                {'b.txt': None, 'c.txt': 'c\n'}, 'merge feature', merges=['feature'],
+                tags=['v0.2.0'])])
+        self.assertEqual(len(hexshas), 4)
+        self.assertEqual(self.repo_head_hexsha, hexshas[-1][:8])
+        self.assertEqual(len(self.repo.head.commit.parents), 2)
+        self.assertEqual(self.repo.tags['v0.1.0'].commit.hexsha, hexshas[0])
+        self.assertEqual(self.repo.heads['feature'].commit.hexsha, hexshas[2])
+        self.assertFalse(self.repo.is_dirty(untracked_files=True))
+        self.assertEqual(self.repo_path.joinpath('a.txt').read_text(encoding='utf-8'), 'aa\n')
+        self.assertTrue(self.repo_path.joinpath('c.txt').is_file())
+        self.assertFalse(self.repo_path.joinpath('b.txt').exists())
+        self.git_fast_import([commit({'d.txt': 'd\n'}, 'after import')])
+        self.assertEqual(self.repo.head.commit.parents[0].hexsha, hexshas[-1])
+        self.repo_path.joinpath('a.txt').write_text('uncommitted\n', encoding='utf-8')
+        self.git_fast_import([commit({'e.txt': 'e\n'}, 'elsewhere', branch='feature')])
+        self.assertEqual(
+            self.repo_path.joinpath('a.txt').read_text(encoding='utf-8'), 'uncommitted\n')
+        self.assertFalse(self.repo_path.joinpath('e.txt').exists())
+
+    def test_fast_import_error(self):
+        self.git_init()
+        commit = boilerplates.git_repo_tests.FastImportCommit
+        with self.assertRaises(AssertionError):
+            self.git_fast_import([commit({'a.txt': 'a\n'}, parent='no_such_branch')])
+
+    def test_fast_import_detached_head(self):
+        self.git_init()
+        commit = boilerplates.git_repo_tests.FastImportCommit
+        first, _ = self.git_fast_import([commit({'a.txt': 'a\n'}), commit({'a.txt': 'aa\n'})])
+        self.repo.git.checkout('--detach', first)
+        with self.assertRaisesRegex(ValueError, 'detached'):
+            self.git_fast_import([commit({'b.txt': 'b\n'})])
+        hexshas = self.git_fast_import(
+            [commit({'b.txt': 'b\n'}), commit({'c.txt': 'c\n'}, branch='other')],
+            default_branch='from_detached')
+        self.assertTrue(self.repo.head.is_detached)
+        self.assertEqual(self.repo.head.commit.hexsha, first)
+        self.assertEqual(self.repo.heads['from_detached'].commit.hexsha, hexshas[0])
+        self.assertEqual(self.repo.heads['from_detached'].commit.parents[0].hexsha, first)
+        self.assertEqual(self.repo.heads['other'].commit.parents, ())
+
+    def test_local_remote(self):
+        url = self.git_init_remote()
+        self.assertTrue(url.startswith('file://'))
+        self.git_init()
+        self.repo.create_remote('origin', url)
+        self.git_commit_new_file()
+        self.git_push()
+        other_repo = self.git_clone_additional(url)
+        self.assertEqual(other_repo.head.commit.hexsha[:8], self.repo_head_hexsha)
+        pathlib.Path(other_repo.working_tree_dir, 'other.txt').write_text('ham\n', 'utf-8')
+        other_repo.index.add(['other.txt'])
+        other_repo.index.commit('other commit')
+        other_repo.create_tag('v1.0.0')
+        self.git_push('HEAD', 'v1.0.0', repo=other_repo)
+        self.git_fetch()
+        self.assertEqual(
+            self.repo.remotes.origin.refs[0].commit.hexsha, other_repo.head.commit.hexsha)
+        self.assertIn('v1.0.0', [tag.name for tag in self.repo.tags])
+
+    def test_git_daemon(self):
+        url = self.git_init_remote('served')
+        self.git_init()
+        self.git_commit_new_file()
+        base_url = self.git_daemon()
+        self.repo.create_remote('served', f'{base_url}served.git')
+        self.git_push(remote_name='served')
+        other_repo = self.git_clone_additional(f'{base_url}served.git')
+        self.assertEqual(other_repo.head.commit.hexsha[:8], self.repo_head_hexsha)
+        self.assertTrue(url.endswith('served.git'))
+
     def test_no_repo(self):
         self.assertIsNone(self.repo)
 
@@ -29,3 +112,132 @@ class GitRepoSelfTests(boilerplates.git_repo_tests.GitRepoTests):
         pth = self.git_commit_new_file()
         pth.unlink()
         self.assertFalse(pth.is_file())
+
+    def test_subprocess_counts(self):
+        self.git_init()
+        self.assertEqual(self.repo.config_reader().get_value('user', 'name'), 'Your Name')
+        self.assertEqual(self.git_subprocess_counts['config'], 0)
+        self.git_commit_new_file()
+        head = self.repo_head_hexsha
+        count = self.git_subprocess_count
+        self.assertEqual(self.repo_head_hexsha, head)
+        self.assertEqual(self.git_subprocess_count, count)
+        self.repo.git.commit('--allow-empty', '--quiet', '-m', 'empty')
+        self.assertEqual(self.git_subprocess_counts['commit'], 1)
+        self.assertNotEqual(self.repo_head_hexsha, head)
+        self.assertEqual(self.repo_head_hexsha, self.repo.head.commit.hexsha[:8])
+        self.repo.git.pack_refs('--all')
+        self.repo.git.commit('--allow-empty', '--quiet', '-m', 'after packing')
+        self.assertEqual(self.repo_head_hexsha, self.repo.head.commit.hexsha[:8])
+        self.repo.git.checkout('--quiet', '--detach', 'HEAD~1')
+        self.assertEqual(self.repo_head_hexsha, self.repo.head.commit.hexsha[:8])
+        self.repo.git.checkout('--quiet', '-')
+        self.assertEqual(self.repo_head_hexsha, self.repo.head.commit.hexsha[:8])
+        self.git_fast_import([boilerplates.git_repo_tests.FastImportCommit({'a.txt': 'a\n'})])
+        self.assertEqual(self.git_subprocess_counts['fast-import'], 1)
+        self.assertEqual(self.repo_head_hexsha, self.repo.head.commit.hexsha[:8])
+
+    def test_repo_head_hexsha_reftable(self):
+        self.git_init()
+        self.git_commit_new_file()
+        head = self.repo_head_hexsha
+        # simulate reftable format, in which .git/HEAD and loose refs never change
+        self.repo_path.joinpath('.git', 'reftable').mkdir()
+        head_mock = unittest.mock.PropertyMock()
+        head_mock.return_value.commit.hexsha = 'f' * 40
+        with unittest.mock.patch.object(git.Repo, 'head', new_callable=lambda: head_mock):
+            self.assertEqual(self.repo_head_hexsha, 'f' * 8)
+            head_mock.return_value.commit.hexsha = 'e' * 40
+            self.assertEqual(self.repo_head_hexsha, 'e' * 8)
+        self.assertEqual(self.repo_head_hexsha, head)
+
+
+class GitRepoTemplateTests(boilerplates.git_repo_tests.GitRepoTests):
+    """Check that repositories created from a template are independent copies."""
+
+    templates_built = 0
+
+    @classmethod
+    def build_template_repo(cls, repo):
+        cls.templates_built += 1
+        for i in range(3):
+            path = pathlib.Path(repo.working_tree_dir, f'file_{i}.txt')
+            path.write_text(f'content {i}\n', encoding='utf-8')
+            repo.index.add([path.name])
+            repo.index.commit(f'commit {i}')
+        repo.create_tag('v0.1.0')
+        repo.create_head('feature')
+
+    def _check_copy(self):
+        repo = self.git_init_from_template()
+        self.assertEqual(self.templates_built, 1)
+        self.assertEqual(len(list(repo.iter_commits())), 3)
+        self.assertIn('v0.1.0', [tag.name for tag in repo.tags])
+        self.assertIn('feature', [head.name for head in repo.heads])
+        self.assertFalse(repo.is_dirty(untracked_files=True))
+        self.git_modify_file(self.repo_path.joinpath('file_0.txt'), commit=True)
+        self.git_commit_new_file()
+        self.assertEqual(len(list(repo.iter_commits())), 5)
+        template_path = self._template_repo_path()  # pylint: disable = protected-access
+        with git.Repo(str(template_path)) as template_repo:
+            self.assertEqual(len(list(template_repo.iter_commits())), 3)
+
+    def test_copy_1(self):
+        self._check_copy()
+
+    def test_copy_2(self):
+        self._check_copy()
+
+
+class GitRepoRamDiskTests(boilerplates.git_repo_tests.GitRepoTests):
+    """Check that GitRepoTests class works with RAM disk option enabled."""
+
+    use_ram_disk = True
+
+    def test_ram_disk(self):
+        ram_disk_path = boilerplates.git_repo_tests.find_ram_disk()
+        if ram_disk_path is not None:
+            self.assertEqual(self.repo_path.parent, ram_disk_path)
+        self.git_init()
+        with self.repo.config_reader() as config:
+            self.assertEqual(config.get_value('gc', 'auto'), 0)
+            self.assertEqual(config.get_value('core', 'fsync'), 'none')
+        self.git_commit_new_file()
+
+
+class GitRepoIsolatedTests(boilerplates.git_repo_tests.GitRepoTests):
+    """Check that GitRepoTests class works with isolated git configuration."""
+
+    isolate_git_config = True
+
+    def test_isolated_config(self):
+        self.assertIn(boilerplates.git_repo_tests.worker_id(), self.repo_path.name)
+        global_config_path = pathlib.Path(os.environ['GIT_CONFIG_GLOBAL'])
+        self.assertTrue(global_config_path.is_file())
+        self.assertEqual(pathlib.Path(os.environ['HOME']), global_config_path.parent)
+        self.git_init()
+        self.repo.git.config('--global', 'alias.spam', 'status')
+        with git.GitConfigParser(str(global_config_path), read_only=True) as config:
+            self.assertEqual(config.get_value('alias', 'spam'), 'status')
+        self.git_commit_new_file()
+
+    def test_repos_closed(self):
+        self.git_init()
+        first_repo = self.repo
+        self.git_init()
+        self.assertIsNot(self.repo, first_repo)
+        patcher = unittest.mock.patch.object(
+            git.Repo, 'close', autospec=True, side_effect=git.Repo.close)
+        close_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        # cleanups run after tearDown(), in reverse order
+        self.addCleanup(lambda: self.assertEqual(close_mock.call_count, 2))
+
+    def test_assigned_repo_closed(self):
+        self.git_init()
+        self.repo = git.Repo(self.repo_path)
+        patcher = unittest.mock.patch.object(
+            git.Repo, 'close', autospec=True, side_effect=git.Repo.close)
+        close_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: self.assertEqual(close_mock.call_count, 2))
@@ -82,6 +82,18 @@ class UtilityTests(unittest.TestCase):
         self.assertEqual(boilerplates.logging.logging_level_from_envvar(envvar), 35)
         del os.environ[envvar]
 
+    def test_level_global_from_envvar(self):
+        class Logging(boilerplates.logging.Logging):
+            level_global = 42
+        with unittest.mock.patch.dict(os.environ):
+            os.environ.pop(boilerplates.logging.LEVEL_ENVVAR_NAME, None)
+            self.assertEqual(Logging._level_global(), 42)
+            os.environ[boilerplates.logging.LEVEL_ENVVAR_NAME] = 'error'
+            self.assertEqual(Logging._level_global(), logging.ERROR)
+            os.environ[boilerplates.logging.LEVEL_ENVVAR_NAME] = 'erroneous'
+            with self.assertLogs('boilerplates.config', logging.WARNING):
+                self.assertEqual(Logging._level_global(), 42)
+
     def test_log_filename_basic(self):
         self.assertEqual(boilerplates.logging.log_filename_basic('my_software'), 'my_software.log')
 
@@ -1,12 +1,250 @@
 """Tests for packaging."""
 
+import base64
+import hashlib
+import io
+import logging
+import os
+import pathlib
+import sys
+import tarfile
+import tempfile
+import time
+import unittest
+import unittest.mock
+import zipfile
+
 from version_query import predict_version_str
 
 import boilerplates.packaging_tests
+import boilerplates.setup
 
 VERSION = predict_version_str()
 
 
+def _record_hash(data: bytes) -> str:
+    digest = hashlib.sha256(data).digest()
+    return 'sha256=' + base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+def _create_wheel(path: pathlib.Path, files: dict, record_overrides: dict = None) -> None:
+    record = {name: f'{name},{_record_hash(data)},{len(data)}' for name, data in files.items()}
+    record.update(record_overrides or {})
+    record_path = 'pkg-1.0.dist-info/RECORD'
+    record[record_path] = f'{record_path},,'
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as wheel:
+        for name, data in files.items():
+            wheel.writestr(name, data)
+        wheel.writestr(record_path, '\n'.join(record.values()) + '\n')
+
+
+class UtilityTests(unittest.TestCase):
+
+    def test_measure_time(self):
+        timings = {}
+        with boilerplates.packaging_tests.measure_time(timings, 'sleep'):
+            time.sleep(0.01)
+        with self.assertRaises(ValueError), \
+                boilerplates.packaging_tests.measure_time(timings, 'error'):
+            raise ValueError()
+        self.assertEqual(list(timings), ['sleep', 'error'])
+        self.assertGreaterEqual(timings['sleep'], 0.01)
+        report = boilerplates.packaging_tests.format_timings(timings)
+        self.assertEqual(len(report.splitlines()), 2)
+        self.assertTrue(report.startswith('sleep '), msg=report)
+
+    def test_expand_args_by_globbing_items(self):
+        with tempfile.TemporaryDirectory() as temporary_folder:
+            cwd = pathlib.Path(temporary_folder)
+            cwd.joinpath('dist').mkdir()
+            for name in ('pkg-1.0.tar.gz', 'pkg-1.0-py3-none-any.whl'):
+                cwd.joinpath('dist', name).touch()
+            expanded_args = boilerplates.packaging_tests.expand_args_by_globbing_items(
+                'install', 'dist/*.whl', '--prefix', 'dist/*-1.0*', cwd=cwd)
+            with self.assertRaises(AssertionError):
+                boilerplates.packaging_tests.expand_args_by_globbing_items('dist/*.zip', cwd=cwd)
+        wheel_path = str(pathlib.Path('dist', 'pkg-1.0-py3-none-any.whl'))
+        source_tar_path = str(pathlib.Path('dist', 'pkg-1.0.tar.gz'))
+        self.assertEqual(
+            expanded_args, ('install', wheel_path, '--prefix', wheel_path, source_tar_path))
+
+    def test_wheelhouse_environment(self):
+        self.assertEqual(boilerplates.packaging_tests.wheelhouse_environment(None), {})
+        environment = boilerplates.packaging_tests.wheelhouse_environment(pathlib.Path('wheels'))
+        self.assertEqual(environment['PIP_NO_INDEX'], '1')
+        self.assertEqual(environment['PIP_FIND_LINKS'], str(pathlib.Path('wheels').resolve()))
+
+    def test_find_wheelhouse(self):
+        def prepare(path, source_path, package_name):
+            self.assertEqual(package_name, 'pkg')
+            path.mkdir(exist_ok=True)
+            path.joinpath('spam-1.0-py3-none-any.whl').touch()
+            path.joinpath(boilerplates.packaging_tests.WHEELHOUSE_STAMP_NAME).write_text(
+                boilerplates.packaging_tests.requirements_fingerprint(source_path=source_path),
+                encoding='ascii')
+
+        timings = {}
+        with tempfile.TemporaryDirectory() as temporary_folder, unittest.mock.patch.object(
+                boilerplates.packaging_tests, 'prepare_wheelhouse',
+                side_effect=prepare) as prepare_mock, \
+                unittest.mock.patch.dict('os.environ', {'PIP_NO_INDEX': ''}):
+            source_path = pathlib.Path(temporary_folder, 'source')
+            source_path.mkdir()
+            source_path.joinpath('requirements.txt').write_text('spam\n', encoding='utf-8')
+            wheelhouse_path = pathlib.Path(temporary_folder, 'wheels')
+
+            def find(refresh=False):
+                return boilerplates.packaging_tests.find_wheelhouse(
+                    wheelhouse_path, timings, str(source_path), 'pkg', refresh)
+
+            for _ in range(2):
+                self.assertEqual(find(), wheelhouse_path)
+                self.assertEqual(prepare_mock.call_count, 1)
+            source_path.joinpath('requirements.txt').write_text('spam\nham\n', encoding='utf-8')
+            with self.assertLogs('boilerplates.packaging_tests', logging.WARNING):
+                self.assertEqual(find(), wheelhouse_path)
+            self.assertEqual(prepare_mock.call_count, 1)
+            os.environ['PIP_NO_INDEX'] = '1'
+            with self.assertLogs('boilerplates.packaging_tests', logging.WARNING):
+                self.assertEqual(find(refresh=True), wheelhouse_path)
+            self.assertEqual(prepare_mock.call_count, 1)
+            os.environ['PIP_NO_INDEX'] = ''
+            self.assertEqual(find(refresh=True), wheelhouse_path)
+            self.assertEqual(prepare_mock.call_count, 2)
+            self.assertTrue(boilerplates.packaging_tests.is_wheelhouse_current(
+                wheelhouse_path, source_path=str(source_path)))
+            self.assertFalse(boilerplates.packaging_tests.is_wheelhouse_current(
+                wheelhouse_path, 'ham', source_path=str(source_path)))
+        self.assertIn('prepare wheel-house', timings)
+        with unittest.mock.patch.dict('os.environ', {
+                boilerplates.packaging_tests.WHEELHOUSE_ENVVAR_NAME: ''}):
+            self.assertIsNone(boilerplates.packaging_tests.find_wheelhouse(None, timings))
+
+    def test_prepare_wheelhouse_without_package(self):
+        def pip_wheel(*args):
+            wheelhouse_path = pathlib.Path(args[args.index('--wheel-dir') + 1])
+            for name in ('My.Pkg-1.0-py3-none-any.whl', 'spam-2.0-py3-none-any.whl'):
+                wheelhouse_path.joinpath(name).touch()
+
+        with tempfile.TemporaryDirectory() as temporary_folder, \
+                unittest.mock.patch.object(
+                    boilerplates.packaging_tests, 'run_pip', side_effect=pip_wheel):
+            source_path = pathlib.Path(temporary_folder, 'source')
+            source_path.mkdir()
+            source_path.joinpath('pyproject.toml').write_text(
+                '[project]\nname = "my-pkg"\n', encoding='utf-8')
+            wheelhouse_path = pathlib.Path(temporary_folder, 'wheels')
+            wheelhouse_path.mkdir()
+            boilerplates.packaging_tests.prepare_wheelhouse(
+                wheelhouse_path, source_path=str(source_path))
+            self.assertEqual(
+                sorted(_.name for _ in wheelhouse_path.glob('*.whl')),
+                ['spam-2.0-py3-none-any.whl'])
+
+    def test_load_build_backend(self):
+        backend = boilerplates.packaging_tests.load_build_backend()
+        self.assertEqual(backend.__name__, 'setuptools.build_meta')
+        self.assertTrue(callable(backend.build_wheel))
+        with tempfile.TemporaryDirectory() as temporary_folder:
+            backend = boilerplates.packaging_tests.load_build_backend(temporary_folder)
+        self.assertTrue(callable(backend.build_sdist))
+
+    def test_load_build_backend_path(self):
+        sys_path = sys.path[:]
+        with tempfile.TemporaryDirectory() as temporary_folder:
+            source_path = pathlib.Path(temporary_folder)
+            source_path.joinpath('backend').mkdir()
+            source_path.joinpath('backend', 'custom_backend_for_tests.py').write_text(
+                'def build_wheel(wheel_directory):\n    return "wheel"\n', encoding='utf-8')
+            source_path.joinpath('pyproject.toml').write_text(
+                '[build-system]\nbuild-backend = "custom_backend_for_tests"\n'
+                'backend-path = ["backend"]\n', encoding='utf-8')
+            try:
+                backend = boilerplates.packaging_tests.load_build_backend(temporary_folder)
+                self.assertEqual(sys.path, sys_path)
+                self.assertEqual(
+                    boilerplates.packaging_tests.call_build_backend_hook(
+                        'build_wheel', temporary_folder, source_path=temporary_folder),
+                    'wheel')
+            finally:
+                sys.modules.pop('custom_backend_for_tests', None)
+        self.assertEqual(backend.__name__, 'custom_backend_for_tests')
+        self.assertEqual(sys.path, sys_path)
+
+
+class ArtifactInspectionTests(unittest.TestCase):
+
+    files = {
+        'pkg/__init__.py': b'"""Package."""\n' * 100,
+        'pkg/data/file.json': b'{}\n',
+        'pkg-1.0.dist-info/METADATA': b'Name: pkg\n'}
+
+    def test_inspect_wheel(self):
+        with tempfile.TemporaryDirectory() as temporary_folder:
+            path = pathlib.Path(temporary_folder, 'pkg-1.0-py3-none-any.whl')
+            _create_wheel(path, self.files)
+            report = boilerplates.packaging_tests.inspect_wheel(path)
+        self.assertEqual(report.record_errors, [])
+        self.assertEqual(len(report.files), 4)
+        self.assertIn('pkg/data/file.json', report.files)
+        self.assertLess(report.compression_ratio, 1.0)
+
+    def test_inspect_wheel_bad_record(self):
+        with tempfile.TemporaryDirectory() as temporary_folder:
+            path = pathlib.Path(temporary_folder, 'pkg-1.0-py3-none-any.whl')
+            _create_wheel(path, self.files, {
+                'pkg/__init__.py': f'pkg/__init__.py,{_record_hash(b"spam")},4',
+                'pkg/data/file.json': '',
+                'pkg/missing.py': f'pkg/missing.py,{_record_hash(b"")},0'})
+            report = boilerplates.packaging_tests.inspect_wheel(path)
+        self.assertEqual(len(report.record_errors), 4, msg=report.record_errors)
+
+    def test_inspect_wheel_unknown_hash_algorithm(self):
+        with tempfile.TemporaryDirectory() as temporary_folder:
+            path = pathlib.Path(temporary_folder, 'pkg-1.0-py3-none-any.whl')
+            _create_wheel(path, self.files, {
+                'pkg/__init__.py': 'pkg/__init__.py,spam256=abc,1500',
+                'pkg/data/file.json':
+                    f'pkg/data/file.json,{_record_hash(self.files["pkg/data/file.json"])},three'})
+            report = boilerplates.packaging_tests.inspect_wheel(path)
+        self.assertEqual(len(report.record_errors), 2, msg=report.record_errors)
+        self.assertIn('spam256', report.record_errors[0])
+        self.assertIn('three', report.record_errors[1])
+
+    def test_inspect_source_tar(self):
+        with tempfile.TemporaryDirectory() as temporary_folder:
+            path = pathlib.Path(temporary_folder, 'pkg-1.0.tar.gz')
+            with tarfile.open(path, 'w:gz') as archive:
+                for name, data in self.files.items():
+                    info = tarfile.TarInfo(f'pkg-1.0/{name}')
+                    info.size = len(data)
+                    archive.addfile(info, io.BytesIO(data))
+            report = boilerplates.packaging_tests.inspect_source_tar(path)
+        self.assertEqual(sorted(report.files), sorted(self.files))
+        self.assertEqual(report.uncompressed_size, sum(len(_) for _ in self.files.values()))
+        self.assertEqual(report.record_errors, [])
+
+    def test_check_artifact_files(self):
+        files = ['pkg/__init__.py', 'pkg/data/file.json', 'test/__init__.py']
+        with tempfile.TemporaryDirectory() as temporary_folder:
+            source_root = pathlib.Path(temporary_folder)
+            source_root.joinpath('pkg', 'data').mkdir(parents=True)
+            source_root.joinpath('pkg', 'data', 'file.json').touch()
+            source_root.joinpath('pkg', 'data', 'other.json').touch()
+            problems = boilerplates.packaging_tests.check_artifact_files(
+                files, ['pkg'], {'pkg': ['data/file.json']}, source_root=source_root)
+            self.assertEqual(problems, [])
+            problems = boilerplates.packaging_tests.check_artifact_files(
+                files, ['pkg', 'pkg.sub'], {'': ['data/*.json']},
+                excluded_packages=boilerplates.setup.TEST_PACKAGES, source_root=source_root)
+        self.assertEqual(len(problems), 3, msg=problems)
+
+
 class Tests(boilerplates.packaging_tests.PackagingTests):
 
     version = VERSION
+
+
+class ParallelTests(boilerplates.packaging_tests.ParallelPackagingTests):
+
+    version = VERSION
@@ -1,11 +1,25 @@
 """Unit tests for Sentry boilerplate."""
 
 import logging
+import pathlib
+import subprocess
 import sys
+import threading
+import time
 import unittest
 import unittest.mock
+import urllib.error
+import urllib.request
+
+import sentry_sdk
+import sentry_sdk.consts
+import sentry_sdk.envelope
+import sentry_sdk.serializer
+import sentry_sdk.transport
 
 import boilerplates.sentry
+import boilerplates.sentry_tests
+import boilerplates.sentry_transport
 
 
 class SentryTests(unittest.TestCase):
@@ -26,6 +40,20 @@ class SentryTests(unittest.TestCase):
         self.assertEqual(len(context.output), 1, msg=context.output)
         self.assertIn('skipping Sentry SDK initialisation', context.output[0])
 
+    def test_init_without_dsn_with_invalid_envvar(self):
+        class Sentry(boilerplates.sentry.Sentry):
+            dsn = None
+        environ_override = {'SENTRY_HIGH_ERROR_RATE': 'spam', 'SENTRY_DEBUG': 'ham'}
+        with unittest.mock.patch.dict('os.environ', environ_override), \
+                self.assertLogs('boilerplates.sentry', logging.INFO) as context, \
+                unittest.mock.patch('sentry_sdk.init') as sentry_sdk_init_mock:
+            self.assertFalse(Sentry.is_dsn_set())
+            Sentry.init()
+            with self.assertRaisesRegex(ValueError, 'SENTRY_HIGH_ERROR_RATE'):
+                Sentry._get_param('high_error_rate')  # pylint: disable = protected-access
+        sentry_sdk_init_mock.assert_not_called()
+        self.assertIn('skipping Sentry SDK initialisation', context.output[0])
+
     @unittest.skipUnless(sys.version_info >= (3, 10), 'this test requires Python 3.10')
     def test_init_with_dsn(self):
         class Sentry(boilerplates.sentry.Sentry):
@@ -60,3 +88,481 @@ class SentryTests(unittest.TestCase):
         self.assertEqual(sentry_sdk_init_mock.call_args.kwargs['profiles_sample_rate'], 0.42)
         self.assertIn('debug', sentry_sdk_init_mock.call_args.kwargs)
         self.assertTrue(sentry_sdk_init_mock.call_args.kwargs['debug'], 0.42)
+
+    @unittest.skipUnless(sys.version_info >= (3, 10), 'this test requires Python 3.10')
+    def test_configure_traces_sampler_with_envvars(self):
+        class Sentry(boilerplates.sentry.Sentry):
+            dsn = 'https://spam@ham.ingest.sentry.io/eggs'
+        environ_override = {
+            'SENTRY_TRACES_SAMPLE_RATES': '/health*=0, db.*=0.25',
+            'SENTRY_TRACES_MAX_PER_SECOND': 'inf'}
+        with unittest.mock.patch.dict('os.environ', environ_override), \
+                unittest.mock.patch('sentry_sdk.init') as sentry_sdk_init_mock:
+            Sentry.init()
+        sampler = sentry_sdk_init_mock.call_args.kwargs['traces_sampler']
+        self.assertIsInstance(sampler, boilerplates.sentry.TracesSampler)
+        self.assertEqual(sampler.rules, {'/health*': 0.0, 'db.*': 0.25})
+        self.assertIsNone(sampler.max_per_second)
+        environ_override['SENTRY_TRACES_SAMPLE_RATES'] = '/health*=0, db.*'
+        with unittest.mock.patch.dict('os.environ', environ_override), \
+                unittest.mock.patch('sentry_sdk.init') as sentry_sdk_init_mock, \
+                self.assertRaisesRegex(ValueError, r"SENTRY_TRACES_SAMPLE_RATES.*'db\.\*'"):
+            Sentry.init()
+        sentry_sdk_init_mock.assert_not_called()
+
+    @unittest.skipUnless(sys.version_info >= (3, 10), 'this test requires Python 3.10')
+    def test_init_with_custom_traces_sampler(self):
+        class Sentry(boilerplates.sentry.Sentry):
+            dsn = 'https://spam@ham.ingest.sentry.io/eggs'
+
+        def sampler(_):
+            return 0.5
+        with unittest.mock.patch('sentry_sdk.init') as sentry_sdk_init_mock:
+            Sentry.init(traces_sampler=sampler)
+        self.assertIs(sentry_sdk_init_mock.call_args.kwargs['traces_sampler'], sampler)
+
+    def test_lazy_imports(self):
+        code = (
+            'import sys, boilerplates.sentry\n'
+            'boilerplates.sentry.Sentry.init()\n'
+            'assert "sentry_sdk" not in sys.modules, "imported"\n'
+            'assert len(boilerplates.sentry.Sentry.integrations) == 7\n'
+            'assert "sentry_sdk" in sys.modules, "not imported"\n')
+        root_path = pathlib.Path(__file__).resolve().parent.parent
+        subprocess.run([sys.executable, '-c', code], check=True, cwd=str(root_path))
+
+    def test_integrations_created_once(self):
+        class Sentry(boilerplates.sentry.Sentry):
+            pass
+        self.assertIs(Sentry.integrations, boilerplates.sentry.Sentry.integrations)
+
+
+def _sampling_context(name=None, op=None, parent_sampled=None):
+    return {'transaction_context': {'name': name, 'op': op}, 'parent_sampled': parent_sampled}
+
+
+class TracesSamplerTests(unittest.TestCase):
+
+    def test_rules(self):
+        sampler = boilerplates.sentry.TracesSampler(
+            0.5, {'/health*': 0.0, 'db.*': 0.1, '/api/*': 1.0})
+        self.assertEqual(sampler(_sampling_context('/healthz', 'http.server')), 0.0)
+        self.assertEqual(sampler(_sampling_context('/api/users', 'http.server')), 1.0)
+        self.assertEqual(sampler(_sampling_context('query', 'db.sql')), 0.1)
+        self.assertEqual(sampler(_sampling_context('/', 'http.server')), 0.5)
+        self.assertEqual(sampler({}), 0.5)
+
+    def test_parent_sampled(self):
+        sampler = boilerplates.sentry.TracesSampler(0.0)
+        self.assertEqual(sampler(_sampling_context('/', parent_sampled=True)), 1.0)
+        sampler = boilerplates.sentry.TracesSampler(1.0)
+        self.assertEqual(sampler(_sampling_context('/', parent_sampled=False)), 0.0)
+
+    def test_max_per_second(self):
+        now = [0.0]
+        sampler = boilerplates.sentry.TracesSampler(
+            1.0, {'rare': 0.001}, max_per_second=10, clock=lambda: now[0])
+        rates = [sampler(_sampling_context('/')) for _ in range(100)]
+        self.assertEqual(rates[:10], [1.0] * 10)
+        self.assertAlmostEqual(sum(rates), 10 + sum(10 / i for i in range(11, 101)))
+        self.assertEqual(sampler(_sampling_context('rare')), 0.001)
+        now[0] = 1.0
+        self.assertAlmostEqual(sampler(_sampling_context('/')), 10 / 101)
+        now[0] = 10.0
+        self.assertEqual(sampler(_sampling_context('/')), 1.0)
+
+
+class FakeSentryServerTests(boilerplates.sentry_tests.FakeSentryTests):
+
+    def test_capture(self):
+        sentry_sdk.init(dsn=self.sentry_server.dsn, default_integrations=False)
+        try:
+            sentry_sdk.capture_message('spam')
+            sentry_sdk.get_client().flush()
+        finally:
+            sentry_sdk.get_client().close()
+        self.assertEqual(self.sentry_server.item_counts['event'], 1)
+        event = self.sentry_server.envelopes[0].get_event()
+        self.assertEqual(event['message'], 'spam')
+        self.assertGreater(self.sentry_server.received_bytes, 0)
+
+    def test_malformed_envelope(self):
+        host, port = self.sentry_server.server_address[:2]
+        request = urllib.request.Request(
+            f'http://{host}:{port}/api/1/envelope/', data=b'spam',
+            headers={'Content-Encoding': 'gzip'})
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            urllib.request.urlopen(request)  # pylint: disable = consider-using-with
+        self.assertEqual(context.exception.code, 400)
+        self.assertEqual(self.sentry_server.envelopes, [])
+
+    def test_benchmark(self):
+        config = boilerplates.sentry_tests.BenchmarkConfig
+        results = boilerplates.sentry_tests.benchmark_sentry(
+            lambda: None, [config(enabled=False), config(0.0, 0.0, False), config(1.0, 0.0)],
+            iterations=20, server=self.sentry_server)
+        self.assertEqual([len(_.latencies) for _ in results], [20, 20, 20])
+        self.assertEqual(results[0].item_counts, {})
+        self.assertEqual(results[1].item_counts, {})
+        self.assertEqual(results[2].item_counts, {'transaction': 20})
+        for result in results:
+            self.assertGreater(result.throughput, 0)
+            self.assertLessEqual(result.latency_quantile(0.5), result.latency_quantile(0.99))
+            self.assertIn('calls/s', result.summary())
+
+
+class BatchingTransportTests(boilerplates.sentry_tests.FakeSentryTests):
+
+    def _create_transport(self, **attributes):
+        transport_class = type(
+            'Transport', (boilerplates.sentry_transport.BatchingTransport,), attributes)
+        options = dict(sentry_sdk.consts.DEFAULT_OPTIONS, dsn=self.sentry_server.dsn)
+        transport = transport_class(options)
+        self.addCleanup(transport.kill)
+        return transport
+
+    def _capture_while_sending_is_blocked(self, transport, count):
+        sent = []
+        release = threading.Event()
+
+        def send_envelope(envelope):
+            release.wait(5)
+            sent.append(envelope.get_event()['message'])
+        with unittest.mock.patch.object(transport, '_send_envelope', send_envelope):
+            transport.capture_envelope(_message_envelope('first'))
+            while transport.stats().batches < 1:
+                time.sleep(0.001)
+            for i in range(count):
+                transport.capture_envelope(_message_envelope(str(i)))
+            release.set()
+            transport.flush(5)
+        return sent
+
+    def test_send(self):
+        class Sentry(boilerplates.sentry.Sentry):
+            dsn = self.sentry_server.dsn
+            batching_transport = True
+            integrations = []
+            default_integrations = False
+        self.assertIsNone(Sentry.transport_stats())
+        Sentry.init()
+        try:
+            for i in range(50):
+                sentry_sdk.capture_message(f'message {i}')
+            sentry_sdk.flush()
+            stats = Sentry.transport_stats()
+        finally:
+            sentry_sdk.get_client().close()
+        self.assertEqual(self.sentry_server.item_counts['event'], 50)
+        self.assertEqual((stats.queued, stats.sent, stats.dropped, stats.failed), (50, 50, 0, 0))
+        self.assertEqual(stats.queue_length, 0)
+        self.assertGreaterEqual(stats.batches, 1)
+        self.assertGreater(stats.send_latency_mean, 0)
+        self.assertGreaterEqual(stats.send_latency_max, stats.send_latency_mean)
+
+    def test_drop_oldest(self):
+        transport = self._create_transport(queue_size=2, drop_policy='oldest')
+        sent = self._capture_while_sending_is_blocked(transport, 4)
+        self.assertEqual(sent, ['first', '2', '3'])
+        self.assertEqual(transport.stats().dropped, 2)
+
+    def test_drop_newest(self):
+        transport = self._create_transport(queue_size=2, drop_policy='newest')
+        sent = self._capture_while_sending_is_blocked(transport, 4)
+        self.assertEqual(sent, ['first', '0', '1'])
+        self.assertEqual(transport.stats().dropped, 2)
+
+    def test_block(self):
+        transport = self._create_transport(queue_size=2, drop_policy='block', block_timeout=0.01)
+        sent = self._capture_while_sending_is_blocked(transport, 3)
+        self.assertEqual(sent, ['first', '0', '1'])
+        self.assertEqual(transport.stats().dropped, 1)
+
+    def test_failure(self):
+        transport = self._create_transport()
+        with unittest.mock.patch.object(transport, '_send_envelope', side_effect=OSError):
+            transport.capture_envelope(_message_envelope('spam'))
+            transport.flush(5)
+        stats = transport.stats()
+        self.assertEqual((stats.sent, stats.failed), (0, 1))
+        transport.kill()
+        transport.capture_envelope(_message_envelope('spam'))
+        self.assertEqual(transport.stats().dropped, 1)
+
+    def test_lost_events_recorded(self):
+        transport = self._create_transport(queue_size=2, drop_policy='newest')
+        release = threading.Event()
+        with unittest.mock.patch.object(
+                transport, '_send_envelope', side_effect=lambda _: release.wait(5)), \
+                unittest.mock.patch.object(
+                    transport, 'record_lost_event', wraps=transport.record_lost_event) as record:
+            transport.capture_envelope(_message_envelope('first'))
+            while transport.stats().batches < 1:
+                time.sleep(0.001)
+            for i in range(3):
+                transport.capture_envelope(_message_envelope(str(i)))
+            self.assertEqual(record.call_count, 1)
+            transport.kill()
+            self.assertEqual(record.call_count, 3)
+            transport.capture_envelope(_message_envelope('after kill'))
+            self.assertEqual(record.call_count, 4)
+            release.set()
+        self.assertEqual(transport.stats().dropped, 4)
+        self.assertEqual({_.args[0] for _ in record.call_args_list}, {'queue_overflow'})
+
+    def test_unsupported_sdk(self):
+        self.assertTrue(boilerplates.sentry_transport.is_supported())
+
+        class Sentry(boilerplates.sentry.Sentry):
+            batching_transport = True
+
+        with unittest.mock.patch.object(
+                sentry_sdk.transport.HttpTransport, '_flush_client_reports', None):
+            self.assertFalse(boilerplates.sentry_transport.is_supported())
+            with self.assertRaises(TypeError):
+                self._create_transport()
+            with self.assertLogs('boilerplates.sentry', logging.WARNING):
+                # pylint: disable = protected-access
+                self.assertIsNone(Sentry._get_transport_class())
+
+
+def _message_envelope(message):
+    envelope = sentry_sdk.envelope.Envelope()
+    envelope.add_event({'message': message})
+    return envelope
+
+
+def _exception_event(exception_type='ValueError', lineno=10, message='failed'):
+    frames = [
+        {'module': 'app', 'function': 'main', 'lineno': 1},
+        {'module': 'app.db', 'function': 'query', 'lineno': lineno}]
+    return {
+        'level': 'error', 'logger': 'app', 'logentry': {'message': message, 'params': []},
+        'exception': {'values': [{'type': exception_type, 'stacktrace': {'frames': frames}}]}}
+
+
+class EventDeduplicatorTests(unittest.TestCase):
+
+    def test_fingerprint(self):
+        fingerprint = boilerplates.sentry.event_fingerprint
+        self.assertEqual(fingerprint(_exception_event()), fingerprint(_exception_event()))
+        self.assertNotEqual(
+            fingerprint(_exception_event()), fingerprint(_exception_event('KeyError')))
+        self.assertNotEqual(
+            fingerprint(_exception_event()), fingerprint(_exception_event(lineno=11)))
+        self.assertNotEqual(
+            fingerprint(_exception_event()), fingerprint(_exception_event(message='spam %s')))
+        self.assertEqual(
+            fingerprint(_exception_event(), frames=1),
+            fingerprint(dict(_exception_event(), extra={'spam': 'ham'}), frames=1))
+        self.assertEqual(fingerprint({}), (None, None, None, ()))
+
+    def test_suppress_and_count(self):
+        now = [0.0]
+        deduplicator = boilerplates.sentry.EventDeduplicator(ttl=10, clock=lambda: now[0])
+        self.assertIsNotNone(deduplicator(_exception_event(), {}))
+        for _ in range(5):
+            self.assertIsNone(deduplicator(_exception_event(), {}))
+        self.assertIsNotNone(deduplicator(_exception_event('KeyError'), {}))
+        self.assertEqual(deduplicator.suppressed, 5)
+        now[0] = 10.0
+        event = deduplicator(_exception_event(), {})
+        self.assertEqual(event['extra'], {'duplicates_suppressed': 5})
+        self.assertIsNone(deduplicator(_exception_event(), {}))
+
+    def test_cache_size(self):
+        deduplicator = boilerplates.sentry.EventDeduplicator(max_size=2)
+        for lineno in (1, 2, 3, 1):
+            self.assertIsNotNone(deduplicator(_exception_event(lineno=lineno), {}))
+        self.assertIsNone(deduplicator(_exception_event(lineno=3), {}))
+        self.assertEqual(deduplicator.suppressed, 1)
+
+    def test_report_pending(self):
+        now = [0.0]
+        deduplicator = boilerplates.sentry.EventDeduplicator(
+            ttl=10, max_size=2, clock=lambda: now[0])
+        for _ in range(3):
+            deduplicator(_exception_event(), {})
+        with self.assertLogs('boilerplates.sentry', logging.WARNING) as context:
+            self.assertEqual(deduplicator.flush(), 2)
+        self.assertEqual(len(context.output), 1, msg=context.output)
+        self.assertIn('suppressed 2 duplicates of Sentry event: app failed (ValueError)',
+                      context.output[0])
+        with self.assertNoLogs('boilerplates.sentry', logging.WARNING):
+            self.assertEqual(deduplicator.flush(), 0)
+        deduplicator(_exception_event(), {})
+        now[0] = 20.0
+        with self.assertLogs('boilerplates.sentry', logging.WARNING) as context:
+            self.assertIsNotNone(deduplicator(_exception_event('KeyError'), {}))
+        self.assertIn('suppressed 1 duplicates', context.output[0])
+        for lineno in (1, 2):
+            deduplicator(_exception_event('KeyError', lineno=lineno), {})
+            deduplicator(_exception_event('KeyError', lineno=lineno), {})
+        with self.assertLogs('boilerplates.sentry', logging.WARNING) as context:
+            deduplicator(_exception_event('KeyError', lineno=3), {})
+        self.assertIn('(KeyError)', context.output[0])
+        self.assertEqual(deduplicator.flush(), 1)
+
+
+class DeduplicationTests(boilerplates.sentry_tests.FakeSentryTests):
+
+    def test_logging_errors(self):
+        class Sentry(boilerplates.sentry.Sentry):
+            dsn = self.sentry_server.dsn
+            deduplicate_events = True
+            default_integrations = False
+        before_send = unittest.mock.Mock(side_effect=lambda event, hint: event)
+        Sentry.init(before_send=before_send)
+        logger = logging.getLogger('test.test_sentry.deduplication')
+        try:
+            with unittest.mock.patch(
+                    'sentry_sdk.client.serialize',
+                    wraps=sentry_sdk.client.serialize) as serialize_mock:
+                for i in range(100):
+                    try:
+                        raise RuntimeError(f'failure {i}')
+                    except RuntimeError:
+                        logger.exception('failed to do %i', i)
+                logger.error('something else')
+            sentry_sdk.flush()
+        finally:
+            sentry_sdk.get_client().close()
+        self.assertEqual(self.sentry_server.item_counts['event'], 2)
+        self.assertEqual(before_send.call_count, 2)
+        self.assertEqual(serialize_mock.call_count, 2)
+
+
+def _deep_event(depth=30):
+    frames = [{'function': f'f{i}', 'lineno': i, 'vars': {'i': str(i)}} for i in range(depth)]
+    return {'exception': {'values': [{'type': 'ValueError', 'stacktrace': {'frames': frames}}]}}
+
+
+def _raise_deep(depth):
+    if depth == 0:
+        raise ValueError('spam')
+    _raise_deep(depth - 1)
+
+
+class CaptureLimiterTests(unittest.TestCase):
+
+    def test_limits(self):
+        limiter = boilerplates.sentry.CaptureLimiter(max_frames=10, max_frames_with_vars=3)
+        event = limiter(_deep_event(), {})
+        stacktrace = event['exception']['values'][0]['stacktrace']
+        self.assertEqual([_['function'] for _ in stacktrace['frames']], [
+            f'f{i}' for i in range(20, 30)])
+        self.assertEqual(stacktrace['frames_omitted'], [0, 20])
+        self.assertEqual(['vars' in _ for _ in stacktrace['frames']], [False] * 7 + [True] * 3)
+
+    def test_no_limits(self):
+        limiter = boilerplates.sentry.CaptureLimiter()
+        self.assertEqual(limiter(_deep_event(), {}), _deep_event())
+        self.assertEqual(limiter({'message': 'spam'}, {}), {'message': 'spam'})
+
+    def test_high_error_rate(self):
+        now = [0.0]
+        limiter = boilerplates.sentry.CaptureLimiter(
+            high_error_rate=2, high_error_rate_max_frames=5, clock=lambda: now[0])
+        with unittest.mock.patch('sentry_sdk.get_client') as get_client_mock:
+            for _ in range(2):
+                event = limiter(_deep_event(), {})
+                self.assertEqual(len(event['exception']['values'][0]['stacktrace']['frames']), 30)
+            frames = limiter(_deep_event(), {})['exception']['values'][0]['stacktrace']['frames']
+            self.assertEqual(len(frames), 5)
+            self.assertFalse(any('vars' in _ for _ in frames))
+            now[0] = 10.0
+            frames = limiter(_deep_event(), {})['exception']['values'][0]['stacktrace']['frames']
+            self.assertEqual(len(frames), 30)
+            self.assertTrue(any('vars' in _ for _ in frames))
+        get_client_mock.assert_not_called()
+
+    @unittest.skipUnless(sys.version_info >= (3, 10), 'this test requires Python 3.10')
+    def test_configure(self):
+        class Sentry(boilerplates.sentry.Sentry):
+            dsn = 'https://spam@ham.ingest.sentry.io/eggs'
+            max_stack_frames = 20
+        environ_override = {'SENTRY_PURE_EVAL': 'false', 'SENTRY_INCLUDE_LOCAL_VARIABLES': '0'}
+        with unittest.mock.patch.dict('os.environ', environ_override), \
+                unittest.mock.patch('sentry_sdk.init') as sentry_sdk_init_mock:
+            Sentry.init()
+            processors = Sentry.create_event_processors()
+        kwargs = sentry_sdk_init_mock.call_args.kwargs
+        self.assertNotIn('pure_eval', [_.identifier for _ in kwargs['integrations']])
+        self.assertFalse(kwargs['include_local_variables'])
+        self.assertNotIn('before_send', kwargs)
+        self.assertEqual(len(processors), 1)
+        self.assertIsInstance(processors[0], boilerplates.sentry.CaptureLimiter)
+        self.assertEqual(processors[0].max_frames, 20)
+        self.assertIsNone(processors[0].high_error_rate)
+
+    def test_limit_before_serialization(self):
+        serialized_frames = []
+
+        def serialize(event, **kwargs):
+            for value in event['exception']['values']:
+                serialized_frames.append(value['stacktrace']['frames'])
+            return sentry_sdk.serializer.serialize(event, **kwargs)
+
+        class Sentry(boilerplates.sentry.Sentry):
+            dsn = 'https://spam@ham.ingest.sentry.io/eggs'
+            default_integrations = False
+            integrations = []
+            max_stack_frames = 5
+            max_stack_frames_with_variables = 2
+        Sentry.init(transport=unittest.mock.Mock(spec=sentry_sdk.transport.Transport))
+        try:
+            with unittest.mock.patch('sentry_sdk.client.serialize', side_effect=serialize):
+                try:
+                    _raise_deep(30)
+                except ValueError as err:
+                    sentry_sdk.capture_exception(err)
+        finally:
+            sentry_sdk.get_client().close()
+        self.assertEqual([len(_) for _ in serialized_frames], [5])
+        self.assertEqual(['vars' in _ for _ in serialized_frames[0]], [False] * 3 + [True] * 2)
+
+
+class CaptureCostTests(boilerplates.sentry_tests.FakeSentryTests):
+
+    def test_measure_capture_cost(self):
+        class Sentry(boilerplates.sentry.Sentry):
+            default_integrations = False
+
+        class LimitedSentry(Sentry):
+            pure_eval = False
+            max_stack_frames = 5
+        costs = [
+            boilerplates.sentry_tests.measure_capture_cost(
+                lambda: _raise_deep(30), sentry_class, repeat=2, server=self.sentry_server)
+            for sentry_class in (Sentry, LimitedSentry)]
+        self.assertGreater(costs[0].frames, 30)
+        self.assertEqual(costs[1].frames, 5)
+        self.assertGreater(costs[0].size, costs[1].size)
+        for cost in costs:
+            self.assertGreater(cost.capture_time, 0)
+            self.assertGreater(cost.serialization_time, 0)
+            self.assertLess(cost.compressed_size, cost.size)
+        with self.assertRaises(ValueError):
+            boilerplates.sentry_tests.measure_capture_cost(
+                lambda: None, Sentry, server=self.sentry_server)
+
+
+class EnvSettingsTests(unittest.TestCase):
+
+    def test_invalid_envvar(self):
+        class Sentry(boilerplates.sentry.Sentry):
+            dsn = 'https://spam@ham.ingest.sentry.io/eggs'
+        with unittest.mock.patch.dict('os.environ', {'SENTRY_SAMPLE_RATE': 'spam'}), \
+                unittest.mock.patch('sentry_sdk.init') as sentry_sdk_init_mock, \
+                self.assertRaisesRegex(ValueError, 'SENTRY_SAMPLE_RATE'):
+            Sentry.init()
+        sentry_sdk_init_mock.assert_not_called()
+
+    def test_params(self):
+        class Sentry(boilerplates.sentry.Sentry):
+            release = '1.0.0'
+        with unittest.mock.patch.dict('os.environ', {'SENTRY_DEBUG': 'on'}):
+            self.assertTrue(Sentry._get_param('debug'))
+            self.assertEqual(Sentry._get_param('release'), '1.0.0')
+            self.assertIsNone(Sentry._get_param('dsn'))
+            self.assertEqual(Sentry._get_param('traces_max_per_second'), 10.0)
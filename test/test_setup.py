@@ -4,8 +4,10 @@ import itertools
 import logging
 import os
 import pathlib
+import sys
 import tempfile
 import unittest
+import unittest.mock
 
 import boilerplates.setup
 
@@ -76,6 +78,50 @@ class UnitTests(unittest.TestCase):
         for result in results:
             self.assertIsInstance(result, str)
 
+    def test_find_packages_incremental(self):
+        self.assertEqual(
+            boilerplates.setup.find_packages(incremental=True),
+            sorted(boilerplates.setup.find_packages()))
+        with tempfile.TemporaryDirectory() as temp_folder:
+            root_dir = pathlib.Path(temp_folder)
+            for package in ('pkg', 'pkg/sub', 'test', 'test/sub', 'data/pkg'):
+                root_dir.joinpath(package).mkdir(parents=True)
+                root_dir.joinpath(package, '__init__.py').touch()
+            root_dir.joinpath('build', 'lib', 'pkg').mkdir(parents=True)
+            root_dir.joinpath('build', 'lib', 'pkg', '__init__.py').touch()
+            results = boilerplates.setup.find_packages(temp_folder, incremental=True)
+            self.assertEqual(results, ['pkg', 'pkg.sub', 'test', 'test.sub'])
+            root_dir.joinpath('pkg', 'new').mkdir()
+            results = boilerplates.setup.find_packages(temp_folder, incremental=True)
+            self.assertNotIn('pkg.new', results)
+            root_dir.joinpath('pkg', 'new', '__init__.py').touch()
+            results = boilerplates.setup.find_packages(temp_folder, incremental=True)
+            self.assertIn('pkg.new', results)
+            with unittest.mock.patch.object(sys, 'argv', ['setup.py', 'bdist_wheel']):
+                results = boilerplates.setup.find_packages(temp_folder, incremental=True)
+            self.assertEqual(results, ['pkg', 'pkg.new', 'pkg.sub'])
+
+    def test_find_packages_incremental_pruned_names(self):
+        with tempfile.TemporaryDirectory() as temp_folder:
+            root_dir = pathlib.Path(temp_folder)
+            for package in ('mypkg', 'mypkg/build', 'mypkg/dist/sub', 'venv', 'node_modules/x'):
+                root_dir.joinpath(package).mkdir(parents=True, exist_ok=True)
+            for package in ('mypkg', 'mypkg/build', 'mypkg/dist', 'mypkg/dist/sub', 'venv'):
+                root_dir.joinpath(package, '__init__.py').touch()
+            root_dir.joinpath('node_modules', 'x', '__init__.py').touch()
+            root_dir.joinpath('venv', 'lib').mkdir()
+            with unittest.mock.patch.object(os, 'scandir', wraps=os.scandir) as scandir_mock:
+                results = boilerplates.setup.find_packages(temp_folder, incremental=True)
+            self.assertEqual(
+                results,
+                sorted(_ for _ in boilerplates.setup.find_packages(temp_folder) if _ != 'venv'))
+            self.assertIn('mypkg.build', results)
+            self.assertIn('mypkg.dist.sub', results)
+            self.assertNotIn('node_modules.x', results)
+            scanned = {pathlib.Path(_.args[0]).relative_to(root_dir).as_posix()
+                       for _ in scandir_mock.call_args_list}
+            self.assertEqual(scanned, {'.', 'mypkg', 'mypkg/build', 'mypkg/dist', 'mypkg/dist/sub'})
+
     def test_requirements(self):
         results = boilerplates.setup.parse_requirements()
         self.assertIsInstance(results, list)
@@ -129,6 +175,49 @@ class UnitTests(unittest.TestCase):
         req = boilerplates.setup.find_required_python_version(reversed(classifiers))
         self.assertEqual(req, '>=3.4')
 
+    def test_python_version_specifier(self):
+        prefix = 'Programming Language :: Python :: '
+        for versions, specifier in [
+                ((), None),
+                (('3 :: Only',), '>=3, <4'),
+                (('3.9', '3.10', '3.11', '3', '3 :: Only'), '>=3.9, <3.12'),
+                (('3.6', '3.8'), '>=3.6, !=3.7.*, <3.9'),
+                (('2.7', '3.5', '3.6'),
+                 '>=2.7, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*, !=3.4.*, <3.7'),
+                (('2.6', '3.6'),
+                 '>=2.6, !=2.7.*, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*, !=3.4.*, !=3.5.*, <3.7'),
+                (('2', '4'), '>=2, !=3.*, <5'),
+                (('3.6 :: Only',), '>=3.6, <3.7'),
+                (('3.6', '3.6 :: Only'), '>=3.6, <3.7'),
+                (('2', '3.6'),
+                 '>=2, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*, !=3.4.*, !=3.5.*, <3.7'),
+                (('2.7', '3'), '>=2.7, <4')]:
+            classifiers = [f'{prefix}{version}' for version in versions]
+            with self.subTest(classifiers=classifiers):
+                result = boilerplates.setup.find_python_version_specifier(classifiers)
+                self.assertEqual(result, specifier)
+        for variant in ALL_CLASSIFIERS_VARIANTS:
+            with self.subTest(variant=variant):
+                result = boilerplates.setup.find_python_version_specifier(variant)
+                if result is not None:
+                    self.assertIsInstance(result, str)
+
+    def test_python_versions_memoized(self):
+        classifiers = [
+            'Programming Language :: Python :: 3.4',
+            'Programming Language :: Python :: 3.5']
+        versions_min, _ = boilerplates.setup.partition_version_classifiers(classifiers)
+        versions_min.append((2, 7))
+        self.assertEqual(
+            boilerplates.setup.partition_version_classifiers(classifiers), ([(3, 4), (3, 5)], []))
+        with unittest.mock.patch.object(
+                boilerplates.setup, '_compile_version_classifier_pattern') as compile_mock:
+            self.assertEqual(
+                boilerplates.setup.find_required_python_version(classifiers), '>=3.4')
+            self.assertEqual(
+                boilerplates.setup.find_required_python_version(tuple(classifiers)), '>=3.4')
+        compile_mock.assert_not_called()
+
     def test_python_versions_none(self):
         result = boilerplates.setup.find_required_python_version([])
         self.assertIsNone(result)
@@ -151,6 +240,101 @@ class UnitTests(unittest.TestCase):
                 boilerplates.setup.find_required_python_version(classifiers)
 
 
+class DirectoryListingCacheTests(unittest.TestCase):
+
+    def test_exists(self):
+        with tempfile.TemporaryDirectory() as temp_folder:
+            root_dir = pathlib.Path(temp_folder)
+            root_dir.joinpath('folder').mkdir()
+            root_dir.joinpath('folder', 'file.txt').touch()
+            root_dir.joinpath('file.txt').touch()
+            examples = [
+                ('.', True), ('folder', True), ('folder/file.txt', True),
+                ('./folder/file.txt', True), ('file.txt', True), ('folder/other.txt', False),
+                ('file.txt/folder', False), ('nothing', False),
+                ('../nothing/here', False), (f'../{root_dir.name}/file.txt', True)]
+            try:
+                root_dir.joinpath('broken_link').symlink_to(root_dir.joinpath('nothing'))
+                examples.append(('broken_link', False))
+            except OSError:
+                _LOG.warning('cannot create symlinks, skipping broken symlink example')
+            listings = boilerplates.setup.DirectoryListingCache()
+            for path, exists in examples:
+                with self.subTest(path=path):
+                    self.assertEqual(listings.exists(root_dir, pathlib.Path(path)), exists)
+
+    def test_max_size(self):
+        with tempfile.TemporaryDirectory() as temp_folder:
+            root_dir = pathlib.Path(temp_folder)
+            for name in ('a', 'b', 'c'):
+                root_dir.joinpath(name).mkdir()
+            listings = boilerplates.setup.DirectoryListingCache(max_size=2)
+            with unittest.mock.patch.object(os, 'scandir', wraps=os.scandir) as scandir_mock:
+                for name in ('a', 'b', 'a', 'c', 'a', 'b'):
+                    listings.entries(root_dir.joinpath(name))
+            self.assertEqual(
+                [pathlib.Path(_.args[0]).name for _ in scandir_mock.call_args_list],
+                ['a', 'b', 'c', 'b'])
+
+    def test_many_links_scan_each_directory_once(self):
+        links = [f'`file {i} <folder/file_{i % 10}.txt>`_' for i in range(500)]
+        links += [f'`missing {i} <folder/missing_{i}.txt>`_' for i in range(100)]
+        text = '\n\n'.join(links)
+        with tempfile.TemporaryDirectory() as temp_folder:
+            root_dir = pathlib.Path(temp_folder)
+            root_dir.joinpath('folder').mkdir()
+            for i in range(10):
+                root_dir.joinpath('folder', f'file_{i}.txt').touch()
+            with unittest.mock.patch.object(
+                    os, 'scandir', wraps=os.scandir) as scandir_mock:
+                result = boilerplates.setup.resolve_relative_rst_links(
+                    root_dir, text, 'https://example.com/')
+        self.assertEqual(scandir_mock.call_count, 2)
+        self.assertEqual(result.count('https://example.com/folder/file_'), 500)
+        self.assertNotIn('https://example.com/folder/missing_', result)
+
+
+class GlobTests(unittest.TestCase):
+
+    patterns = [
+        '*.py', '**/*.py', 'test/*.py', 'test/../*.txt', '**/__init__.py', '*/', '**/test/',
+        'LICENSE*', '.git*', 'no_such_file*']
+
+    def test_glob_many(self):
+        root_dir = pathlib.Path(__file__).resolve().parent.parent
+        results = boilerplates.setup.glob_many(root_dir, self.patterns)
+        self.assertEqual(list(results), self.patterns)
+        for pattern in self.patterns:
+            with self.subTest(pattern=pattern):
+                expected = sorted({str(_.relative_to(root_dir)) for _ in root_dir.glob(pattern)})
+                self.assertEqual(results[pattern], expected)
+
+    def test_glob_many_first_match_only(self):
+        root_dir = pathlib.Path(__file__).resolve().parent.parent
+        results = boilerplates.setup.glob_many(root_dir, self.patterns, first_match_only=True)
+        for pattern in self.patterns:
+            with self.subTest(pattern=pattern):
+                self.assertLessEqual(len(results[pattern]), 1)
+                self.assertEqual(len(results[pattern]) == 1, any(root_dir.glob(pattern)))
+
+    def test_glob_many_sees_changes(self):
+        with tempfile.TemporaryDirectory() as temp_folder:
+            root_dir = pathlib.Path(temp_folder)
+            root_dir.joinpath('dist').mkdir()
+            root_dir.joinpath('dist', 'pkg-1.0.tar.gz').touch()
+            results = boilerplates.setup.glob_many(root_dir, ['dist/*.whl', 'dist/*.tar.gz'])
+            self.assertEqual(results, {
+                'dist/*.whl': [], 'dist/*.tar.gz': [os.path.join('dist', 'pkg-1.0.tar.gz')]})
+            root_dir.joinpath('dist', 'pkg-1.0-py3-none-any.whl').touch()
+            results = boilerplates.setup.glob_many(root_dir, ['dist/*.whl'])
+            self.assertEqual(
+                results, {'dist/*.whl': [os.path.join('dist', 'pkg-1.0-py3-none-any.whl')]})
+
+    def test_glob_many_absolute(self):
+        with self.assertRaises(ValueError):
+            boilerplates.setup.glob_many('.', [str(pathlib.Path.cwd().joinpath('*.py'))])
+
+
 class PackageTests(unittest.TestCase):
     """Test methods of Package class."""
 
@@ -244,3 +428,30 @@ class PackageTests(unittest.TestCase):
         self.assertIsNotNone(Package._existing_license_file_patterns)
         assert Package._existing_license_file_patterns is not None
         self.assertGreater(len(Package._existing_license_file_patterns), 0)
+
+    def test_prepare_license_files_in_packages(self):
+        # pylint: disable = protected-access
+
+        class Package(boilerplates.setup.Package):
+            name = 'package name'
+            version = '0.1.0'
+            long_description = ''
+            packages = ['pkg', 'pkg.vendored']
+            install_requires = []
+            search_license_files_in_packages = True
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as temp_folder:
+            root_dir = pathlib.Path(temp_folder)
+            root_dir.joinpath('pkg', 'vendored').mkdir(parents=True)
+            root_dir.joinpath('LICENSE').touch()
+            root_dir.joinpath('NOTICE.txt').touch()
+            root_dir.joinpath('pkg', 'vendored', 'LICENSE.md').touch()
+            os.chdir(temp_folder)
+            try:
+                Package.prepare()
+            finally:
+                os.chdir(cwd)
+        self.assertEqual(
+            Package._existing_license_file_patterns,
+            ['LICENSE', 'NOTICE.*', 'pkg/vendored/LICENSE.*'])